@@ -0,0 +1,259 @@
+import json
+import math
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.similarity import METRICS, as_matrix, normalize_rows, top_k_indices
+from app.vector_index import PayloadPredicate, PointId, VectorIndex
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, spherical: bool, block_size: int = 65536) -> np.ndarray:
+    # Nearest centroid per row: largest inner product for spherical clusters, smallest L2 otherwise.
+    assign = np.empty(vectors.shape[0], dtype=np.int32)
+    c_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        scores = block @ centroids.T
+        if spherical:
+            assign[start:start + len(block)] = np.argmax(scores, axis=1)
+        else:
+            # ||x||^2 is the same for every centroid, so it drops out of the argmin.
+            assign[start:start + len(block)] = np.argmin(c_sq_norms[None, :] - 2.0 * scores, axis=1)
+    return assign
+
+def kmeans(
+        vectors: np.ndarray,
+        n_clusters: int,
+        n_iter: int = 20,
+        spherical: bool = False,
+        seed: int = 0,
+        block_size: int = 65536,
+        ) -> np.ndarray:
+    vectors = as_matrix(vectors)
+    n = vectors.shape[0]
+    if not 0 < n_clusters <= n:
+        raise ValueError(f"Need at least {n_clusters} vectors to train {n_clusters} clusters, got {n}")
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(n, n_clusters, replace=False)].copy()
+    if spherical:
+        centroids = normalize_rows(centroids)
+
+    previous = None
+    for _ in range(n_iter):
+        assign = assign_clusters(vectors, centroids, spherical, block_size)
+        if previous is not None and np.array_equal(assign, previous):
+            break
+        previous = assign
+
+        # Sorting by cluster turns the per-cluster sums into one reduceat over contiguous runs.
+        counts = np.bincount(assign, minlength=n_clusters)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(vectors[np.argsort(assign, kind="stable")], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(n, len(empty), replace=False)]
+        if spherical:
+            centroids = normalize_rows(centroids)
+    return centroids
+
+def default_n_lists(n: int) -> int:
+    return max(1, min(n, int(4 * math.sqrt(n))))
+
+class IVFIndex(VectorIndex):
+    # Inverted-file index: k-means centroids partition the rows into n_lists lists and a search
+    # only scores the rows of the nprobe lists closest to the query. nprobe == n_lists is exact.
+    # Until the index is trained (explicitly, or automatically once train_size rows exist)
+    # searches fall back to the exact scan of VectorIndex.
+    def __init__(
+            self,
+            dimension: int,
+            metric: str = "cosine",
+            dtype=np.float32,
+            block_size: int = 65536,
+            initial_capacity: int = 1024,
+            n_lists: Optional[int] = None,
+            nprobe: int = 8,
+            train_size: int = 10000,
+            n_iter: int = 20,
+            seed: int = 0,
+            ):
+        super().__init__(dimension, metric, dtype, block_size, initial_capacity)
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.empty(initial_capacity, dtype=np.int32)
+        self._layout: Optional[Tuple[int, np.ndarray, np.ndarray]] = None
+        self._layout_lock = threading.Lock()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def _spherical(self) -> bool:
+        return self.metric != "euclidean"
+
+    def add(self, ids: Sequence[PointId], vectors, payloads: Optional[Sequence[dict]] = None) -> None:
+        super().add(ids, vectors, payloads)
+        if not self.is_trained and len(self) >= self.train_size:
+            self.train()
+
+    def train(self, vectors=None, n_lists: Optional[int] = None, max_train_points: int = 256) -> None:
+        # Centroids are fit on at most max_train_points samples per list; every stored row is then reassigned.
+        with self._lock.write():
+            if vectors is None:
+                data = self._vectors[:len(self._ids)].astype(np.float32)
+            else:
+                data = as_matrix(vectors)
+                if self.metric == "cosine":
+                    data = normalize_rows(data)
+            if not len(data):
+                raise ValueError("Cannot train an IVF index without vectors")
+            n_lists = min(n_lists or self.n_lists or default_n_lists(len(data)), len(data))
+            sample_size = n_lists * max_train_points
+            if len(data) > sample_size:
+                rng = np.random.default_rng(self.seed)
+                data = data[rng.choice(len(data), sample_size, replace=False)]
+
+            self.centroids = kmeans(data, n_lists, self.n_iter, self._spherical, self.seed, self.block_size)
+            self.n_lists = n_lists
+            n = len(self._ids)
+            self._assign[:n] = assign_clusters(self._vectors[:n], self.centroids, self._spherical, self.block_size)
+            self._version += 1
+
+    def _store_rows(self, rows: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> None:
+        super()._store_rows(rows, matrix, sq_norms)
+        if self.is_trained:
+            self._assign[rows] = assign_clusters(matrix, self.centroids, self._spherical, self.block_size)
+
+    def _move_row(self, src: int, dst: int) -> None:
+        super()._move_row(src, dst)
+        self._assign[dst] = self._assign[src]
+
+    def _reserve(self, needed: int) -> None:
+        super()._reserve(needed)
+        capacity = self._vectors.shape[0]
+        if capacity > self._assign.shape[0]:
+            assign = np.empty(capacity, dtype=np.int32)
+            assign[:len(self._ids)] = self._assign[:len(self._ids)]
+            self._assign = assign
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Row numbers grouped by list plus list boundaries; rebuilt lazily after writes.
+        layout = self._layout
+        if layout is None or layout[0] != self._version:
+            with self._layout_lock:
+                layout = self._layout
+                if layout is None or layout[0] != self._version:
+                    assign = self._assign[:len(self._ids)]
+                    order = np.argsort(assign, kind="stable")
+                    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.n_lists))])
+                    layout = self._layout = (self._version, order, offsets)
+        return layout[1], layout[2]
+
+    def search(
+            self,
+            queries,
+            k: int,
+            where: Optional[PayloadPredicate] = None,
+            nprobe: Optional[int] = None,
+            ) -> List[List[Tuple[PointId, float, dict]]]:
+        if not self.is_trained:
+            return super().search(queries, k, where)
+        queries = as_matrix(queries)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Expected queries of dimension {self.dimension}, got {queries.shape[1]}")
+        if self.metric == "cosine":
+            queries = normalize_rows(queries)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        largest = METRICS[self.metric]
+
+        coarse = queries @ self.centroids.T
+        if not self._spherical:
+            coarse = np.einsum("ij,ij->i", self.centroids, self.centroids)[None, :] - 2.0 * coarse
+        probes = top_k_indices(coarse, nprobe, largest=self._spherical)
+
+        with self._lock.read():
+            if not self._ids or k <= 0:
+                return [[] for _ in range(queries.shape[0])]
+            order, offsets = self._inverted_lists()
+            mask = self._filter_mask(where)
+            results = []
+            for query, lists in zip(queries, probes):
+                candidates = np.concatenate([order[offsets[lst]:offsets[lst + 1]] for lst in lists])
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                if not len(candidates):
+                    results.append([])
+                    continue
+                block = self._vectors[candidates]
+                if block.dtype != np.float32:
+                    block = block.astype(np.float32)
+                scores = block @ query
+                if self.metric == "euclidean":
+                    scores = np.sqrt(np.maximum(query @ query + self._sq_norms[candidates] - 2.0 * scores, 0.0))
+                top = top_k_indices(scores, k, largest)[0]
+                results.append([
+                    (self._ids[candidates[t]], float(scores[t]), self._payloads[candidates[t]]) for t in top
+                ])
+            return results
+
+    def save(self, path: str) -> None:
+        with self._lock.read():
+            n = len(self._ids)
+            meta = {
+                "dimension": self.dimension,
+                "metric": self.metric,
+                "dtype": self.dtype.name,
+                "block_size": self.block_size,
+                "n_lists": self.n_lists,
+                "nprobe": self.nprobe,
+                "train_size": self.train_size,
+                "n_iter": self.n_iter,
+                "seed": self.seed,
+                "ids": self._ids,
+                "payloads": self._payloads,
+            }
+            arrays = {
+                "vectors": self._vectors[:n],
+                "sq_norms": self._sq_norms[:n],
+                "assign": self._assign[:n],
+            }
+            if self.is_trained:
+                arrays["centroids"] = self.centroids
+            # A file object keeps np.savez from appending ".npz" to the path.
+            with open(path, "wb") as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            n = len(meta["ids"])
+            index = cls(
+                dimension=meta["dimension"],
+                metric=meta["metric"],
+                dtype=np.dtype(meta["dtype"]),
+                block_size=meta["block_size"],
+                initial_capacity=max(n, 1),
+                n_lists=meta["n_lists"],
+                nprobe=meta["nprobe"],
+                train_size=meta["train_size"],
+                n_iter=meta["n_iter"],
+                seed=meta["seed"],
+            )
+            index._vectors[:n] = data["vectors"]
+            index._sq_norms[:n] = data["sq_norms"]
+            index._assign[:n] = data["assign"]
+            if "centroids" in data.files:
+                index.centroids = data["centroids"]
+        index._ids = meta["ids"]
+        index._payloads = meta["payloads"]
+        index._rows = {pid: row for row, pid in enumerate(index._ids)}
+        return index
@@ -0,0 +1,171 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ProgressCallback = Callable[[int, int], None]
+
+class BatchEmbedderConfig:
+    def __init__(self):
+        # The API supports only up to 250 items per request.
+        self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "250"))
+        self.max_in_flight = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT_BATCHES", "4"))
+        self.requests_per_minute = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))
+        self.max_tokens_per_request = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", "20000"))
+        self.max_retries = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+        self.backoff_base = float(os.getenv("EMBEDDING_BACKOFF_BASE_S", "0.5"))
+        self.backoff_max = float(os.getenv("EMBEDDING_BACKOFF_MAX_S", "30"))
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._sleep = sleep
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_for = (tokens - self._tokens) / self.rate
+            self._sleep(wait_for)
+
+def status_code(exc: Exception) -> Optional[int]:
+    # google.api_core exceptions carry the HTTP status as an int `code`.
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+def is_retryable(exc: Exception) -> bool:
+    code = status_code(exc)
+    return code is not None and (code == 429 or code >= 500)
+
+def is_token_limit_error(exc: Exception) -> bool:
+    return status_code(exc) == 400 and "token" in str(exc).lower()
+
+def estimate_tokens(text: str) -> int:
+    # Rough upper bound used only for request planning; ~4 characters per token.
+    return len(text) // 4 + 1
+
+class ParallelBatchEmbedder:
+    def __init__(
+            self,
+            embed_batch: Callable[[List[str]], List[List[float]]],
+            config: Optional[BatchEmbedderConfig] = None,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.embed_batch = embed_batch
+        self.config = config or BatchEmbedderConfig()
+        self._sleep = sleep
+        rate = self.config.requests_per_minute / 60
+        # Allow up to one second's worth of requests as a burst.
+        self.rate_limiter = TokenBucket(rate=rate, capacity=max(rate, float(self.config.max_in_flight)), sleep=sleep)
+
+        # Shared by every embed() call, so max_in_flight also bounds batches across concurrent calls.
+        # Workers are only started once a call has more than one batch.
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.config.max_in_flight),
+                                            thread_name_prefix="embedding-batch")
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.splits = 0
+
+    def plan_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        batches = []
+        start = 0
+        tokens = 0
+        for i, text in enumerate(texts):
+            cost = estimate_tokens(text)
+            if i > start and (i - start >= self.config.batch_size or tokens + cost > self.config.max_tokens_per_request):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += cost
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def embed(self, texts: List[str], progress: Optional[ProgressCallback] = None) -> List[List[float]]:
+        total = len(texts)
+        results: List[Optional[List[float]]] = [None] * total
+        batches = self.plan_batches(texts)
+
+        if len(batches) <= 1 or self.config.max_in_flight <= 1:
+            done = 0
+            for start, end in batches:
+                results[start:end] = self._embed_with_retry(texts[start:end])
+                done += end - start
+                if progress:
+                    progress(done, total)
+            return results
+
+        done = 0
+        futures = {}
+        try:
+            for start, end in batches:
+                futures[self._executor.submit(self._embed_with_retry, texts[start:end])] = (start, end)
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_EXCEPTION)
+                for future in finished:
+                    start, end = futures[future]
+                    results[start:end] = future.result()
+                    done += end - start
+                    if progress:
+                        progress(done, total)
+        finally:
+            # After a failure the batches of this call that have not started are dropped.
+            for future in futures:
+                future.cancel()
+        return results
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _embed_with_retry(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            with self._stats_lock:
+                self.requests += 1
+            try:
+                vectors = self.embed_batch(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+                return vectors
+            except Exception as e:
+                if is_token_limit_error(e) and len(batch) > 1:
+                    with self._stats_lock:
+                        self.splits += 1
+                    mid = len(batch) // 2
+                    return self._embed_with_retry(batch[:mid]) + self._embed_with_retry(batch[mid:])
+                if not is_retryable(e) or attempt >= self.config.max_retries:
+                    raise
+                # Exponential backoff with full jitter.
+                delay = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                self._sleep(random.uniform(0, delay))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "splits": self.splits,
+                "max_in_flight": self.config.max_in_flight,
+                "requests_per_minute": self.config.requests_per_minute,
+            }
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from app.concurrency import OverloadedError
+
+load_dotenv()
+
+class EmbeddingBatcherConfig:
+    def __init__(self):
+        self.enabled = os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() == "true"
+        self.window_ms = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+        # The API supports only up to 250 items per request.
+        self.max_batch_size = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "250"))
+        self.max_queue_depth = int(os.getenv("EMBEDDING_BATCH_MAX_QUEUE", "2000"))
+
+class EmbeddingBatcher:
+    def __init__(self, generator, config: Optional[EmbeddingBatcherConfig] = None):
+        self.generator = generator
+        self.config = config or EmbeddingBatcherConfig()
+        self.window = self.config.window_ms / 1000
+        self.max_batch_size = self.config.max_batch_size
+        self.max_queue_depth = self.config.max_queue_depth
+
+        self._pending = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight_items = 0
+        self._tasks = set()
+
+        self.requests = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.rejected = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        if len(self._pending) + self._in_flight_items >= self.max_queue_depth:
+            self.rejected += 1
+            raise OverloadedError(f"Embedding queue is full ({self.max_queue_depth} texts)")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._drain(flush_partial=False)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._on_window)
+
+        return await future
+
+    def _on_window(self) -> None:
+        self._timer = None
+        self._drain(flush_partial=True)
+
+    def _drain(self, flush_partial: bool) -> None:
+        while len(self._pending) >= self.max_batch_size:
+            self._dispatch(self._pending[:self.max_batch_size])
+            self._pending = self._pending[self.max_batch_size:]
+
+        if self._pending and flush_partial:
+            self._dispatch(self._pending)
+            self._pending = []
+
+        if not self._pending and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        elif self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._on_window)
+
+    def _dispatch(self, batch) -> None:
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            delay = now - enqueued_at
+            self.total_queue_delay += delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+        self.batches += 1
+        self.batched_items += len(batch)
+        self._in_flight_items += len(batch)
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch) -> None:
+        try:
+            vectors = await self.generator.agenerate_embeddings([text for text, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight_items -= len(batch)
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.config.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "upstream_batches": self.batches,
+            "queued": len(self._pending),
+            "in_flight": self._in_flight_items,
+            "rejected": self.rejected,
+            "avg_batch_size": self.batched_items / self.batches if self.batches else 0.0,
+            "batch_fill_ratio": (
+                self.batched_items / (self.batches * self.max_batch_size) if self.batches else 0.0
+            ),
+            "avg_queue_delay_ms": (
+                self.total_queue_delay / self.batched_items * 1000 if self.batched_items else 0.0
+            ),
+            "max_queue_delay_ms": self.max_queue_delay * 1000,
+        }
@@ -0,0 +1,65 @@
+import asyncio
+from collections import deque
+
+class OverloadedError(RuntimeError):
+    pass
+
+class ConcurrencyLimiter:
+    # Futures are created on the running loop at wait time, so one limiter can be
+    # shared by the app regardless of which event loop ends up serving it.
+    def __init__(self, max_in_flight: int, max_waiting: int):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1!!")
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise OverloadedError(
+                f"Too many concurrent requests ({self.in_flight} in flight, {len(self._waiters)} waiting)"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before we got cancelled.
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter so in_flight never dips below the cap.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_waiting": self.max_waiting,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.embedding_cache import normalize_text
+from app.vector_index import VectorIndex
+from app.vector_store import point_id
+
+load_dotenv()
+
+# Universal hashing modulo a Mersenne prime; a * x + b stays below 2**63 so uint64 never overflows.
+MERSENNE_PRIME = (1 << 31) - 1
+
+class DedupConfig:
+    def __init__(self):
+        self.enabled = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+        # Estimated Jaccard similarity of character shingles above which a line is a near duplicate; 0 disables.
+        self.minhash_threshold = float(os.getenv("DEDUP_MINHASH_THRESHOLD", "0.8"))
+        self.num_perm = int(os.getenv("DEDUP_NUM_PERM", "128"))
+        self.shingle_size = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+        # Cosine similarity of embeddings above which a line is dropped after embedding; 0 disables.
+        self.cosine_threshold = float(os.getenv("DEDUP_COSINE_THRESHOLD", "0"))
+        # JSON lines file with one {"id", "text", "canonical_id", "reason"} record per dropped line.
+        self.report_path = os.getenv("DEDUP_REPORT_PATH") or None
+
+def dedup_key(text: str) -> bytes:
+    # Stricter than point_id: case-only variants are duplicates too.
+    return hashlib.blake2b(normalize_text(text).casefold().encode("utf-8"), digest_size=16).digest()
+
+def shingles(text: str, size: int = 5) -> List[str]:
+    text = normalize_text(text).casefold()
+    if len(text) <= size:
+        return [text]
+    return [text[i: i + size] for i in range(len(text) - size + 1)]
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    # Pick bands * rows == num_perm whose S-curve midpoint (1 / bands) ** (1 / rows) is closest to the threshold.
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    return min(options, key=lambda option: abs((1.0 / option[0]) ** (1.0 / option[1]) - threshold))
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(shingles(text, self.shingle_size))), dtype=np.uint64
+        ) % np.uint64(MERSENNE_PRIME)
+        # All permutations at once: a (num_perm, n_shingles) matrix reduced to its row minima.
+        return ((self._a * hashes[None, :] + self._b) % np.uint64(MERSENNE_PRIME)).min(axis=1).astype(np.uint32)
+
+class Deduplicator:
+    # Stateful across batches: each line is compared with every line kept earlier in the run.
+    # Dropped lines are never embedded or stored; duplicates maps their point id to the canonical one.
+    def __init__(self, config: Optional[DedupConfig] = None):
+        self.config = config or DedupConfig()
+        self.duplicates: Dict[str, Tuple[str, str]] = {}
+        self.counts = Counter()
+        self._exact: Dict[bytes, str] = {}
+        self._records: List[dict] = []
+        self._cluster_sizes: Counter = Counter()
+        self._hasher = None
+        if self.config.minhash_threshold > 0:
+            self._hasher = MinHasher(self.config.num_perm, self.config.shingle_size)
+            self._bands, self._rows = lsh_bands(self.config.num_perm, self.config.minhash_threshold)
+            self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self._bands)]
+            self._signatures: List[np.ndarray] = []
+            self._signature_ids: List[str] = []
+        self._index: Optional[VectorIndex] = None
+
+    def filter(self, texts: Sequence[str], owner: Optional[str] = None) -> List[str]:
+        # Exact and MinHash passes; runs before embedding so duplicates cost no quota.
+        # owner scopes the reported point ids the same way ingestion scopes the stored ones.
+        kept = []
+        for text in texts:
+            pid = point_id(text, owner)
+            key = dedup_key(text)
+            canonical = self._exact.get(key)
+            if canonical is not None:
+                self._drop(pid, text, canonical, "exact")
+                continue
+            if self._hasher is not None:
+                signature = self._hasher.signature(text)
+                canonical = self._near_duplicate(signature)
+                if canonical is not None:
+                    self._drop(pid, text, canonical, "near")
+                    continue
+                self._add_signature(pid, signature)
+            self._exact[key] = pid
+            kept.append(text)
+        self.counts["kept"] += len(kept)
+        return kept
+
+    def filter_embedded(
+            self, texts: Sequence[str], vectors, owner: Optional[str] = None,
+            ) -> Tuple[List[str], List[List[float]]]:
+        # Optional cosine pass over the embeddings of lines that survived filter(). Only lines embedded
+        # in this run are compared; lines skipped as unchanged by incremental ingestion are not.
+        if self.config.cosine_threshold <= 0 or not len(texts):
+            return list(texts), list(vectors)
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self._index is None:
+            self._index = VectorIndex(dimension=matrix.shape[1], metric="cosine", dtype=np.float16)
+
+        nearest = self._index.search(matrix, k=1)
+        unit = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        within = unit @ unit.T
+        keep = []
+        for i, text in enumerate(texts):
+            pid = point_id(text, owner)
+            if nearest[i] and nearest[i][0][1] >= self.config.cosine_threshold:
+                self._drop(pid, text, nearest[i][0][0], "cosine")
+                continue
+            earlier = [j for j in keep if within[i, j] >= self.config.cosine_threshold]
+            if earlier:
+                self._drop(pid, text, point_id(texts[max(earlier, key=lambda j: within[i, j])], owner), "cosine")
+                continue
+            keep.append(i)
+        if keep:
+            self._index.add([point_id(texts[i], owner) for i in keep], matrix[keep])
+        self.counts["kept"] -= len(texts) - len(keep)
+        return [texts[i] for i in keep], [vectors[i] for i in keep]
+
+    def canonical(self, pid: str) -> str:
+        # Follows the pointer of a dropped line; canonical points resolve to themselves.
+        return self.duplicates[pid][0] if pid in self.duplicates else pid
+
+    def _near_duplicate(self, signature: np.ndarray) -> Optional[str]:
+        candidates = set()
+        for band, bucket in enumerate(self._buckets):
+            candidates.update(bucket.get(self._band_key(signature, band), ()))
+        best, best_similarity = None, self.config.minhash_threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return None if best is None else self._signature_ids[best]
+
+    def _add_signature(self, pid: str, signature: np.ndarray) -> None:
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._signature_ids.append(pid)
+        for band, bucket in enumerate(self._buckets):
+            bucket.setdefault(self._band_key(signature, band), []).append(position)
+
+    def _band_key(self, signature: np.ndarray, band: int) -> bytes:
+        return signature[band * self._rows: (band + 1) * self._rows].tobytes()
+
+    def _drop(self, pid: str, text: str, canonical: str, reason: str) -> None:
+        # Pointers always lead straight to a kept point, never through another dropped one.
+        canonical = self.canonical(canonical)
+        if pid != canonical:
+            self.duplicates.setdefault(pid, (canonical, reason))
+        self._cluster_sizes[canonical] += 1
+        self.counts[reason] += 1
+        self._records.append({"id": pid, "text": text, "canonical_id": canonical, "reason": reason})
+
+    def stats(self, top: int = 10) -> dict:
+        # Cluster size counts the canonical point plus every line folded into it.
+        sizes = Counter(size + 1 for size in self._cluster_sizes.values())
+        return {
+            "kept": self.counts["kept"],
+            "dropped": {reason: self.counts[reason] for reason in ("exact", "near", "cosine")},
+            "clusters": len(self._cluster_sizes),
+            "cluster_sizes": dict(sorted(sizes.items())),
+            "largest_clusters": [
+                {"canonical_id": pid, "size": size + 1} for pid, size in self._cluster_sizes.most_common(top)
+            ],
+        }
+
+    def save_report(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.config.report_path
+        if not path:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self._records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return path
@@ -0,0 +1,39 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class EmbeddingBackend(ABC):
+    # The model behind EmbeddingGenerator. Batching, retries, caching and dimensionality
+    # handling live in the generator, so a backend only turns one batch of texts into vectors.
+    model_name: str
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        # Full output size, used when no output dimensionality is requested.
+        ...
+
+    @abstractmethod
+    def embed(self, texts: List[str], output_dimensionality: Optional[int] = None) -> List[List[float]]: ...
+
+    def warm_up(self, text: Optional[str] = "warm-up") -> None:
+        if text:
+            self.embed([text])
+
+def create_embedding_backend(
+        backend: Optional[str] = None,
+        project_id: Optional[str] = None,
+        location: Optional[str] = None,
+        ) -> EmbeddingBackend:
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "vertex")).lower()
+    if backend == "vertex":
+        from app.vertex_backend import VertexEmbeddingBackend
+        return VertexEmbeddingBackend(project_id=project_id, location=location)
+    if backend == "local":
+        from app.local_embedder import HashingEmbeddingBackend
+        return HashingEmbeddingBackend()
+    raise ValueError(f"Unsupported embedding backend: {backend}")
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.shared_cache import SQLiteConnections, shared_cache_path
+
+load_dotenv()
+
+# SQLite caps the number of host parameters per statement.
+_SQLITE_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCacheConfig:
+    def __init__(self):
+        self.enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+        self.max_bytes = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        # SQLite second tier; with SHARED_CACHE_DIR set it defaults to a file shared by all workers.
+        self.path = os.getenv("EMBEDDING_CACHE_PATH") or shared_cache_path("embeddings.sqlite")
+        # Approximate bound on the SQLite tier, oldest writes dropped first; 0 keeps everything.
+        self.disk_max_entries = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ENTRIES", "1000000"))
+
+
+class EmbeddingCache:
+    def __init__(self, config: Optional[EmbeddingCacheConfig] = None):
+        self.config = config or EmbeddingCacheConfig()
+        self.max_entries = self.config.max_entries
+        self.max_bytes = self.config.max_bytes
+        self.path = self.config.path
+
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+
+        self._db = None
+        if self.path:
+            self._db = SQLiteConnections(
+                self.path, ["CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"]
+            )
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                results[i] = vector.tolist()
+                self.hits += 1
+
+        if missing and self._db is not None:
+            found = self._disk_get([keys[i] for i in missing])
+            still_missing = []
+            with self._lock:
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is None:
+                        still_missing.append(i)
+                        continue
+                    self._store(keys[i], vector)
+                    results[i] = vector.tolist()
+                    self.disk_hits += 1
+            missing = still_missing
+
+        with self._lock:
+            self.misses += len(missing)
+        return results
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if len(keys) != len(vectors):
+            raise ValueError("Number of keys and vectors must be equal!!")
+
+        arrays = [np.asarray(v, dtype=np.float32) for v in vectors]
+        with self._lock:
+            for key, vector in zip(keys, arrays):
+                self._store(key, vector)
+
+        if self._db is not None:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in zip(keys, arrays)],
+                )
+                self._db.trim("embeddings", self.config.disk_max_entries)
+            except sqlite3.Error as e:
+                # Another worker holds the write lock past the busy timeout; the vectors stay cached in memory.
+                with self._lock:
+                    self.disk_errors += 1
+                print(f"Error writing embedding cache: {e}")
+
+    def _store(self, key: str, vector: np.ndarray) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+
+        while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _disk_get(self, keys: List[str]) -> dict:
+        found = {}
+        try:
+            for i in range(0, len(keys), _SQLITE_CHUNK):
+                chunk = keys[i: i + _SQLITE_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).copy()
+        except sqlite3.Error as e:
+            with self._lock:
+                self.disk_errors += 1
+            print(f"Error reading embedding cache: {e}")
+        return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            self._db.execute("DELETE FROM embeddings")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "persistent": bool(self.path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_errors": self.disk_errors,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
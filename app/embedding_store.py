@@ -0,0 +1,366 @@
+import json
+import os
+import uuid
+import zlib
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.similarity import METRICS, as_matrix, blocked_top_k, normalize_rows
+from app.vector_store import point_id
+
+MAGIC = "TEXTEMB"
+VERSION = 2
+HEADER_FILE = "header.json"
+# name -> file inside the store directory; every block is append-only.
+BLOCKS = {
+    "vectors": "vectors.bin",
+    "offsets": "offsets.bin",
+    "texts": "texts.bin",
+    "ids": "ids.bin",
+    "payload_offsets": "payload_offsets.bin",
+    "payloads": "payloads.bin",
+    "tombstones": "tombstones.bin",
+}
+DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+ID_BYTES = 16
+# Row count at deletion time followed by the deleted id.
+TOMBSTONE = np.dtype([("position", "<u8"), ("id", "V16")])
+CRC_CHUNK = 1 << 20
+NORM_BLOCK = 65536
+
+class EmbeddingStoreError(Exception):
+    pass
+
+class EmbeddingStore:
+    # Directory layout:
+    #   header.json  magic, version, dimension, dtype, committed count, CRC32 per block
+    #   vectors.bin  count x dimension little-endian float32/float16, row-major (np.memmap-able)
+    #   offsets.bin  count little-endian uint64 end offsets into texts.bin
+    #   texts.bin    UTF-8 texts back to back
+    #   ids.bin      count x 16-byte point ids (UUID bytes, so only UUID point ids are supported)
+    #   payload_offsets.bin, payloads.bin
+    #                payload of each row as compact JSON, laid out like the texts
+    #   tombstones.bin  deleted ids, each with the row count at the time of the delete
+    # Appends write the blocks first and then atomically replace the header, so the header
+    # count is the commit point and bytes past it (from a crashed append) are ignored.
+    # A row with an id that was appended again later, or deleted after it was written, is
+    # superseded; readers only see the live rows (see live_rows).
+    def __init__(self, path: str, header: dict, writable: bool):
+        self.path = path
+        self.header = header
+        self.writable = writable
+        self.dimension = header["dimension"]
+        self.dtype = DTYPES[header["dtype"]]
+        self._maps = {}
+        # Derived from the committed rows; rebuilt or extended when the header moves on.
+        self._live: Optional[Tuple[Tuple[int, int], np.ndarray]] = None
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        if writable:
+            self._truncate_uncommitted()
+
+    @classmethod
+    def create(cls, path: str, dimension: int, dtype: str = "float32", model: Optional[str] = None,
+               metadata: Optional[dict] = None, overwrite: bool = False) -> "EmbeddingStore":
+        # metadata is kept in the header as is, e.g. to tell which input a store was built from.
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        if os.path.exists(os.path.join(path, HEADER_FILE)):
+            if not overwrite:
+                raise EmbeddingStoreError(f"Embedding store already exists at {path}")
+            # Removed before the blocks are truncated, so a crash here leaves no store rather than a broken one.
+            os.remove(os.path.join(path, HEADER_FILE))
+        os.makedirs(path, exist_ok=True)
+        for filename in BLOCKS.values():
+            open(os.path.join(path, filename), "wb").close()
+        header = {
+            "magic": MAGIC,
+            "version": VERSION,
+            "dimension": dimension,
+            "dtype": dtype,
+            "model": model,
+            "metadata": metadata or {},
+            "count": 0,
+            "text_bytes": 0,
+            "payload_bytes": 0,
+            "deleted": 0,
+            "checksums": {name: 0 for name in BLOCKS},
+        }
+        _write_header(path, header)
+        return cls(path, header, writable=True)
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False) -> "EmbeddingStore":
+        header_path = os.path.join(path, HEADER_FILE)
+        if not os.path.exists(header_path):
+            raise FileNotFoundError(f"No embedding store at {path}")
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("magic") != MAGIC:
+            raise EmbeddingStoreError(f"{path} is not an embedding store")
+        if header.get("version") != VERSION:
+            raise EmbeddingStoreError(f"Unsupported embedding store version {header.get('version')}")
+        return cls(path, header, writable)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, HEADER_FILE))
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def _file(self, block: str) -> str:
+        return os.path.join(self.path, BLOCKS[block])
+
+    def _block_sizes(self, header: dict) -> dict:
+        count = header["count"]
+        return {
+            "vectors": count * self.dimension * self.dtype.itemsize,
+            "offsets": count * 8,
+            "texts": header["text_bytes"],
+            "ids": count * ID_BYTES,
+            "payload_offsets": count * 8,
+            "payloads": header["payload_bytes"],
+            "tombstones": header["deleted"] * TOMBSTONE.itemsize,
+        }
+
+    def _truncate_uncommitted(self) -> None:
+        for block, size in self._block_sizes(self.header).items():
+            with open(self._file(block), "r+b") as f:
+                f.truncate(size)
+
+    def _map(self, block: str, dtype, shape) -> np.ndarray:
+        cached = self._maps.get(block)
+        if cached is not None and cached.shape == shape:
+            return cached
+        if not shape[0]:
+            return np.empty(shape, dtype=dtype)
+        mapped = np.memmap(self._file(block), dtype=dtype, mode="r", shape=shape)
+        self._maps[block] = mapped
+        return mapped
+
+    @property
+    def vectors(self) -> np.ndarray:
+        # Zero-copy view; pages are read from disk on first touch.
+        return self._map("vectors", self.dtype, (len(self), self.dimension))
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._map("offsets", np.dtype("<u8"), (len(self),))
+
+    def text(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        offsets = self.offsets
+        start = int(offsets[i - 1]) if i else 0
+        texts = self._map("texts", np.uint8, (self.header["text_bytes"],))
+        return bytes(texts[start:int(offsets[i])]).decode("utf-8")
+
+    def texts(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return []
+        offsets = self.offsets
+        texts = self._map("texts", np.uint8, (self.header["text_bytes"],))
+        base = int(offsets[start - 1]) if start else 0
+        raw = bytes(texts[base:int(offsets[end - 1])])
+        bounds = [0] + [int(o) - base for o in offsets[start:end]]
+        return [raw[bounds[j]:bounds[j + 1]].decode("utf-8") for j in range(end - start)]
+
+    def ids(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        end = len(self) if end is None else min(end, len(self))
+        table = self._map("ids", np.uint8, (len(self), ID_BYTES))
+        return [str(uuid.UUID(bytes=bytes(row))) for row in table[start:end]]
+
+    def payloads(self, start: int = 0, end: Optional[int] = None) -> List[dict]:
+        end = len(self) if end is None else min(end, len(self))
+        return self._payloads_at(np.arange(start, max(start, end)))
+
+    def _read_rows(self, offsets_block: str, data_block: str, size: int, rows: np.ndarray) -> List[bytes]:
+        if not len(rows):
+            return []
+        offsets = self._map(offsets_block, np.dtype("<u8"), (len(self),))
+        data = self._map(data_block, np.uint8, (size,))
+        ends = offsets[rows].astype(np.int64)
+        starts = np.where(rows > 0, offsets[np.maximum(rows - 1, 0)], 0).astype(np.int64)
+        return [bytes(data[a:b]) for a, b in zip(starts, ends)]
+
+    def _payloads_at(self, rows: np.ndarray) -> List[dict]:
+        raw = self._read_rows("payload_offsets", "payloads", self.header["payload_bytes"], rows)
+        return [json.loads(b) if b else {} for b in raw]
+
+    def append(self, texts: Sequence[str], vectors, ids: Optional[Sequence[str]] = None,
+               payloads: Optional[Sequence[Optional[dict]]] = None) -> int:
+        if not self.writable:
+            raise EmbeddingStoreError("Embedding store was opened read-only")
+        if len(texts) == 0:
+            return len(self)
+        matrix = np.asarray(as_matrix(vectors), dtype=self.dtype)
+        if matrix.shape != (len(texts), self.dimension):
+            raise ValueError(f"Expected {len(texts)} vectors of dimension {self.dimension}, got {matrix.shape}")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of ids and texts must be equal!!")
+        if payloads is not None and len(payloads) != len(texts):
+            raise ValueError("Number of payloads and texts must be equal!!")
+
+        encoded = [t.encode("utf-8") for t in texts]
+        ends = np.cumsum([len(b) for b in encoded], dtype=np.uint64) + np.uint64(self.header["text_bytes"])
+        encoded_payloads = [
+            json.dumps(p, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if p else b""
+            for p in (payloads if payloads is not None else [None] * len(texts))
+        ]
+        payload_ends = (np.cumsum([len(b) for b in encoded_payloads], dtype=np.uint64)
+                        + np.uint64(self.header["payload_bytes"]))
+        id_bytes = b"".join(uuid.UUID(str(pid)).bytes for pid in (ids if ids is not None else map(point_id, texts)))
+        header = dict(self.header)
+        header["count"] = len(self) + len(texts)
+        header["text_bytes"] = int(ends[-1])
+        header["payload_bytes"] = int(payload_ends[-1])
+        self._commit(header, {
+            "vectors": matrix.tobytes(),
+            "offsets": ends.astype("<u8").tobytes(),
+            "texts": b"".join(encoded),
+            "ids": id_bytes,
+            "payload_offsets": payload_ends.astype("<u8").tobytes(),
+            "payloads": b"".join(encoded_payloads),
+        })
+        return len(self)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        # Appends tombstones; rows written before them stop being live, rows appended later are not affected.
+        if not self.writable:
+            raise EmbeddingStoreError("Embedding store was opened read-only")
+        if len(ids) == 0:
+            return 0
+        tombstones = np.empty(len(ids), dtype=TOMBSTONE)
+        tombstones["position"] = len(self)
+        tombstones["id"] = [uuid.UUID(str(pid)).bytes for pid in ids]
+        header = dict(self.header)
+        header["deleted"] = self.header["deleted"] + len(ids)
+        self._commit(header, {"tombstones": tombstones.tobytes()})
+        return len(ids)
+
+    def _commit(self, header: dict, blocks: dict) -> None:
+        checksums = dict(self.header["checksums"])
+        for block, data in blocks.items():
+            with open(self._file(block), "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            checksums[block] = zlib.crc32(data, checksums[block])
+        header["checksums"] = checksums
+        _write_header(self.path, header)
+        self.header = header
+
+    def live_rows(self) -> np.ndarray:
+        # Row numbers of the current version of every id that was not deleted, in append order.
+        key = (len(self), self.header["deleted"])
+        if self._live is not None and self._live[0] == key:
+            return self._live[1]
+        keys = self._map("ids", np.uint8, (len(self), ID_BYTES)).view(TOMBSTONE["id"])[:, 0]
+        # First occurrence in reverse is the last one written.
+        _, last = np.unique(keys[::-1], return_index=True)
+        live = np.sort(len(keys) - 1 - last)
+        if self.header["deleted"]:
+            tombstones = np.asarray(self._map("tombstones", TOMBSTONE, (self.header["deleted"],)))
+            deleted_at = {}
+            for position, pid in tombstones.tolist():
+                deleted_at[pid] = max(position, deleted_at.get(pid, 0))
+            # A row is gone when any tombstone for its id was written after it.
+            candidates = np.flatnonzero(np.isin(keys[live], tombstones["id"]))
+            gone = [i for i in candidates.tolist() if live[i] < deleted_at[keys[live[i]].tobytes()]]
+            live = np.delete(live, gone)
+        self._live = (key, live)
+        return live
+
+    def verify(self) -> bool:
+        sizes = self._block_sizes(self.header)
+        for block, expected in self.header["checksums"].items():
+            crc = 0
+            remaining = sizes[block]
+            with open(self._file(block), "rb") as f:
+                while remaining:
+                    chunk = f.read(min(CRC_CHUNK, remaining))
+                    if not chunk:
+                        raise EmbeddingStoreError(f"{BLOCKS[block]} is truncated")
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+            if crc != expected:
+                raise EmbeddingStoreError(f"Checksum mismatch in {BLOCKS[block]}")
+        return True
+
+    def iter_batches(self, batch_size: int = 1000, with_payloads: bool = False) -> Iterator[tuple]:
+        # (ids, texts, vectors) of the live rows, plus their payloads when asked for.
+        live = self.live_rows()
+        contiguous = len(live) == len(self)
+        for start in range(0, len(live), batch_size):
+            end = min(start + batch_size, len(live))
+            if contiguous:
+                batch = (self.ids(start, end), self.texts(start, end),
+                         np.asarray(self.vectors[start:end], dtype=np.float32))
+            else:
+                rows = live[start:end]
+                table = self._map("ids", np.uint8, (len(self), ID_BYTES))
+                batch = ([str(uuid.UUID(bytes=bytes(row))) for row in table[rows]],
+                         [b.decode("utf-8") for b in self._read_rows("offsets", "texts", self.header["text_bytes"], rows)],
+                         np.asarray(self.vectors[rows], dtype=np.float32))
+            if with_payloads:
+                batch += (self._payloads_at(live[start:end]),)
+            yield batch
+
+    def _row_norms(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Squared and plain norms of the committed rows, computed once per row instead of on every query.
+        done = len(self._sq_norms)
+        if done < len(self):
+            vectors = self.vectors
+            added = [np.einsum("ij,ij->i", block, block)
+                     for block in (np.asarray(vectors[s:s + NORM_BLOCK], dtype=np.float32)
+                                   for s in range(done, len(self), NORM_BLOCK))]
+            sq_norms = np.concatenate(added).astype(np.float32)
+            norms = np.sqrt(sq_norms)
+            # Zero vectors score 0, as with normalize_rows.
+            norms[norms == 0] = 1.0
+            self._sq_norms = np.concatenate([self._sq_norms, sq_norms])
+            self._norms = np.concatenate([self._norms, norms])
+        return self._sq_norms[:len(self)], self._norms[:len(self)]
+
+    def search(self, queries, k: int, metric: str = "cosine", block_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        # Streams the memory-mapped matrix block by block instead of loading it.
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        queries = as_matrix(queries)
+        if metric == "cosine":
+            queries = normalize_rows(queries)
+        vectors = self.vectors
+        live = self.live_rows()
+        # Superseded and deleted rows are skipped; row numbers in the result still index the whole store.
+        selected = None if len(live) == len(self) else live
+        sq_norms, norms = self._row_norms() if metric != "dot" else (None, None)
+
+        def score_block(start: int, end: int) -> np.ndarray:
+            rows = slice(start, end) if selected is None else selected[start:end]
+            scores = queries @ np.asarray(vectors[rows], dtype=np.float32).T
+            if metric == "cosine":
+                return scores / norms[rows][None, :]
+            if metric == "euclidean":
+                squared = np.einsum("ij,ij->i", queries, queries)[:, None] + sq_norms[rows][None, :] - 2.0 * scores
+                return np.sqrt(np.maximum(squared, 0.0))
+            return scores
+
+        n = len(self) if selected is None else len(selected)
+        idx, scores = blocked_top_k(score_block, n, queries.shape[0], k, METRICS[metric], block_size)
+        return (idx if selected is None else selected[idx]), scores
+
+    def close(self) -> None:
+        self._maps.clear()
+        self._live = None
+
+def _write_header(path: str, header: dict) -> None:
+    target = os.path.join(path, HEADER_FILE)
+    tmp = f"{target}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, target)
@@ -1,43 +1,116 @@
+import asyncio
 import os
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional
 
-import vertexai
 from dotenv import load_dotenv
-from vertexai.language_models import TextEmbeddingModel
-import math
+
+from app.batch_embedder import BatchEmbedderConfig, ParallelBatchEmbedder, ProgressCallback
+from app.embedding_backend import EmbeddingBackend, create_embedding_backend
+from app.embedding_cache import EmbeddingCache, cache_key
+from app.metrics import span
+from app.similarity import truncate_embeddings
 
 load_dotenv()
 
 class EmbeddingGenerator:
-    def __init__(self, project_id: str = None, location: str = None):
-        self.project_id = os.getenv("GOOGLE_PROJECT_ID")
-        self.location = os.getenv("GOOGLE_CLOUD_LOCATION")
-        if not self.project_id:
-            raise ValueError("No Google Project ID provided!!")
+    def __init__(
+            self,
+            project_id: str = None,
+            location: str = None,
+            cache: Optional[EmbeddingCache] = None,
+            batch_config: Optional[BatchEmbedderConfig] = None,
+            output_dimensionality: Optional[int] = None,
+            truncate: Optional[bool] = None,
+            backend: Optional[EmbeddingBackend] = None,
+            ):
+        # Selected by EMBEDDING_BACKEND: "vertex" (default) or "local" (deterministic, offline).
+        self.backend = backend or create_embedding_backend(project_id=project_id, location=location)
+        self.model_name = self.backend.model_name
+        # Reduced-size vectors: requested from the model, or (truncate mode) cut from the full
+        # vectors client-side and renormalized, which keeps full-size cache entries reusable.
+        self.output_dimensionality = (
+            # Empty (as shipped in .env.example) means unset, i.e. the model's full size.
+            output_dimensionality or int(os.getenv("EMBEDDING_OUTPUT_DIMENSIONALITY") or "0") or None
+        )
+        if truncate is None:
+            truncate = os.getenv("EMBEDDING_TRUNCATE", "false").lower() == "true"
+        self.truncate = truncate
+        # Bounded pool for the async path so blocking backend calls stay off the event loop.
+        self.max_workers = int(os.getenv("EMBEDDING_MAX_WORKERS", "8"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding")
+
+        if cache is None:
+            cache = EmbeddingCache()
+            if not cache.config.enabled:
+                cache = None
+        self.cache = cache
+        self.batch_embedder = ParallelBatchEmbedder(self._embed_batch, batch_config)
+
+    @property
+    def dimension(self) -> int:
+        return self.output_dimensionality or self.backend.dimension
 
-        vertexai.init(project=self.project_id, location=self.location)
-        self.model_name = "text-embedding-005"
+    @property
+    def _upstream_dimensionality(self) -> Optional[int]:
+        return None if self.truncate else self.output_dimensionality
+
+    def warm_up(self, text: Optional[str] = "warm-up") -> None:
+        self.backend.warm_up(text)
 
     def generate_embedding(self, text: str) -> List[float]:
-        model = TextEmbeddingModel.from_pretrained(self.model_name)
-        embeddings = model.get_embeddings([text])
-        return embeddings[0].values
+        with span("embed", batch_size=1):
+            return self._reduce(self._cached([text], self.batch_embedder.embed))[0]
+
+    def generate_embeddings(self, texts: list[str], progress: Optional[ProgressCallback] = None) -> list[list[float]]:
+        # "embed" covers cache lookups and every upstream batch; "embed_upstream" is one backend call.
+        with span("embed", batch_size=len(texts)):
+            return self._reduce(self._cached(texts, partial(self.batch_embedder.embed, progress=progress)))
+
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate_embedding, text)
+
+    async def agenerate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate_embeddings, texts)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.batch_embedder.close()
+
+    def _cached(self, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        if self.cache is None:
+            return embed(texts)
 
-    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
-        # The API supports only up to 250 items per request.
-        model = TextEmbeddingModel.from_pretrained(self.model_name)
-        batch_size = 250
+        # Vectors of different sizes must never share a cache entry.
+        namespace = self.model_name
+        if self._upstream_dimensionality:
+            namespace = f"{self.model_name}@{self._upstream_dimensionality}"
+        keys = [cache_key(namespace, text) for text in texts]
+        results = self.cache.get_many(keys)
 
-        all_embeddings = []
-        total = len(texts)
-        num_batches = math.ceil(total / batch_size)
-        print(f"Generating embeddings in {num_batches} batches")
+        # Identical texts inside one call are only sent upstream once.
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, results)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
 
-        for i in range(0, total, batch_size):
-            batch = texts[i: i + batch_size]
-            embeddings = model.get_embeddings(batch)
-            all_embeddings.extend([embedding.values for embedding in embeddings])
+        if missing:
+            positions = list(missing.values())
+            vectors = embed([texts[p[0]] for p in positions])
+            self.cache.put_many(list(missing.keys()), vectors)
+            for indices, vector in zip(positions, vectors):
+                for i in indices:
+                    results[i] = vector
+        return results
 
-        print(f"Finished generating embeddings in {num_batches} batches!!")
-        return all_embeddings
+    def _reduce(self, vectors: List[List[float]]) -> List[List[float]]:
+        if not (self.truncate and self.output_dimensionality) or not vectors:
+            return vectors
+        return truncate_embeddings(vectors, self.output_dimensionality).tolist()
 
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with span("embed_upstream", batch_size=len(texts)):
+            return self.backend.embed(texts, output_dimensionality=self._upstream_dimensionality)
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from itertools import takewhile
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.vector_store import owner_key, point_id
+
+load_dotenv()
+
+class IngestionConfig:
+    def __init__(self):
+        self.batch_size = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+        # Embedded batches waiting for upsert; bounds memory to roughly (queue_depth + 2) batches.
+        self.queue_depth = int(os.getenv("INGEST_QUEUE_DEPTH", "2"))
+        self.checkpoint_path = os.getenv("INGEST_CHECKPOINT_PATH") or None
+        # Incremental mode only embeds lines whose point is missing or was embedded by another model.
+        self.incremental = os.getenv("INGEST_INCREMENTAL", "false").lower() == "true"
+        # Delete points of the same source and metadata that no longer appear in the file.
+        self.prune = os.getenv("INGEST_PRUNE", "false").lower() == "true"
+        # With a sparse index, the checkpoint only moves on every this many batches, when the index
+        # file is rewritten with it; a resumed run re-ingests at most that many batches.
+        self.sparse_save_interval = max(1, int(os.getenv("INGEST_SPARSE_SAVE_INTERVAL", "20")))
+
+def iter_lines(path: str, start_offset: int = 0, digest=None) -> Iterator[Tuple[str, int]]:
+    # Yields (stripped line, byte offset just past it) so callers can checkpoint exact positions.
+    # digest, if given, is updated with exactly the bytes up to the offset of the last yielded line.
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        skipped = []
+        for raw in f:
+            offset += len(raw)
+            line = raw.decode("utf-8").strip()
+            if not line:
+                skipped.append(raw)
+                continue
+            if digest is not None:
+                for blank in skipped:
+                    digest.update(blank)
+                digest.update(raw)
+            skipped.clear()
+            yield line, offset
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def prefix_digest(path: str, offset: int):
+    # SHA-256 of the first offset bytes, i.e. of the part of the file a checkpoint says was ingested.
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = offset
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+def load_checkpoint(checkpoint_path: Optional[str], source_path: str) -> Tuple[dict, Any]:
+    # Returns the state to resume from and the digest of the prefix it covers.
+    fresh = {"offset": 0, "count": 0}
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return fresh, hashlib.sha256()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("source") != os.path.abspath(source_path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {state.get('source')}, not {source_path}")
+    digest = prefix_digest(source_path, state["offset"])
+    if os.path.getsize(source_path) < state["offset"] or digest.hexdigest() != state.get("sha256"):
+        # The file was edited since the checkpoint was written; its offset may now point mid-line.
+        print(f"Discarding checkpoint {checkpoint_path}: {source_path} changed since it was written")
+        return fresh, hashlib.sha256()
+    return state, digest
+
+def save_checkpoint(checkpoint_path: str, source_path: str, offset: int, count: int, sha256: str) -> None:
+    tmp = f"{checkpoint_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source_path), "offset": offset, "count": count, "sha256": sha256}, f)
+    os.replace(tmp, checkpoint_path)
+
+def remove_checkpoint(checkpoint_path: Optional[str]) -> None:
+    # A finished run leaves nothing to resume; the next run starts from the top again.
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+def ingest_file(
+        path: str,
+        generator,
+        store,
+        config: Optional[IngestionConfig] = None,
+        collection_name: Optional[str] = None,
+        progress: Optional[Callable[[int], None]] = None,
+        source: Optional[str] = None,
+        sparse_index=None,
+        metadata: Optional[dict] = None,
+        deduplicator=None,
+        sparse_index_path: Optional[str] = None,
+        ) -> dict:
+    config = config or IngestionConfig()
+    checkpoint_path = config.checkpoint_path
+    # The source is part of every point id, so the default must not depend on where the file is
+    # mounted or which directory the run started from.
+    source = source or os.path.basename(os.path.normpath(path))
+    state, digest = load_checkpoint(checkpoint_path, path)
+    resumed_from = state["count"]
+    # Point ids are scoped by owner (source + metadata), so another source or tenant ingesting the
+    # same text gets its own point instead of overwriting this one's payload.
+    owner = owner_key(source, metadata)
+    if deduplicator is not None and state["offset"]:
+        replay_deduplicator(deduplicator, path, state["offset"], generator, config.batch_size, owner)
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    # Caller metadata (tenant, language, ...) is stored on every point and can be used in search filters.
+    base_payload = {**(metadata or {}), "source": source, "owner": owner, "model": generator.model_name}
+    seen = set()
+
+    # Upserts run on a worker thread so batch N is written while batch N+1 is being embedded.
+    pending: "queue.Queue" = queue.Queue(maxsize=max(1, config.queue_depth))
+    failure: List[BaseException] = []
+    written = {"count": state["count"], "offset": state["offset"], "batches": 0}
+
+    def upsert_worker():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if failure:
+                continue
+            texts, vectors, offset, sha256, lines, indexed_texts = item
+            try:
+                if texts:
+                    store.insert_embeddings(
+                        texts=texts,
+                        embeddings=vectors,
+                        collection_name=collection_name,
+                        ids=[point_id(text, owner) for text in texts],
+                        payloads=[base_payload] * len(texts),
+                    )
+                if sparse_index is not None:
+                    # Tokenizing is cheap, so unchanged lines are re-indexed too; add() is an upsert.
+                    sparse_index.add([point_id(text, owner) for text in indexed_texts], indexed_texts)
+            except BaseException as e:
+                failure.append(e)
+                continue
+            written["count"] += lines
+            written["offset"] = offset
+            written["batches"] += 1
+            if checkpoint_path:
+                if sparse_index is not None and sparse_index_path:
+                    # A resumed run skips checkpointed lines, so their BM25 entries must already be on
+                    # disk. Saving rewrites the whole file, so it is done on an interval and the
+                    # checkpoint only advances with it.
+                    if written["batches"] % config.sparse_save_interval == 0:
+                        sparse_index.save(sparse_index_path)
+                        save_checkpoint(checkpoint_path, path, offset, written["count"], sha256)
+                else:
+                    save_checkpoint(checkpoint_path, path, offset, written["count"], sha256)
+            if progress:
+                progress(written["count"])
+
+    worker = threading.Thread(target=upsert_worker, name="ingest-upsert", daemon=True)
+    worker.start()
+
+    try:
+        for batch in iter_batches(iter_lines(path, state["offset"], digest), config.batch_size):
+            if failure:
+                break
+            # Taken before the next batch is read, so it covers exactly the bytes up to batch[-1]'s offset.
+            sha256 = digest.hexdigest()
+            unique_texts = [text for text, _ in batch]
+            if deduplicator is not None:
+                # Duplicates are dropped before embedding, so they cost no quota and take no top-k slots.
+                unique_texts = deduplicator.filter(unique_texts, owner)
+            texts = unique_texts
+            changes = {}
+            if config.incremental or config.prune:
+                changes = dict(select_changed(texts, generator.model_name, store, collection_name, seen, counts,
+                                              incremental=config.incremental, owner=owner))
+                texts = list(changes)
+            vectors = generator.generate_embeddings(texts) if texts else []
+            if deduplicator is not None and texts:
+                embedded_texts = texts
+                texts, vectors = deduplicator.filter_embedded(texts, vectors, owner)
+                if len(texts) < len(embedded_texts):
+                    dropped = set(embedded_texts) - set(texts)
+                    unique_texts = [text for text in unique_texts if text not in dropped]
+                    # Never written, so an older point with this id is stale and may be pruned.
+                    seen.difference_update(point_id(text, owner) for text in dropped)
+            # Counted after every filter, so the report matches what is actually written.
+            for text in texts:
+                counts[changes.get(text, "added")] += 1
+            pending.put((texts, vectors, batch[-1][1], sha256, len(batch), unique_texts))
+    finally:
+        pending.put(None)
+        worker.join()
+
+    if failure:
+        raise failure[0]
+
+    if config.prune:
+        if resumed_from:
+            # Lines read before the crash are not in `seen`, so pruning now would drop live points.
+            print("Skipping prune: run was resumed from a checkpoint")
+        else:
+            counts["removed"] = prune_missing(store, owner, seen, collection_name, sparse_index=sparse_index)
+    remove_checkpoint(checkpoint_path)
+
+    return {
+        "source": path,
+        "resumed_from": resumed_from,
+        "ingested": written["count"] - resumed_from,
+        "total": written["count"],
+        "offset": written["offset"],
+        **counts,
+        "dedup": deduplicator.stats() if deduplicator is not None else None,
+    }
+
+def replay_deduplicator(deduplicator, path: str, offset: int, generator, batch_size: int,
+                        owner: Optional[str] = None) -> None:
+    # The Deduplicator only lives in memory. On resume it is rebuilt from the lines the crashed run
+    # already ingested, so their duplicates further down the file are still dropped. The cosine pass
+    # needs their vectors again; with an embedding cache configured those are cache hits.
+    lines = takewhile(lambda item: item[1] <= offset, iter_lines(path))
+    for batch in iter_batches(lines, batch_size):
+        kept = deduplicator.filter([text for text, _ in batch], owner)
+        if kept and deduplicator.config.cosine_threshold > 0:
+            deduplicator.filter_embedded(kept, generator.generate_embeddings(kept), owner)
+
+def select_changed(
+        texts: List[str],
+        model_name: str,
+        store,
+        collection_name: Optional[str],
+        seen: set,
+        counts: dict,
+        incremental: bool = True,
+        owner: Optional[str] = None,
+        ) -> List[Tuple[str, str]]:
+    # Returns (text, "added" | "updated") for the texts to embed; only "unchanged" is counted here,
+    # since later filters may still drop some of the selected texts.
+    ids = [point_id(text, owner) for text in texts]
+    existing = {}
+    if incremental:
+        existing = store.retrieve_payloads(list(dict.fromkeys(ids)), fields=["model"], collection_name=collection_name)
+
+    selected = []
+    for text, pid in zip(texts, ids):
+        if pid in seen:
+            counts["unchanged"] += 1
+            continue
+        seen.add(pid)
+        payload = existing.get(pid)
+        if not incremental or payload is None:
+            selected.append((text, "added"))
+        elif payload.get("model") != model_name:
+            selected.append((text, "updated"))
+        else:
+            counts["unchanged"] += 1
+    return selected
+
+def prune_missing(
+        store,
+        owner: str,
+        seen: set,
+        collection_name: Optional[str] = None,
+        batch_size: int = 1000,
+        sparse_index=None,
+        ) -> int:
+    # Selects on owner rather than source, so points another tenant ingested from the same source stay.
+    store.create_payload_index("owner", "keyword", collection_name=collection_name)
+    stale = [pid for pid in store.iter_ids("owner", owner, collection_name=collection_name) if pid not in seen]
+    for i in range(0, len(stale), batch_size):
+        store.delete_points(stale[i: i + batch_size], collection_name=collection_name)
+    if sparse_index is not None:
+        sparse_index.delete(stale)
+    return len(stale)
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.embedding_backend import EmbeddingBackend
+from app.embedding_cache import normalize_text
+
+load_dotenv()
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class LocalEmbedderConfig:
+    def __init__(self):
+        self.dimension = int(os.getenv("LOCAL_EMBEDDING_DIMENSION", "768"))
+        # Simulated upstream behaviour: a fixed cost per call, a cost per text and uniform jitter on top.
+        self.latency_ms = float(os.getenv("LOCAL_EMBEDDING_LATENCY_MS", "0"))
+        self.latency_per_text_ms = float(os.getenv("LOCAL_EMBEDDING_LATENCY_PER_TEXT_MS", "0"))
+        self.jitter_ms = float(os.getenv("LOCAL_EMBEDDING_JITTER_MS", "0"))
+        # Fraction of calls failing with error_code; 429 and 5xx are retried by the batch embedder.
+        self.error_rate = float(os.getenv("LOCAL_EMBEDDING_ERROR_RATE", "0"))
+        self.error_code = int(os.getenv("LOCAL_EMBEDDING_ERROR_CODE", "429"))
+        self.seed = int(os.getenv("LOCAL_EMBEDDING_SEED", "0"))
+
+class SimulatedEmbeddingError(Exception):
+    # Carries an int `code` like google.api_core exceptions, so retry handling treats it the same way.
+    def __init__(self, code: int):
+        super().__init__(f"Simulated embedding error ({code})")
+        self.code = code
+
+def hashed_features(text: str) -> List[str]:
+    # Words, word bigrams and character trigrams: shared wording gives close vectors, and
+    # trigrams keep near-identical spellings close too.
+    words = WORD_PATTERN.findall(normalize_text(text).casefold())
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [f"c:{padded[i: i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    # Deterministic feature-hashing embedder: the same text always gives the same unit vector, in
+    # every process and on every machine. No network, so throughput, batching and caching can be
+    # measured offline, with optional simulated latency and errors standing in for the real service.
+    def __init__(self, config: Optional[LocalEmbedderConfig] = None):
+        self.config = config or LocalEmbedderConfig()
+        # Vectors of another size are another model: cache entries and stored points must not be reused.
+        self.model_name = f"local-hashing-{self.config.dimension}"
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.errors = 0
+
+    @property
+    def dimension(self) -> int:
+        return self.config.dimension
+
+    def embed(self, texts: List[str], output_dimensionality: Optional[int] = None) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            jitter = self._rng.uniform(0.0, self.config.jitter_ms) if self.config.jitter_ms else 0.0
+            fail = self.config.error_rate > 0 and self._rng.random() < self.config.error_rate
+        delay_ms = self.config.latency_ms + self.config.latency_per_text_ms * len(texts) + jitter
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            raise SimulatedEmbeddingError(self.config.error_code)
+        dimension = output_dimensionality or self.config.dimension
+        return [self.embed_one(text, dimension).tolist() for text in texts]
+
+    @staticmethod
+    def embed_one(text: str, dimension: int) -> np.ndarray:
+        vector = np.zeros(dimension, dtype=np.float32)
+        features = hashed_features(text)
+        if not features:
+            vector[0] = 1.0
+            return vector
+        digests = [hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest() for f in features]
+        hashes = np.frombuffer(b"".join(digests), dtype="<u8")
+        # Low bits pick the slot, the top bit the sign, so collisions cancel out on average.
+        slots = (hashes % np.uint64(dimension)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, slots, signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "texts": self.texts, "errors": self.errors}
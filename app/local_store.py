@@ -0,0 +1,281 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.ann_index import IVFIndex
+from app.embedding_store import DTYPES, EmbeddingStore
+from app.metrics import span
+from app.quantization import QuantizedIndex, create_quantizer
+from app.vector_index import DISTANCE_METRICS, VectorIndex
+from app.vector_store import (
+    PayloadSelector,
+    PointId,
+    SearchFilter,
+    VectorStore,
+    matches_filter,
+    point_id,
+    to_hit,
+    validate_filter,
+)
+
+load_dotenv()
+
+class LocalStoreConfig:
+    def __init__(self):
+        # Collection settings share their env vars with the Qdrant backend so the two are interchangeable.
+        self.collection_name = os.getenv("QDRANT_COLLECTION_NAME")
+        self.vector_size = int(os.getenv("QDRANT_VECTOR_SIZE", "768"))
+        self.distance_metric = os.getenv("QDRANT_DISTANCE_METRIC", "COSINE")
+        self.dtype = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+        self.block_size = int(os.getenv("LOCAL_SEARCH_BLOCK_SIZE", "65536"))
+        self.search_threads = int(os.getenv("LOCAL_SEARCH_THREADS", str(os.cpu_count() or 4)))
+        # "exact" scans every row; "ivf" probes the nearest k-means lists once enough rows are stored.
+        self.index_type = os.getenv("LOCAL_INDEX_TYPE", "exact").lower()
+        self.ivf_lists = int(os.getenv("LOCAL_IVF_LISTS", "0")) or None
+        self.ivf_nprobe = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+        self.ivf_train_size = int(os.getenv("LOCAL_IVF_TRAIN_SIZE", "10000"))
+        # "none", "sq8" (int8 per dimension, 4x smaller) or "pq" (product quantization, up to 32x smaller).
+        self.quantization = os.getenv("LOCAL_QUANTIZATION", "none").lower()
+        self.pq_subvectors = int(os.getenv("LOCAL_PQ_SUBVECTORS", "96"))
+        self.quantization_rerank = int(os.getenv("LOCAL_QUANT_RERANK", "4"))
+        self.quantization_train_size = int(os.getenv("LOCAL_QUANT_TRAIN_SIZE", "10000"))
+        # Each collection is kept as an embedding store in <dir>/<collection>: loaded when the
+        # collection is opened (API startup) and appended to on every write (ingestion), so one
+        # process can fill it and another serve it. Empty keeps collections in memory only.
+        # Persisted collections need UUID point ids, which is what ingestion derives.
+        self.directory = os.getenv("LOCAL_STORE_DIR") or None
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, config: Optional[LocalStoreConfig] = None):
+        self.config = config or LocalStoreConfig()
+        self.collections: Dict[str, VectorIndex] = {}
+        # Opened for writing on the first write, so a process that only searches never truncates
+        # or appends to a store another process is writing.
+        self._persisted: Dict[str, EmbeddingStore] = {}
+        self._persist_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.config.search_threads, thread_name_prefix="local-search")
+        print("Using in-process vector index")
+
+    def _store_path(self, name: str) -> Optional[str]:
+        return os.path.join(self.config.directory, name) if self.config.directory else None
+
+    def _load(self, name: str, index: VectorIndex, store: EmbeddingStore) -> None:
+        # Rows are replayed without writing them back.
+        loaded = 0
+        for ids, texts, vectors, payloads in store.iter_batches(with_payloads=True):
+            index.add(ids, vectors, [{**payload, "text": text} for text, payload in zip(texts, payloads)])
+            loaded += len(ids)
+        print(f"Collection {name} loaded with {loaded} points from {store.path}")
+
+    def _persist(self, name: str, index: VectorIndex) -> Optional[EmbeddingStore]:
+        path = self._store_path(name)
+        if path is None:
+            return None
+        store = self._persisted.get(name)
+        if store is None:
+            if EmbeddingStore.exists(path):
+                store = EmbeddingStore.open(path, writable=True)
+            else:
+                dtype = self.config.dtype if self.config.dtype in DTYPES else "float32"
+                store = EmbeddingStore.create(path, dimension=index.dimension, dtype=dtype)
+            self._persisted[name] = store
+        return store
+
+    def _index(self, collection_name: Optional[str]) -> VectorIndex:
+        name = collection_name or self.config.collection_name
+        index = self.collections.get(name)
+        if index is None:
+            raise ValueError(f"Collection {name} does not exist")
+        return index
+
+    def create_collection(
+            self,
+            collection_name: Optional[str] = None,
+            vector_size: Optional[int] = None,
+            distance_metric: Optional[str] = None
+            ) -> bool:
+        name = collection_name or self.config.collection_name
+        if name in self.collections:
+            print(f"Collection {name} already exists!!")
+            return True
+        dist_str = distance_metric or self.config.distance_metric
+        if dist_str not in DISTANCE_METRICS:
+            raise ValueError(f"Unsupported distance metric: {dist_str}")
+
+        path = self._store_path(name)
+        stored = EmbeddingStore.open(path) if path and EmbeddingStore.exists(path) else None
+        common = dict(
+            # A persisted collection keeps its size, like an existing Qdrant collection.
+            dimension=stored.dimension if stored is not None else vector_size or self.config.vector_size,
+            metric=DISTANCE_METRICS[dist_str],
+            dtype=np.dtype(self.config.dtype),
+            block_size=self.config.block_size,
+        )
+        if self.config.quantization != "none":
+            if self.config.index_type != "exact":
+                raise ValueError("Quantization is only supported with LOCAL_INDEX_TYPE=exact")
+            self.collections[name] = QuantizedIndex(
+                **common,
+                quantizer=create_quantizer(self.config.quantization, common["dimension"], self.config.pq_subvectors),
+                rerank=self.config.quantization_rerank,
+                train_size=self.config.quantization_train_size,
+            )
+        elif self.config.index_type == "ivf":
+            self.collections[name] = IVFIndex(
+                **common,
+                n_lists=self.config.ivf_lists,
+                nprobe=self.config.ivf_nprobe,
+                train_size=self.config.ivf_train_size,
+            )
+        elif self.config.index_type == "exact":
+            self.collections[name] = VectorIndex(**common)
+        else:
+            raise ValueError(f"Unsupported local index type: {self.config.index_type}")
+        if stored is not None:
+            self._load(name, self.collections[name], stored)
+            stored.close()
+            return True
+        print(f"Collection {name} created successfully!!")
+        return True
+
+    def get_vector_size(self, collection_name: Optional[str] = None) -> int:
+        return self._index(collection_name).dimension
+
+    def insert_embeddings(
+            self,
+            texts: List[str],
+            embeddings: List[List[float]],
+            collection_name: Optional[str] = None,
+            ids: Optional[List[PointId]] = None,
+            payloads: Optional[List[dict]] = None,
+            ) -> bool:
+        if len(texts) != len(embeddings):
+            raise ValueError("Number of texts and embeddings must be equal!!")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of ids and texts must be equal!!")
+        if payloads is not None and len(payloads) != len(texts):
+            raise ValueError("Number of payloads and texts must be equal!!")
+        if not texts:
+            return True
+
+        name = collection_name or self.config.collection_name
+        index = self._index(name)
+        ids = ids if ids is not None else [point_id(text) for text in texts]
+        rows = [{**(payloads[i] if payloads is not None else {}), "text": text} for i, text in enumerate(texts)]
+        with span("vector_upsert", batch_size=len(texts)):
+            with self._persist_lock:
+                store = self._persist(name, index)
+                if store is not None:
+                    # Unchanged points are not appended again, so re-ingesting a file does not grow the store.
+                    changed = [i for i, pid in enumerate(ids) if index.get_payload(pid) != rows[i]]
+                    store.append(
+                        [texts[i] for i in changed],
+                        [embeddings[i] for i in changed],
+                        ids=[ids[i] for i in changed],
+                        payloads=[{k: v for k, v in rows[i].items() if k != "text"} for i in changed],
+                    )
+                index.add(ids, embeddings, rows)
+        self._written()
+        print(f"{len(texts)} points inserted successfully!!")
+        return True
+
+    def retrieve_payloads(
+            self,
+            ids: List[PointId],
+            fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            ) -> Dict[PointId, dict]:
+        index = self._index(collection_name)
+        found = {}
+        for pid in ids:
+            payload = index.get_payload(pid)
+            if payload is not None:
+                found[pid] = payload if fields is None else {f: payload[f] for f in fields if f in payload}
+        return found
+
+    def iter_ids(self, field: str, value: str, collection_name: Optional[str] = None) -> Iterator[PointId]:
+        for pid, payload in self._index(collection_name).items():
+            if payload.get(field) == value:
+                yield pid
+
+    def delete_points(self, ids: List[PointId], collection_name: Optional[str] = None) -> bool:
+        name = collection_name or self.config.collection_name
+        index = self._index(name)
+        with self._persist_lock:
+            store = self._persist(name, index)
+            if store is not None:
+                store.delete([pid for pid in ids if pid in index])
+            removed = index.delete(ids)
+        self._written()
+        print(f"{removed} points deleted successfully!!")
+        return True
+
+    def create_payload_index(
+            self,
+            field: str,
+            field_schema: str = "keyword",
+            collection_name: Optional[str] = None,
+            ) -> bool:
+        # Payload lookups are plain scans over the side table; nothing to build.
+        return True
+
+    def search_similar_texts(
+            self,
+            query_vector: List[float],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[dict]:
+        return self.search_similar_texts_batch([query_vector], top_k, collection_name, query_filter, with_payload)[0]
+
+    def search_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]:
+        validate_filter(query_filter)
+        where = (lambda payload: matches_filter(payload, query_filter)) if query_filter else None
+        with span("vector_search", batch_size=len(query_vectors)):
+            results = self._index(collection_name).search(query_vectors, top_k, where)
+        return [[to_hit(pid, score, payload, with_payload) for pid, score, payload in hits] for hits in results]
+
+    async def asearch_similar_texts(
+            self,
+            query_vector: List[float],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.search_similar_texts, query_vector, top_k, collection_name, query_filter, with_payload
+        )
+
+    async def asearch_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.search_similar_texts_batch, query_vectors, top_k, collection_name, query_filter,
+            with_payload,
+        )
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False)
+        for store in self._persisted.values():
+            store.close()
@@ -0,0 +1,291 @@
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans cover everything from a cache hit (microseconds) to a retried upstream batch.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 250, 500, 1000)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        # Children are cached, so hot paths should hold on to the returned object.
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # Counts are stored per bucket and only made cumulative when rendered.
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, labelnames, values) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {count}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], Dict[str, float]]) -> None:
+        # Called at scrape time; returns {metric name: value} rendered as untyped gauges.
+        # Used for counters that already live elsewhere (cache and limiter stats).
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, value in collect().items():
+                if value is not None:
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each stage of the embedding and search pipeline.", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter("pipeline_stage_errors_total", "Exceptions raised inside each stage.", ("stage",))
+BATCH_SIZES = REGISTRY.histogram(
+    "pipeline_batch_size", "Items per upstream embedding call, vector search or upsert.", ("stage",), SIZE_BUCKETS
+)
+IN_FLIGHT = REGISTRY.gauge("pipeline_in_flight", "Stage calls currently running.", ("stage",))
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route and status.", ("path", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route.", ("path",))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+HTTP_FIRST_SECONDS = REGISTRY.gauge(
+    "http_first_request_duration_seconds", "Latency of the first request to each route since startup.", ("path",)
+)
+LOOP_LAG = REGISTRY.histogram("event_loop_lag_seconds", "Delay of a periodic event loop callback past its deadline.")
+
+class Span:
+    # Times one stage: `with span("embed", batch_size=len(texts)):`. A plain class rather than a
+    # @contextmanager generator, and one lock round-trip on each side: the per-stage children are
+    # only ever written from here, so their updates are made directly under the histogram's lock.
+    __slots__ = ("_children", "_start")
+
+    _cache: Dict[str, tuple] = {}
+
+    def __init__(self, stage: str, batch_size: Optional[int] = None):
+        children = Span._cache.get(stage)
+        if children is None:
+            children = Span._cache[stage] = (
+                STAGE_SECONDS.labels(stage), STAGE_ERRORS.labels(stage), IN_FLIGHT.labels(stage), BATCH_SIZES.labels(stage)
+            )
+        self._children = children
+        if batch_size is not None:
+            children[3].observe(batch_size)
+
+    def __enter__(self) -> "Span":
+        histogram, _, in_flight, _ = self._children
+        with histogram._lock:
+            in_flight.value += 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._start
+        histogram, errors, in_flight, _ = self._children
+        i = bisect_left(histogram.buckets, elapsed)
+        with histogram._lock:
+            histogram.counts[i] += 1
+            histogram.sum += elapsed
+            histogram.count += 1
+            in_flight.value -= 1
+            if exc_type is not None:
+                errors.value += 1
+        return False
+
+def flatten_stats(prefix: str, stats: Optional[dict]) -> Dict[str, float]:
+    # {"hits": 3, "hit_rate": 0.5} -> {"<prefix>_hits": 3, "<prefix>_hit_rate": 0.5}; non-numeric values are skipped.
+    if not stats:
+        return {}
+    return {f"{prefix}_{key}": float(value) for key, value in stats.items() if isinstance(value, (int, float))}
+
+def span(stage: str, batch_size: Optional[int] = None) -> Span:
+    return Span(stage, batch_size)
+
+async def monitor_event_loop(interval_s: float = 0.1) -> None:
+    # A blocked loop shows up as callbacks firing late; run as a background task.
+    loop = asyncio.get_running_loop()
+    while True:
+        deadline = loop.time() + interval_s
+        await asyncio.sleep(interval_s)
+        LOOP_LAG.observe(max(0.0, loop.time() - deadline))
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: per-route latency, status counts and in-flight requests. Routes are
+    # labelled by their template (/search), never the raw path, to keep label cardinality bounded.
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+        self._seen_paths = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels()
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.labels(path).observe(elapsed)
+            if path not in self._seen_paths:
+                # Cold-path cost: lazy connections, model handles and caches are all filled on first use.
+                self._seen_paths.add(path)
+                HTTP_FIRST_SECONDS.labels(path).set(elapsed)
+            HTTP_REQUESTS.labels(path, scope["method"], str(status["code"])).inc()
+            if self.profiler is not None:
+                self.profiler.submit(path, start, elapsed)
@@ -0,0 +1,121 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class ProfilerConfig:
+    def __init__(self):
+        # Requests slower than this get their stack samples written out; 0 disables the profiler.
+        self.slow_request_ms = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+        self.interval_ms = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+        # Samples older than this are discarded, so it also caps how much of a long request is kept.
+        self.window_s = float(os.getenv("PROFILE_WINDOW_S", "30"))
+        self.directory = os.getenv("PROFILE_DIR", "profiles")
+        self.max_profiles = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_request_ms > 0
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame, limit: int = 64) -> str:
+    names = []
+    while frame is not None and len(names) < limit:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SlowRequestProfiler:
+    # Sampling profiler: a daemon thread records the stack of every other thread at a fixed
+    # interval into a time-bounded ring buffer. Nothing is written unless a request turns out to be
+    # slow; then the samples taken during it are saved in folded format (one "a;b;c count" line per
+    # stack), which flamegraph.pl and speedscope read directly. Threadpool and executor threads are
+    # sampled too, so time spent in embedding or store calls shows up under their thread names.
+    def __init__(self, config: Optional[ProfilerConfig] = None):
+        self.config = config or ProfilerConfig()
+        self._samples: deque = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Profiles are written on their own thread so a slow disk never stalls the event loop.
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.saved: List[str] = []
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        interval = self.config.interval_ms / 1000
+        while not self._stop.wait(interval):
+            self.sample(skip=own)
+
+    def sample(self, skip: Optional[int] = None) -> None:
+        now = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = [
+            f"{names.get(ident, ident)};{collapse_stack(frame)}"
+            for ident, frame in sys._current_frames().items()
+            if ident != skip
+        ]
+        with self._lock:
+            self._samples.append((now, stacks))
+            while self._samples and self._samples[0][0] < now - self.config.window_s:
+                self._samples.popleft()
+
+    def submit(self, path: str, start: float, elapsed: float) -> Optional[Future]:
+        # Called by the middleware on the event loop: only the threshold check runs inline, the
+        # profile is collected and written by request_finished on the writer thread.
+        if elapsed * 1000 < self.config.slow_request_ms:
+            return None
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+            return self._writer.submit(self.request_finished, path, start, elapsed)
+
+    def request_finished(self, path: str, start: float, elapsed: float) -> Optional[str]:
+        if elapsed * 1000 < self.config.slow_request_ms or len(self.saved) >= self.config.max_profiles:
+            return None
+        with self._lock:
+            window = [stacks for t, stacks in self._samples if start <= t <= start + elapsed]
+        if not window:
+            return None
+        counts = Counter(stack for stacks in window for stack in stacks)
+        name = re.sub(r"[^\w.-]+", "_", path.strip("/")) or "root"
+        file_path = os.path.join(self.config.directory, f"{int(time.time() * 1000)}-{name}-{elapsed * 1000:.0f}ms.folded")
+        try:
+            os.makedirs(self.config.directory, exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Error writing profile {file_path}: {e}")
+            return None
+        self.saved.append(file_path)
+        print(f"Slow request {path} took {elapsed * 1000:.1f} ms; {len(window)} samples written to {file_path}")
+        return file_path
@@ -1,24 +1,73 @@
 import os
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List, Union
 
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from qdrant_client.models import VectorParams
 
+from app.metrics import span
+from app.vector_store import (
+    PayloadSelector,
+    SearchFilter,
+    VectorStore,
+    point_id,
+    prepare_collection,
+    to_hit,
+    validate_filter,
+)
+
 load_dotenv()
 
+def parse_payload_indexes(spec: str) -> Dict[str, str]:
+    # "tenant:keyword,year:integer" -> {"tenant": "keyword", "year": "integer"}; the schema defaults to keyword.
+    indexes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        field, _, schema = entry.partition(":")
+        indexes[field.strip()] = (schema.strip() or "keyword").lower()
+    return indexes
+
 class QdrantConfig:
     def __init__(self):
         self.url = os.getenv("QDRANT_URL")
         self.collection_name = os.getenv("QDRANT_COLLECTION_NAME")
         self.vector_size = int(os.getenv("QDRANT_VECTOR_SIZE"))
         self.distance_metric = os.getenv("QDRANT_DISTANCE_METRIC")
+        self.upsert_batch_size = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+        self.upsert_parallel = int(os.getenv("QDRANT_UPSERT_PARALLEL", "1"))
+        # Native quantization applied to new collections: "none", "scalar" (int8) or "binary".
+        self.quantization = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+        self.quantization_always_ram = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+        self.quantization_rescore = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+        self.quantization_oversampling = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+        # Payload fields used in search filters. Indexed fields let Qdrant filter inside the HNSW
+        # traversal instead of falling back to a full scan of the matching points.
+        self.payload_indexes = parse_payload_indexes(os.getenv("QDRANT_PAYLOAD_INDEXES", ""))
+        # Connection: gRPC multiplexes concurrent calls over a small pool of HTTP/2 channels and skips
+        # JSON encoding of vectors. The REST client uses the pool size as its connection limit.
+        self.prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+        self.grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+        self.pool_size = int(os.getenv("QDRANT_POOL_SIZE", "0")) or None
+        self.timeout_s = int(os.getenv("QDRANT_TIMEOUT_S", "10"))
+        # The version check is an extra round-trip on every client construction.
+        self.check_compatibility = os.getenv("QDRANT_CHECK_COMPATIBILITY", "false").lower() == "true"
+
+    def client_options(self) -> dict:
+        return {
+            "url": self.url,
+            "prefer_grpc": self.prefer_grpc,
+            "grpc_port": self.grpc_port,
+            "pool_size": self.pool_size,
+            "timeout": self.timeout_s,
+            "check_compatibility": self.check_compatibility,
+        }
 
-class QdrantVectorStore:
+class QdrantVectorStore(VectorStore):
     def __init__(self, config: Optional[QdrantConfig] = None):
         self.config = config or QdrantConfig()
-        self.client = QdrantClient(url=self.config.url)
-        print("Connected to Qdrant Successfully!!")
+        # Clients connect lazily, so nothing here touches the network.
+        self.client = QdrantClient(**self.config.client_options())
+        self.async_client = AsyncQdrantClient(**self.config.client_options())
+        print(f"Qdrant client created for {self.config.url} ({'gRPC' if self.config.prefer_grpc else 'REST'})")
 
     def create_collection(
             self,
@@ -31,11 +80,12 @@ class QdrantVectorStore:
         dist_str = distance_metric or self.config.distance_metric
 
         try:
-            existing_collections = self.client.get_collections().collections
-            for coll in existing_collections:
-                if coll.name == name:
-                    print(f"Collection {name} already exists!!")
-                    return True
+            # A single lookup instead of listing every collection on the server.
+            if self.client.collection_exists(name):
+                print(f"Collection {name} already exists!!")
+                # Creating an existing index is a no-op, so fields declared later are picked up too.
+                self._create_payload_indexes(name)
+                return True
             if not hasattr(models.Distance, dist_str):
                 raise ValueError(f"Unsupported distance metric: {dist_str}")
             dist_enum = getattr(models.Distance, dist_str)
@@ -45,8 +95,10 @@ class QdrantVectorStore:
                 vectors_config=VectorParams(
                     size=size,
                     distance=dist_enum
-                )
+                ),
+                quantization_config=self._quantization_config(),
             )
+            self._create_payload_indexes(name)
             print(f"Collection {name} created successfully!!")
             return True
 
@@ -54,65 +106,314 @@ class QdrantVectorStore:
             print(f"Error creating collection: {str(e)}")
             raise e
 
+    def _create_payload_indexes(self, name: str) -> None:
+        for field, schema in self.config.payload_indexes.items():
+            self.create_payload_index(field, schema, collection_name=name)
+
+    def get_vector_size(self, collection_name: Optional[str] = None) -> int:
+        name = collection_name or self.config.collection_name
+        vectors = self.client.get_collection(name).config.params.vectors
+        if not isinstance(vectors, VectorParams):
+            raise ValueError(f"Collection {name} uses named vectors, which are not supported")
+        return vectors.size
+
+    def _quantization_config(self) -> Optional[models.QuantizationConfig]:
+        kind = self.config.quantization
+        if kind == "none":
+            return None
+        if kind == "scalar":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=self.config.quantization_always_ram,
+            ))
+        if kind == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(
+                always_ram=self.config.quantization_always_ram,
+            ))
+        raise ValueError(f"Unsupported Qdrant quantization: {kind}")
+
+    def _search_params(self) -> Optional[models.SearchParams]:
+        # Rescoring re-ranks the oversampled quantized candidates with the original vectors.
+        if self.config.quantization == "none":
+            return None
+        return models.SearchParams(quantization=models.QuantizationSearchParams(
+            rescore=self.config.quantization_rescore,
+            oversampling=self.config.quantization_oversampling,
+        ))
+
+    @staticmethod
+    def _to_filter(query_filter: Optional[SearchFilter]) -> Optional[models.Filter]:
+        validate_filter(query_filter)
+        if not query_filter:
+            return None
+        conditions = []
+        for field, condition in query_filter.items():
+            if isinstance(condition, dict):
+                conditions.append(models.FieldCondition(key=field, range=models.Range(**condition)))
+            elif isinstance(condition, list):
+                conditions.append(models.FieldCondition(key=field, match=models.MatchAny(any=condition)))
+            else:
+                conditions.append(models.FieldCondition(key=field, match=models.MatchValue(value=condition)))
+        return models.Filter(must=conditions)
+
+    @staticmethod
+    def _payload_selector(with_payload: PayloadSelector) -> Union[bool, List[str]]:
+        # Only the fields a hit needs are sent back, never the whole payload by default.
+        if with_payload is True:
+            return True
+        return list(dict.fromkeys(["text", *(with_payload or [])]))
+
     def insert_embeddings(
             self,
             texts: List[str],
             embeddings: List[List[float]],
             collection_name: Optional[str] = None,
+            ids: Optional[List[Union[int, str]]] = None,
+            payloads: Optional[List[dict]] = None,
             ) -> bool:
 
         name = collection_name or self.config.collection_name
         if len(texts) != len(embeddings):
             raise ValueError("Number of texts and embeddings must be equal!!")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of ids and texts must be equal!!")
+        if payloads is not None and len(payloads) != len(texts):
+            raise ValueError("Number of payloads and texts must be equal!!")
+        if not texts:
+            return True
 
-        try:
-            points = []
-            for idx, (text, vector) in enumerate(zip(texts, embeddings)):
-                points.append(models.PointStruct(
-                    id=idx,
-                    vector=vector,
-                    payload={"text": text}
-                ))
-
-            self.client.upsert(
-                collection_name=name,
-                points=points
+        # Built lazily: upload_points pulls one chunk at a time, so only the chunks in flight
+        # are held as PointStructs instead of a second full copy of the batch.
+        points = (
+            models.PointStruct(
+                id=ids[idx] if ids is not None else point_id(text),
+                vector=vector,
+                payload={**(payloads[idx] if payloads is not None else {}), "text": text},
             )
-            print(f"{len(points)} points inserted successfully!!")
+            for idx, (text, vector) in enumerate(zip(texts, embeddings))
+        )
+        try:
+            with span("vector_upsert", batch_size=len(texts)):
+                # wait=True on every chunk: a chunk only counts as written once Qdrant has applied it,
+                # on every shard it touched, and failed chunks raise here instead of being dropped
+                # silently. Throughput comes from the parallel upload streams and, during ingestion,
+                # from embedding the next batch while this one is written.
+                self.client.upload_points(
+                    collection_name=name,
+                    points=points,
+                    batch_size=self.config.upsert_batch_size,
+                    parallel=self.config.upsert_parallel,
+                    wait=True,
+                )
+            self._written()
+            print(f"{len(texts)} points inserted successfully!!")
             return True
 
         except Exception as e:
             print(f"Error inserting embeddings: {str(e)}")
             raise e
 
+    def retrieve_payloads(
+            self,
+            ids: List[Union[int, str]],
+            fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+            ) -> Dict[Union[int, str], dict]:
+        name = collection_name or self.config.collection_name
+        found = {}
+        for i in range(0, len(ids), batch_size):
+            records = self.client.retrieve(
+                collection_name=name,
+                ids=ids[i: i + batch_size],
+                with_payload=fields if fields is not None else True,
+                with_vectors=False,
+            )
+            for record in records:
+                found[record.id] = record.payload or {}
+        return found
+
+    def iter_ids(
+            self,
+            field: str,
+            value: str,
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+            ) -> Iterator[Union[int, str]]:
+        name = collection_name or self.config.collection_name
+        scroll_filter = models.Filter(
+            must=[models.FieldCondition(key=field, match=models.MatchValue(value=value))]
+        )
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            for record in records:
+                yield record.id
+            if offset is None:
+                return
+
+    def delete_points(
+            self,
+            ids: List[Union[int, str]],
+            collection_name: Optional[str] = None,
+            ) -> bool:
+        name = collection_name or self.config.collection_name
+        if not ids:
+            return True
+        try:
+            self.client.delete(
+                collection_name=name,
+                points_selector=models.PointIdsList(points=ids),
+                wait=True,
+            )
+            self._written()
+            print(f"{len(ids)} points deleted successfully!!")
+            return True
+        except Exception as e:
+            print(f"Error deleting points: {str(e)}")
+            raise e
+
+    def create_payload_index(
+            self,
+            field: str,
+            field_schema: str = "keyword",
+            collection_name: Optional[str] = None,
+            ) -> bool:
+        name = collection_name or self.config.collection_name
+        self.client.create_payload_index(
+            collection_name=name,
+            field_name=field,
+            field_schema=models.PayloadSchemaType(field_schema),
+            wait=True,
+        )
+        return True
+
     def search_similar_texts(
             self,
             query_vector: List[float],
             top_k: int = 3,
-            collection_name: Optional[str] = None
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
             ) -> List[dict]:
         name = collection_name or self.config.collection_name
         try:
-            res = self.client.query_points(
-                collection_name=name,
-                query=query_vector,
-                limit=top_k,
-                with_payload=True,
-                with_vectors=False,
-            )
-            hits = []
-            for p in res.points:
-                hits.append({
-                    "id": p.id,
-                    "text": (p.payload or {}).get("text"),
-                    "score": p.score,
-                })
-            return hits
+            with span("vector_search", batch_size=1):
+                res = self.client.query_points(
+                    collection_name=name,
+                    query=query_vector,
+                    query_filter=self._to_filter(query_filter),
+                    limit=top_k,
+                    with_payload=self._payload_selector(with_payload),
+                    with_vectors=False,
+                    search_params=self._search_params(),
+                )
+            return self._to_hits(res.points, with_payload)
+        except Exception as e:
+            print(f"Error searching similar texts: {str(e)}")
+            raise e
+
+    async def asearch_similar_texts(
+            self,
+            query_vector: List[float],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[dict]:
+        name = collection_name or self.config.collection_name
+        try:
+            with span("vector_search", batch_size=1):
+                res = await self.async_client.query_points(
+                    collection_name=name,
+                    query=query_vector,
+                    query_filter=self._to_filter(query_filter),
+                    limit=top_k,
+                    with_payload=self._payload_selector(with_payload),
+                    with_vectors=False,
+                    search_params=self._search_params(),
+                )
+            return self._to_hits(res.points, with_payload)
+        except Exception as e:
+            print(f"Error searching similar texts: {str(e)}")
+            raise e
+
+    def search_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]:
+        name = collection_name or self.config.collection_name
+        try:
+            with span("vector_search", batch_size=len(query_vectors)):
+                responses = self.client.query_batch_points(
+                    collection_name=name,
+                    requests=self._batch_requests(
+                        query_vectors, top_k, self._search_params(), self._to_filter(query_filter), with_payload
+                    ),
+                )
+            return [self._to_hits(r.points, with_payload) for r in responses]
+        except Exception as e:
+            print(f"Error searching similar texts: {str(e)}")
+            raise e
+
+    async def asearch_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]:
+        name = collection_name or self.config.collection_name
+        try:
+            with span("vector_search", batch_size=len(query_vectors)):
+                responses = await self.async_client.query_batch_points(
+                    collection_name=name,
+                    requests=self._batch_requests(
+                        query_vectors, top_k, self._search_params(), self._to_filter(query_filter), with_payload
+                    ),
+                )
+            return [self._to_hits(r.points, with_payload) for r in responses]
         except Exception as e:
             print(f"Error searching similar texts: {str(e)}")
             raise e
 
-def initialize_collection() -> QdrantVectorStore:
+    @staticmethod
+    def _batch_requests(
+            query_vectors: List[List[float]],
+            top_k: int,
+            params: Optional[models.SearchParams] = None,
+            query_filter: Optional[models.Filter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[models.QueryRequest]:
+        selector = QdrantVectorStore._payload_selector(with_payload)
+        return [
+            models.QueryRequest(query=vector, filter=query_filter, limit=top_k, with_payload=selector,
+                                with_vector=False, params=params)
+            for vector in query_vectors
+        ]
+
+    @staticmethod
+    def _to_hits(points, with_payload: PayloadSelector = False) -> List[dict]:
+        return [to_hit(p.id, p.score, p.payload, with_payload) for p in points]
+
+    async def aclose(self) -> None:
+        await self.async_client.close()
+        self.client.close()
+
+def initialize_collection(dimension: Optional[int] = None) -> QdrantVectorStore:
     store = QdrantVectorStore()
-    store.create_collection()
+    prepare_collection(store, dimension)
     return store
\ No newline at end of file
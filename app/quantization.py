@@ -0,0 +1,301 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.ann_index import assign_clusters, kmeans
+from app.similarity import METRICS, as_matrix, blocked_top_k, normalize_rows, top_k_indices
+from app.vector_index import PayloadPredicate, PointId, VectorIndex
+
+class Quantizer(ABC):
+    # Encodes float vectors into compact codes and scores float queries against the codes
+    # directly (asymmetric distance: the query is never quantized).
+    code_dtype = np.uint8
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @property
+    @abstractmethod
+    def code_size(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def is_trained(self) -> bool: ...
+
+    @abstractmethod
+    def fit(self, vectors) -> "Quantizer": ...
+
+    @abstractmethod
+    def encode(self, vectors) -> np.ndarray: ...
+
+    @abstractmethod
+    def decode(self, codes: np.ndarray) -> np.ndarray: ...
+
+    @abstractmethod
+    def inner_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray: ...
+
+    @abstractmethod
+    def squared_distances(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray: ...
+
+    def scores(self, queries, codes: np.ndarray, metric: str = "cosine") -> np.ndarray:
+        # Cosine expects normalized queries and vectors normalized before encoding.
+        queries = as_matrix(queries)
+        if metric == "euclidean":
+            return np.sqrt(np.maximum(self.squared_distances(queries, codes), 0.0))
+        return self.inner_products(queries, codes)
+
+class ScalarQuantizer(Quantizer):
+    # One int8 per dimension: x ~= offset + (code + 128) * scale, with offset/scale fit per dimension.
+    code_dtype = np.int8
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.dimension
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, vectors) -> "ScalarQuantizer":
+        vectors = as_matrix(vectors)
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+        self.offset, self.scale = low, scale.astype(np.float32)
+        return self
+
+    def encode(self, vectors) -> np.ndarray:
+        # Values outside the fitted range (rows added after training) are clipped.
+        levels = np.rint((as_matrix(vectors) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + (codes.astype(np.float32) + 128.0) * self.scale
+
+    def inner_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q.x ~= sum((code + 128) * scale * q) + q.offset, so the scale folds into the query.
+        weighted = queries * self.scale
+        return ((codes.astype(np.float32) @ weighted.T).T
+                + (128.0 * weighted.sum(axis=1) + queries @ self.offset)[:, None])
+
+    def squared_distances(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        decoded = self.decode(codes)
+        return (np.einsum("ij,ij->i", queries, queries)[:, None]
+                + np.einsum("ij,ij->i", decoded, decoded)[None, :]
+                - 2.0 * (queries @ decoded.T))
+
+class ProductQuantizer(Quantizer):
+    # Splits vectors into n_subvectors chunks and replaces each chunk with the index of its
+    # nearest centroid in a per-chunk codebook, so a 768-d float32 vector becomes 96 bytes.
+    def __init__(self, dimension: int, n_subvectors: int = 96, n_bits: int = 8, n_iter: int = 20, seed: int = 0):
+        super().__init__(dimension)
+        if dimension % n_subvectors:
+            raise ValueError(f"Dimension {dimension} is not divisible by {n_subvectors} subvectors")
+        if not 1 <= n_bits <= 8:
+            raise ValueError("n_bits must be between 1 and 8")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = 2 ** n_bits
+        self.sub_dimension = dimension // n_subvectors
+        self.n_iter = n_iter
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.n_subvectors
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _split(self, vectors) -> np.ndarray:
+        # (n, d) -> (n_subvectors, n, sub_dimension)
+        vectors = as_matrix(vectors)
+        return vectors.reshape(len(vectors), self.n_subvectors, self.sub_dimension).transpose(1, 0, 2)
+
+    def fit(self, vectors) -> "ProductQuantizer":
+        parts = self._split(vectors)
+        if parts.shape[1] < self.n_centroids:
+            raise ValueError(f"Need at least {self.n_centroids} training vectors, got {parts.shape[1]}")
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(part), self.n_centroids, self.n_iter, spherical=False, seed=self.seed + j)
+            for j, part in enumerate(parts)
+        ])
+        return self
+
+    def encode(self, vectors) -> np.ndarray:
+        parts = self._split(vectors)
+        codes = np.empty((parts.shape[1], self.n_subvectors), dtype=np.uint8)
+        for j, part in enumerate(parts):
+            codes[:, j] = assign_clusters(part, self.codebooks[j], spherical=False)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.n_subvectors)]
+        return np.concatenate(parts, axis=1) if parts else np.empty((len(codes), 0), dtype=np.float32)
+
+    def _lookup(self, tables: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # tables: (n_queries, n_subvectors, n_centroids); the score is a sum of one table entry per chunk.
+        scores = np.zeros((tables.shape[0], codes.shape[0]), dtype=np.float32)
+        for j in range(self.n_subvectors):
+            scores += tables[:, j, codes[:, j]]
+        return scores
+
+    def inner_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        tables = np.einsum("jqs,jcs->qjc", self._split(queries), self.codebooks)
+        return self._lookup(tables, codes)
+
+    def squared_distances(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        parts = self._split(queries)
+        tables = (np.einsum("jqs,jqs->qj", parts, parts)[:, :, None]
+                  + np.einsum("jcs,jcs->jc", self.codebooks, self.codebooks)[None, :, :]
+                  - 2.0 * np.einsum("jqs,jcs->qjc", parts, self.codebooks))
+        return self._lookup(tables, codes)
+
+class QuantizedIndex(VectorIndex):
+    # VectorIndex that scans quantized codes instead of float rows. With rerank > 0 the float
+    # rows are kept too and the best k * rerank candidates are re-scored exactly; with rerank == 0
+    # the floats are dropped after training and only the codes stay in memory.
+    # Rows are kept as floats until train_size rows exist, then the quantizer is fit and everything is encoded.
+    def __init__(
+            self,
+            dimension: int,
+            quantizer: Quantizer,
+            metric: str = "cosine",
+            dtype=np.float32,
+            block_size: int = 65536,
+            initial_capacity: int = 1024,
+            rerank: int = 0,
+            train_size: int = 10000,
+            ):
+        super().__init__(dimension, metric, dtype, block_size, initial_capacity)
+        self.quantizer = quantizer
+        self.rerank = rerank
+        self.train_size = train_size
+        self._codes = np.empty((initial_capacity, quantizer.code_size), dtype=quantizer.code_dtype)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.quantizer.is_trained
+
+    @property
+    def _keeps_floats(self) -> bool:
+        return self.rerank > 0 or not self.is_trained
+
+    @property
+    def nbytes(self) -> int:
+        n = len(self)
+        return self._codes[:n].nbytes + (self._vectors[:n].nbytes if self._keeps_floats else 0)
+
+    def add(self, ids: Sequence[PointId], vectors, payloads: Optional[Sequence[dict]] = None) -> None:
+        super().add(ids, vectors, payloads)
+        if not self.is_trained and len(self) >= self.train_size:
+            self.train()
+
+    def train(self, vectors=None) -> None:
+        with self._lock.write():
+            n = len(self._ids)
+            data = self._vectors[:n].astype(np.float32) if vectors is None else as_matrix(vectors)
+            if vectors is not None and self.metric == "cosine":
+                data = normalize_rows(data)
+            self.quantizer.fit(data)
+            for start in range(0, n, self.block_size):
+                end = min(start + self.block_size, n)
+                self._codes[start:end] = self.quantizer.encode(self._vectors[start:end])
+            if not self._keeps_floats:
+                self._vectors = np.empty((0, self.dimension), dtype=self.dtype)
+            self._version += 1
+
+    def _store_rows(self, rows: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> None:
+        self._sq_norms[rows] = sq_norms
+        if self._keeps_floats:
+            self._vectors[rows] = matrix
+        if self.is_trained:
+            self._codes[rows] = self.quantizer.encode(matrix)
+
+    def _move_row(self, src: int, dst: int) -> None:
+        self._sq_norms[dst] = self._sq_norms[src]
+        self._codes[dst] = self._codes[src]
+        if self._keeps_floats:
+            self._vectors[dst] = self._vectors[src]
+
+    def _reserve(self, needed: int) -> None:
+        capacity = self._codes.shape[0]
+        if needed <= capacity:
+            return
+        n = len(self._ids)
+        new_capacity = max(needed, capacity * 2)
+        codes = np.empty((new_capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+        codes[:n] = self._codes[:n]
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        sq_norms[:n] = self._sq_norms[:n]
+        self._codes, self._sq_norms = codes, sq_norms
+        if self._keeps_floats:
+            vectors = np.empty((new_capacity, self.dimension), dtype=self.dtype)
+            vectors[:n] = self._vectors[:n]
+            self._vectors = vectors
+
+    def vectors(self) -> np.ndarray:
+        with self._lock.read():
+            if self._keeps_floats:
+                return self._vectors[:len(self._ids)].astype(np.float32)
+            return self.quantizer.decode(self._codes[:len(self._ids)]).astype(np.float32)
+
+    def search(self, queries, k: int, where: Optional[PayloadPredicate] = None) -> List[List[Tuple[PointId, float, dict]]]:
+        if not self.is_trained:
+            return super().search(queries, k, where)
+        queries = as_matrix(queries)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Expected queries of dimension {self.dimension}, got {queries.shape[1]}")
+        if self.metric == "cosine":
+            queries = normalize_rows(queries)
+        largest = METRICS[self.metric]
+
+        with self._lock.read():
+            mask = self._filter_mask(where)
+            selected = None if mask is None else np.flatnonzero(mask)
+            n = len(self._ids) if selected is None else len(selected)
+            if n == 0 or k <= 0:
+                return [[] for _ in range(queries.shape[0])]
+            n_candidates = k * self.rerank if self.rerank > 0 else k
+            idx, scores = blocked_top_k(
+                lambda start, end: self.quantizer.scores(
+                    queries,
+                    self._codes[start:end] if selected is None else self._codes[selected[start:end]],
+                    self.metric,
+                ),
+                n, queries.shape[0], n_candidates, largest, self.block_size,
+            )
+            if selected is not None:
+                idx = selected[idx]
+            if self.rerank > 0:
+                idx, scores = self._rerank(queries, idx, k, largest)
+            return [
+                [(self._ids[j], float(score), self._payloads[j]) for j, score in zip(row_idx, row_scores)]
+                for row_idx, row_scores in zip(idx, scores)
+            ]
+
+    def _rerank(self, queries: np.ndarray, candidates: np.ndarray, k: int, largest: bool) -> Tuple[np.ndarray, np.ndarray]:
+        # Exact scores for the shortlisted rows only.
+        rows = self._vectors[candidates].astype(np.float32)
+        exact = np.einsum("qcd,qd->qc", rows, queries)
+        if self.metric == "euclidean":
+            squared = (np.einsum("qd,qd->q", queries, queries)[:, None]
+                       + self._sq_norms[candidates] - 2.0 * exact)
+            exact = np.sqrt(np.maximum(squared, 0.0))
+        keep = top_k_indices(exact, k, largest)
+        return np.take_along_axis(candidates, keep, axis=1), np.take_along_axis(exact, keep, axis=1)
+
+def create_quantizer(kind: str, dimension: int, n_subvectors: int = 96) -> Quantizer:
+    kind = kind.lower()
+    if kind == "sq8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, n_subvectors=n_subvectors)
+    raise ValueError(f"Unsupported quantization: {kind}")
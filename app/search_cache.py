@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.embedding_cache import normalize_text
+from app.shared_cache import SQLiteConnections, shared_cache_path
+
+load_dotenv()
+
+class SearchCacheConfig:
+    def __init__(self):
+        self.enabled = os.getenv("SEARCH_CACHE_ENABLED", "false").lower() == "true"
+        self.max_entries = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+        # Also bounds staleness after writes by processes that do not share the store's write stamp
+        # (VECTOR_STORE_WRITE_STAMP or SHARED_CACHE_DIR), which the generation check cannot see.
+        self.ttl_s = float(os.getenv("SEARCH_CACHE_TTL_S", "300"))
+        # Cosine similarity between query embeddings above which cached hits are reused; 0 disables.
+        self.similarity = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0"))
+        # SQLite tier for exact lookups shared by all workers; defaults to SHARED_CACHE_DIR when that is set.
+        self.path = os.getenv("SEARCH_CACHE_PATH") or shared_cache_path("search.sqlite")
+        self.shared_max_entries = int(os.getenv("SEARCH_CACHE_SHARED_SIZE", "100000"))
+
+def options_key(top_k: int, mode: str, query_filter: Optional[dict], with_payload) -> str:
+    # Hits are only shared between queries that asked for the same thing.
+    return json.dumps([top_k, mode, query_filter, with_payload], sort_keys=True, separators=(",", ":"))
+
+class SearchCache:
+    # LRU + TTL cache of search results. Exact lookups are keyed by normalized query text;
+    # semantic lookups compare the query embedding with the embeddings of cached queries in one
+    # matrix-vector product. Everything is dropped when the store generation changes.
+    def __init__(self, config: Optional[SearchCacheConfig] = None):
+        self.config = config or SearchCacheConfig()
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        # One row per slot; a slot is free when its owner is None.
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_owner: List[Optional[Tuple[str, str]]] = []
+        self._free_slots: List[int] = []
+        # Semantic matching stays per process; the shared tier only answers exact lookups.
+        self._db = None
+        if self.config.path:
+            self._db = SQLiteConnections(self.config.path, [
+                "CREATE TABLE IF NOT EXISTS search_results (key TEXT PRIMARY KEY, hits TEXT NOT NULL, expires REAL NOT NULL)"
+            ])
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str, options: str, generation: int) -> Optional[List[dict]]:
+        with self._lock:
+            self._check_generation(generation)
+            key = (normalize_text(text), options)
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["hits"]
+        if self._db is None:
+            return None
+
+        # Read outside the lock; another worker may have cached this query already.
+        shared = self._shared_get(key)
+        if shared is None:
+            return None
+        hits, expires = shared
+        with self._lock:
+            self._check_generation(generation)
+            self._insert(key, hits, time.monotonic() + (expires - time.time()), None)
+            self.shared_hits += 1
+        return hits
+
+    def get_similar(self, vector, options: str, generation: int) -> Optional[List[dict]]:
+        # Only called after an exact miss, so a semantic miss is the final miss for the query.
+        with self._lock:
+            self._check_generation(generation)
+            best = None
+            if self.config.similarity > 0 and self._matrix is not None and self._entries:
+                query = self._unit(vector)
+                if query.shape[0] == self._matrix.shape[1]:
+                    scores = self._matrix @ query
+                    now = time.monotonic()
+                    for slot in np.argsort(-scores):
+                        if scores[slot] < self.config.similarity:
+                            break
+                        owner = self._slot_owner[slot]
+                        if owner is not None and owner[1] == options and self._entries[owner]["expires"] > now:
+                            best = owner
+                            break
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.semantic_hits += 1
+            return self._entries[best]["hits"]
+
+    def miss(self) -> None:
+        # Records a miss for lookups that never reach get_similar (sparse mode, semantic matching off).
+        with self._lock:
+            self.misses += 1
+
+    def put(self, text: str, options: str, hits: List[dict], generation: int, vector=None) -> None:
+        with self._lock:
+            self._check_generation(generation)
+            key = (normalize_text(text), options)
+            if key in self._entries:
+                self._remove(key)
+            slot = None
+            if vector is not None and self.config.similarity > 0:
+                slot = self._claim_slot(self._unit(vector))
+            self._insert(key, hits, time.monotonic() + self.config.ttl_s, slot)
+        if self._db is not None:
+            self._shared_put(key, hits)
+
+    def _insert(self, key: Tuple[str, str], hits: List[dict], expires: float, slot: Optional[int]) -> None:
+        # Called under the lock.
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = {"hits": hits, "expires": expires, "slot": slot}
+        if slot is not None:
+            self._slot_owner[slot] = key
+        while len(self._entries) > self.config.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    @staticmethod
+    def _shared_key(key: Tuple[str, str]) -> str:
+        return json.dumps(key, ensure_ascii=False)
+
+    def _shared_get(self, key: Tuple[str, str]) -> Optional[Tuple[List[dict], float]]:
+        # Expiry is wall-clock time here, since monotonic clocks are not comparable between processes.
+        try:
+            row = self._db.execute(
+                "SELECT hits, expires FROM search_results WHERE key = ? AND expires > ?",
+                (self._shared_key(key), time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._shared_error(e)
+            return None
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def _shared_put(self, key: Tuple[str, str], hits: List[dict]) -> None:
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_results (key, hits, expires) VALUES (?, ?, ?)",
+                (self._shared_key(key), json.dumps(hits), time.time() + self.config.ttl_s),
+            )
+            self._db.trim("search_results", self.config.shared_max_entries)
+        except sqlite3.Error as e:
+            self._shared_error(e)
+
+    def _shared_error(self, e: sqlite3.Error) -> None:
+        with self._lock:
+            self.shared_errors += 1
+        print(f"Error accessing shared search cache: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM search_results")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "shared": self._db is not None,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "shared_errors": self.shared_errors,
+                "generation": self._generation,
+            }
+
+    def _check_generation(self, generation: int) -> None:
+        # Called under the lock. Every write to the store changes its generation, which makes every entry stale.
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            if self._db is not None and self._generation is not None:
+                # The store changed; results cached by other workers are stale as well.
+                try:
+                    self._db.execute("DELETE FROM search_results")
+                except sqlite3.Error as e:
+                    self.shared_errors += 1
+                    print(f"Error accessing shared search cache: {e}")
+            self._clear()
+            self._generation = generation
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._slot_owner = [None] * len(self._slot_owner)
+        self._free_slots = list(range(len(self._slot_owner)))
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        if entry["slot"] is not None:
+            self._slot_owner[entry["slot"]] = None
+            self._free_slots.append(entry["slot"])
+
+    def _claim_slot(self, vector: np.ndarray) -> Optional[int]:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.config.max_entries + 1, vector.shape[0]), dtype=np.float32)
+            self._slot_owner = [None] * self._matrix.shape[0]
+            self._free_slots = list(range(self._matrix.shape[0]))
+        if vector.shape[0] != self._matrix.shape[1] or not self._free_slots:
+            return None
+        slot = self._free_slots.pop()
+        self._matrix[slot] = vector
+        return slot
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class SharedCacheConfig:
+    def __init__(self):
+        # Directory for cache files shared by every worker on the host; unset keeps caches per process.
+        self.directory = os.getenv("SHARED_CACHE_DIR") or None
+        # false keeps the caches per process but still aggregates /stats over workers, for comparisons.
+        self.share_caches = os.getenv("SHARED_CACHE_CACHES", "true").lower() == "true"
+        # Writers wait at most this long for the write lock, then skip the write instead of stalling a request.
+        self.busy_timeout_s = float(os.getenv("SHARED_CACHE_BUSY_TIMEOUT_S", "0.5"))
+        # Readers go through a memory map of the file instead of read() calls.
+        self.mmap_bytes = int(os.getenv("SHARED_CACHE_MMAP_BYTES", str(256 * 1024 * 1024)))
+        # Workers publish their counters this often; /stats sums the ones seen within stats_max_age_s.
+        self.stats_interval_s = float(os.getenv("SHARED_CACHE_STATS_INTERVAL_S", "1"))
+        self.stats_max_age_s = float(os.getenv("SHARED_CACHE_STATS_MAX_AGE_S", "30"))
+
+def shared_cache_path(filename: str, config: Optional[SharedCacheConfig] = None) -> Optional[str]:
+    config = config or SharedCacheConfig()
+    if not config.directory or not config.share_caches:
+        return None
+    os.makedirs(config.directory, exist_ok=True)
+    return os.path.join(config.directory, filename)
+
+class SQLiteConnections:
+    # One connection per thread to a WAL-mode SQLite file. WAL readers see a consistent snapshot
+    # without taking the write lock, so lookups in one process never wait on writes in another;
+    # writers serialize on a single lock with a short busy timeout.
+    def __init__(self, path: str, schema: Sequence[str] = (), config: Optional[SharedCacheConfig] = None):
+        self.path = path
+        self.config = config or SharedCacheConfig()
+        self._local = threading.local()
+        conn = self.connection()
+        for statement in schema:
+            conn.execute(statement)
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=self.config.busy_timeout_s)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.config.mmap_bytes)}")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, parameters: Sequence = ()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        return self.connection().executemany(sql, rows)
+
+    def trim(self, table: str, max_rows: int) -> None:
+        # Keeps roughly the newest max_rows rows: INSERT OR REPLACE gives every write a fresh rowid,
+        # so a rowid window is a cheap FIFO bound that needs no COUNT(*) scan.
+        if max_rows > 0:
+            self.execute(f"DELETE FROM {table} WHERE rowid <= (SELECT MAX(rowid) FROM {table}) - ?", (max_rows,))
+
+class WorkerStats:
+    # Each worker periodically publishes its counters here so /stats can report totals over all
+    # workers instead of whichever process happened to answer.
+    def __init__(self, config: Optional[SharedCacheConfig] = None):
+        self.config = config or SharedCacheConfig()
+        os.makedirs(self.config.directory, exist_ok=True)
+        self.db = SQLiteConnections(
+            os.path.join(self.config.directory, "workers.sqlite"),
+            ["CREATE TABLE IF NOT EXISTS worker_stats (pid INTEGER PRIMARY KEY, updated REAL NOT NULL, stats TEXT NOT NULL)"],
+            self.config,
+        )
+
+    def publish(self, stats: dict) -> None:
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO worker_stats (pid, updated, stats) VALUES (?, ?, ?)",
+                (os.getpid(), time.time(), json.dumps(stats)),
+            )
+        except sqlite3.Error as e:
+            print(f"Error publishing worker stats: {e}")
+
+    def collect(self) -> List[dict]:
+        cutoff = time.time() - self.config.stats_max_age_s
+        rows = self.db.execute("SELECT pid, stats FROM worker_stats WHERE updated >= ? ORDER BY pid", (cutoff,))
+        return [{"pid": pid, **json.loads(stats)} for pid, stats in rows]
+
+def sum_stats(stats: List[Optional[dict]]) -> Optional[dict]:
+    # Adds up the numeric counters of several workers' stats dicts. Ratios cannot be summed, so
+    # hit_rate is recomputed from the summed *hits and misses counters.
+    stats = [s for s in stats if s]
+    if not stats:
+        return None
+    total: Dict[str, float] = {}
+    for entry in stats:
+        for key, value in entry.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in ("hit_rate", "generation"):
+                total[key] = total.get(key, 0) + value
+    if "hit_rate" in stats[0]:
+        hits = sum(value for key, value in total.items() if key.endswith("hits"))
+        lookups = hits + total.get("misses", 0)
+        total["hit_rate"] = hits / lookups if lookups else 0.0
+    return total
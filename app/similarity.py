@@ -1,3 +1,5 @@
+from typing import Callable, Optional, Tuple
+
 import numpy as np
 
 def cosine_similarity(vec1, vec2):
@@ -22,4 +24,121 @@ def dot_product_similarity(vec1, vec2):
     vec1, vec2 = np.array(vec1), np.array(vec2)
     return np.dot(vec1, vec2)
 
+# Batched kernels. Queries and corpus are (n, d) matrices; scores come back as (n_queries, n_corpus).
+# Maps each metric to whether larger scores rank first.
+METRICS = {"cosine": True, "dot": True, "euclidean": False}
+
+def as_matrix(vectors) -> np.ndarray:
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = as_matrix(matrix)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # Zero vectors stay zero, which matches cosine_similarity returning 0.0 for them.
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def truncate_embeddings(vectors, dimension: int, normalize: bool = True) -> np.ndarray:
+    # Matryoshka-trained models front-load the signal, so a prefix is a usable lower-dimensional
+    # embedding. Renormalizing keeps cosine and dot scores on the same scale as the full vectors.
+    matrix = as_matrix(vectors)
+    if not 0 < dimension <= matrix.shape[1]:
+        raise ValueError(f"Cannot truncate {matrix.shape[1]}-d vectors to {dimension} dimensions")
+    matrix = matrix[:, :dimension]
+    return normalize_rows(matrix) if normalize else np.ascontiguousarray(matrix)
+
+def cosine_similarity_matrix(queries, corpus) -> np.ndarray:
+    return normalize_rows(queries) @ normalize_rows(corpus).T
+
+def dot_product_matrix(queries, corpus) -> np.ndarray:
+    return as_matrix(queries) @ as_matrix(corpus).T
+
+def euclidean_distance_matrix(queries, corpus) -> np.ndarray:
+    queries, corpus = as_matrix(queries), as_matrix(corpus)
+    return _euclidean(queries, corpus, np.einsum("ij,ij->i", corpus, corpus))
+
+def _euclidean(queries: np.ndarray, corpus: np.ndarray, corpus_sq_norms: np.ndarray) -> np.ndarray:
+    # ||q - c||^2 = ||q||^2 + ||c||^2 - 2 q.c, clipped because rounding can push it below zero.
+    query_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+    squared = query_sq_norms + corpus_sq_norms[None, :] - 2.0 * (queries @ corpus.T)
+    return np.sqrt(np.maximum(squared, 0.0, out=squared), out=squared)
+
+def top_k_indices(scores: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    keyed = -scores if largest else scores
+    if k < scores.shape[1]:
+        candidates = np.argpartition(keyed, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(np.take_along_axis(keyed, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+class CorpusMatrix:
+    # Keeps the float32 corpus plus its normalized copy and squared norms so they are computed once.
+    def __init__(self, vectors):
+        self.vectors = as_matrix(vectors)
+        self.normalized = normalize_rows(self.vectors)
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def scores(self, queries, metric: str = "cosine", start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        queries = as_matrix(queries)
+        end = len(self) if end is None else end
+        if metric == "cosine":
+            return normalize_rows(queries) @ self.normalized[start:end].T
+        if metric == "dot":
+            return queries @ self.vectors[start:end].T
+        if metric == "euclidean":
+            return _euclidean(queries, self.vectors[start:end], self.sq_norms[start:end])
+        raise ValueError(f"Unsupported metric: {metric}")
+
+    def top_k(
+            self,
+            queries,
+            k: int,
+            metric: str = "cosine",
+            chunk_size: Optional[int] = None,
+            ) -> Tuple[np.ndarray, np.ndarray]:
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        largest = METRICS[metric]
+        queries = as_matrix(queries)
+        return blocked_top_k(
+            lambda start, end: self.scores(queries, metric, start, end),
+            len(self), queries.shape[0], k, largest, chunk_size,
+        )
 
+def blocked_top_k(
+        score_block: Callable[[int, int], np.ndarray],
+        n: int,
+        n_queries: int,
+        k: int,
+        largest: bool = True,
+        block_size: Optional[int] = None,
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    block_size = block_size or n or 1
+    best_idx = np.empty((n_queries, 0), dtype=np.int64)
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+    # Only a (n_queries, block_size) block is materialized at a time; partial winners are merged.
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block = score_block(start, end)
+        idx = top_k_indices(block, k, largest)
+        merged_scores = np.concatenate([best_scores, np.take_along_axis(block, idx, axis=1)], axis=1)
+        merged_idx = np.concatenate([best_idx, idx + start], axis=1)
+        keep = top_k_indices(merged_scores, k, largest)
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_idx = np.take_along_axis(merged_idx, keep, axis=1)
+    return best_idx, best_scores
@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from heapq import nlargest
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.embedding_cache import normalize_text
+from app.vector_store import PointId
+
+load_dotenv()
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class SparseIndexConfig:
+    def __init__(self):
+        self.enabled = os.getenv("SPARSE_INDEX_ENABLED", "false").lower() == "true"
+        # Written by ingestion and loaded by the API at startup.
+        self.path = os.getenv("SPARSE_INDEX_PATH", "sparse_index.json")
+        self.k1 = float(os.getenv("BM25_K1", "1.2"))
+        self.b = float(os.getenv("BM25_B", "0.75"))
+        # Hybrid search: each side returns top_k * candidates hits before fusion.
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        self.candidates = int(os.getenv("HYBRID_CANDIDATES", "4"))
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(normalize_text(text).lower())
+
+class BM25Index:
+    # In-process inverted index keyed by the same point ids as the vector store, so sparse and
+    # dense hits can be fused by id. Texts are kept to answer sparse-only searches on their own.
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[PointId, int]] = {}
+        self._docs: Dict[PointId, Tuple[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, pid: PointId) -> bool:
+        return pid in self._docs
+
+    def add(self, ids: Sequence[PointId], texts: Sequence[str]) -> None:
+        if len(ids) != len(texts):
+            raise ValueError("Number of ids and texts must be equal!!")
+        with self._lock:
+            for pid, text in zip(ids, texts):
+                self._remove(pid)
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[pid] = tf
+                self._docs[pid] = (text, length)
+                self._total_length += length
+
+    def delete(self, ids: Sequence[PointId]) -> int:
+        with self._lock:
+            return sum(self._remove(pid) for pid in ids)
+
+    def _remove(self, pid: PointId) -> bool:
+        doc = self._docs.pop(pid, None)
+        if doc is None:
+            return False
+        text, length = doc
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(pid, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= length
+        return True
+
+    def search(self, query: str, top_k: int = 3) -> List[dict]:
+        # Okapi BM25; hits use the same {"id", "text", "score"} shape as the vector stores.
+        with self._lock:
+            n = len(self._docs)
+            if not n or top_k <= 0:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[PointId, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pid, tf in postings.items():
+                    norm = self.k1 * (1.0 - self.b + self.b * self._docs[pid][1] / avg_length)
+                    scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+            best = nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [{"id": pid, "text": self._docs[pid][0], "score": score} for pid, score in best]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"documents": len(self._docs), "terms": len(self._postings)}
+
+    def save(self, path: str) -> None:
+        # Only the documents are stored; postings are rebuilt on load.
+        with self._lock:
+            state = {"k1": self.k1, "b": self.b, "docs": [[pid, text] for pid, (text, _) in self._docs.items()]}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index = cls(k1=state["k1"], b=state["b"])
+        if state["docs"]:
+            ids, texts = zip(*state["docs"])
+            index.add(list(ids), list(texts))
+        return index
+
+def index_mtime(path: Optional[str]) -> Optional[int]:
+    # save() replaces the file, so a different mtime means ingestion wrote a newer index.
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except FileNotFoundError:
+        return None
+
+def load_or_create(config: Optional[SparseIndexConfig] = None) -> BM25Index:
+    config = config or SparseIndexConfig()
+    if config.path and os.path.exists(config.path):
+        return BM25Index.load(config.path)
+    return BM25Index(k1=config.k1, b=config.b)
+
+def reciprocal_rank_fusion(
+        result_lists: Sequence[List[dict]],
+        top_k: int,
+        k: int = 60,
+        weights: Optional[Sequence[float]] = None,
+        ) -> List[dict]:
+    # score(id) = sum_i weight_i / (k + rank_i(id)); only ranks matter, so BM25 and cosine
+    # scores never have to be put on a common scale.
+    weights = weights or [1.0] * len(result_lists)
+    fused: Dict[PointId, float] = {}
+    first: Dict[PointId, dict] = {}
+    for hits, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(hits, start=1):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + weight / (k + rank)
+            first.setdefault(hit["id"], hit)
+    best = nlargest(top_k, fused.items(), key=lambda item: item[1])
+    # Other hit fields (text, payload) come from the first list the point appeared in.
+    return [{**first[pid], "score": score} for pid, score in best]
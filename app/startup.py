@@ -0,0 +1,103 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from app.metrics import REGISTRY
+
+load_dotenv()
+
+STARTUP_READY_SECONDS = REGISTRY.gauge(
+    "startup_ready_seconds", "Seconds from process start until each startup component became ready.", ("component",)
+)
+STARTUP_ATTEMPTS = REGISTRY.counter("startup_attempts_total", "Initialization attempts per startup component.",
+                                    ("component", "outcome"))
+
+class StartupConfig:
+    def __init__(self):
+        # "true" blocks startup until every component is ready (still retrying); otherwise the API
+        # starts serving at once and /readyz reports 503 until the background connect finishes.
+        self.wait = os.getenv("STARTUP_WAIT", "false").lower() == "true"
+        self.retry_base_s = float(os.getenv("STARTUP_RETRY_BASE_S", "0.5"))
+        self.retry_max_s = float(os.getenv("STARTUP_RETRY_MAX_S", "30"))
+        # 0 retries forever.
+        self.max_attempts = int(os.getenv("STARTUP_MAX_ATTEMPTS", "0"))
+
+class ComponentState:
+    def __init__(self, name: str):
+        self.name = name
+        self.ready = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.ready_after_s: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "ready_after_s": self.ready_after_s,
+        }
+
+class StartupTracker:
+    # Initializes components in the background, retrying each with capped exponential backoff and
+    # full jitter, and records what is ready for the readiness probe.
+    def __init__(self, config: Optional[StartupConfig] = None, started: Optional[float] = None,
+                 sleep: Callable[[float], Any] = asyncio.sleep):
+        self.config = config or StartupConfig()
+        self.started = started if started is not None else time.perf_counter()
+        self.components: Dict[str, ComponentState] = {}
+        self._sleep = sleep
+
+    def expect(self, *names: str) -> None:
+        # Registered components count against readiness before their first attempt.
+        for name in names:
+            self.components.setdefault(name, ComponentState(name))
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.components) and all(state.ready for state in self.components.values())
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.config.retry_max_s, self.config.retry_base_s * 2 ** (attempt - 1)))
+
+    async def run(self, name: str, init: Callable[[], Any]) -> Any:
+        # init is blocking (client construction, model loading) and runs on the threadpool.
+        self.expect(name)
+        state = self.components[name]
+        while True:
+            state.attempts += 1
+            try:
+                result = await run_in_threadpool(init)
+            except Exception as e:
+                state.last_error = f"{type(e).__name__}: {e}"
+                STARTUP_ATTEMPTS.labels(name, "error").inc()
+                if isinstance(e, ValueError):
+                    # Configuration errors (e.g. a collection of another vector size) fail the same way every time.
+                    print(f"Initializing {name} failed: {e}; not retrying")
+                    raise
+                if self.config.max_attempts and state.attempts >= self.config.max_attempts:
+                    print(f"Giving up on {name} after {state.attempts} attempts: {e}")
+                    raise
+                delay = self.backoff(state.attempts)
+                print(f"Initializing {name} failed (attempt {state.attempts}): {e}; retrying in {delay:.1f}s")
+                await self._sleep(delay)
+                continue
+            STARTUP_ATTEMPTS.labels(name, "ok").inc()
+            state.ready = True
+            state.last_error = None
+            state.ready_after_s = time.perf_counter() - self.started
+            STARTUP_READY_SECONDS.labels(name).set(state.ready_after_s)
+            print(f"{name} ready after {state.ready_after_s:.2f}s ({state.attempts} attempt(s))")
+            return result
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_s": time.perf_counter() - self.started,
+            "components": {name: state.as_dict() for name, state in self.components.items()},
+        }
@@ -0,0 +1,221 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.similarity import METRICS, as_matrix, blocked_top_k, normalize_rows
+
+PointId = Union[int, str]
+# Payload predicate applied before scoring, so filtered searches still return up to k hits.
+PayloadPredicate = Callable[[dict], bool]
+
+# Qdrant distance names mapped onto the local metric names.
+DISTANCE_METRICS = {"COSINE": "cosine", "DOT": "dot", "EUCLID": "euclidean"}
+
+class ReadWriteLock:
+    # Many concurrent searches, one exclusive writer.
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+class VectorIndex:
+    # Exact (brute-force) index over a contiguous row-major matrix. Rows are kept dense:
+    # deleting a point moves the last row into its slot, so search never skips holes.
+    def __init__(
+            self,
+            dimension: int,
+            metric: str = "cosine",
+            dtype=np.float32,
+            block_size: int = 65536,
+            initial_capacity: int = 1024,
+            ):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.dimension = dimension
+        self.metric = metric
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        self.block_size = block_size
+
+        self._vectors = np.empty((initial_capacity, dimension), dtype=self.dtype)
+        self._sq_norms = np.empty(initial_capacity, dtype=np.float32)
+        self._ids: List[PointId] = []
+        self._payloads: List[dict] = []
+        self._rows: Dict[PointId, int] = {}
+        self._lock = ReadWriteLock()
+        # Bumped on every write so derived structures know when to rebuild.
+        self._version = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, point_id: PointId) -> bool:
+        return point_id in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        return self._vectors[:len(self)].nbytes
+
+    def add(self, ids: Sequence[PointId], vectors, payloads: Optional[Sequence[dict]] = None) -> None:
+        matrix = as_matrix(vectors)
+        if matrix.shape[0] != len(ids):
+            raise ValueError("Number of ids and vectors must be equal!!")
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {matrix.shape[1]}")
+        if payloads is not None and len(payloads) != len(ids):
+            raise ValueError("Number of ids and payloads must be equal!!")
+
+        last = {pid: i for i, pid in enumerate(ids)}
+        if len(last) < len(ids):
+            # Repeated ids in one call: the last occurrence wins, as with sequential upserts.
+            keep = sorted(last.values())
+            ids, matrix = [ids[i] for i in keep], matrix[keep]
+            payloads = [payloads[i] for i in keep] if payloads is not None else None
+
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        if self.metric == "cosine":
+            # Stored pre-normalized so cosine search is a plain dot product.
+            matrix = normalize_rows(matrix)
+
+        with self._lock.write():
+            self._reserve(len(self) + len(ids))
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, pid in enumerate(ids):
+                row = self._rows.get(pid)
+                payload = dict(payloads[i]) if payloads is not None else {}
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[pid] = row
+                    self._ids.append(pid)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[row] = payload
+                rows[i] = row
+            self._store_rows(rows, matrix, sq_norms)
+            self._version += 1
+
+    def delete(self, ids: Iterable[PointId]) -> int:
+        removed = 0
+        with self._lock.write():
+            for pid in ids:
+                row = self._rows.pop(pid, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._move_row(last, row)
+                    self._ids[row] = moved
+                    self._payloads[row] = self._payloads[last]
+                    self._rows[moved] = row
+                self._ids.pop()
+                self._payloads.pop()
+                removed += 1
+            self._version += 1
+        return removed
+
+    def get_payload(self, point_id: PointId) -> Optional[dict]:
+        with self._lock.read():
+            row = self._rows.get(point_id)
+            return None if row is None else self._payloads[row]
+
+    def items(self) -> List[Tuple[PointId, dict]]:
+        with self._lock.read():
+            return list(zip(self._ids, self._payloads))
+
+    def vectors(self) -> np.ndarray:
+        with self._lock.read():
+            return self._vectors[:len(self._ids)].astype(np.float32)
+
+    def search(self, queries, k: int, where: Optional[PayloadPredicate] = None) -> List[List[Tuple[PointId, float, dict]]]:
+        queries = as_matrix(queries)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Expected queries of dimension {self.dimension}, got {queries.shape[1]}")
+        if self.metric == "cosine":
+            queries = normalize_rows(queries)
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        selected = None
+
+        def score_block(start: int, end: int) -> np.ndarray:
+            # NumPy drops the GIL inside the matmul, so concurrent searches run in parallel.
+            rows = slice(start, end) if selected is None else selected[start:end]
+            block = self._vectors[rows]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores = queries @ block.T
+            if self.metric == "euclidean":
+                scores = query_sq_norms + self._sq_norms[rows][None, :] - 2.0 * scores
+                np.sqrt(np.maximum(scores, 0.0, out=scores), out=scores)
+            return scores
+
+        with self._lock.read():
+            mask = self._filter_mask(where)
+            if mask is not None:
+                selected = np.flatnonzero(mask)
+            n = len(self._ids) if selected is None else len(selected)
+            if n == 0 or k <= 0:
+                return [[] for _ in range(queries.shape[0])]
+            idx, scores = blocked_top_k(score_block, n, queries.shape[0], k, METRICS[self.metric], self.block_size)
+            if selected is not None:
+                idx = selected[idx]
+            return [
+                [(self._ids[j], float(score), self._payloads[j]) for j, score in zip(row_idx, row_scores)]
+                for row_idx, row_scores in zip(idx, scores)
+            ]
+
+    def _filter_mask(self, where: Optional[PayloadPredicate]) -> Optional[np.ndarray]:
+        # Called under the read lock; None means every row is a candidate.
+        if where is None:
+            return None
+        return np.fromiter((where(payload) for payload in self._payloads), dtype=bool, count=len(self._payloads))
+
+    def _store_rows(self, rows: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> None:
+        # Called under the write lock; subclasses extend it to keep per-row state in sync.
+        self._vectors[rows] = matrix
+        self._sq_norms[rows] = sq_norms
+
+    def _move_row(self, src: int, dst: int) -> None:
+        self._vectors[dst] = self._vectors[src]
+        self._sq_norms[dst] = self._sq_norms[src]
+
+    def _reserve(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        # Amortized doubling keeps appends O(1) without re-copying on every batch.
+        new_capacity = max(needed, capacity * 2)
+        vectors = np.empty((new_capacity, self.dimension), dtype=self.dtype)
+        vectors[:len(self._ids)] = self._vectors[:len(self._ids)]
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        sq_norms[:len(self._ids)] = self._sq_norms[:len(self._ids)]
+        self._vectors, self._sq_norms = vectors, sq_norms
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Union
+
+from dotenv import load_dotenv
+
+from app.embedding_cache import normalize_text
+from app.shared_cache import SharedCacheConfig
+
+if TYPE_CHECKING:
+    from app.embedding_store import EmbeddingStore
+
+load_dotenv()
+
+PointId = Union[int, str]
+
+# Search filters map payload fields to conditions, all of which must hold:
+#   {"tenant": "acme"}             exact match
+#   {"lang": ["en", "de"]}         match any of the values
+#   {"year": {"gte": 2020}}        numeric range with any of gt / gte / lt / lte
+SearchFilter = Dict[str, Any]
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+# Payload fields returned with each hit: False for none, True for all, or a list of field names.
+PayloadSelector = Union[bool, List[str]]
+
+# Fixed namespace so the same text maps to the same point id across runs, machines and backends.
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "text-embeddings/points")
+
+def point_id(text: str, owner: Optional[str] = None) -> str:
+    # Ingested points are scoped by owner, so the same text from two sources or tenants is stored
+    # as two points, each with its own payload, instead of one point whose payload the last write wins.
+    name = normalize_text(text) if owner is None else f"{owner}\n{normalize_text(text)}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, name))
+
+def owner_key(source: str, metadata: Optional[dict] = None) -> str:
+    # Identifies who owns an ingested point: its source plus the caller metadata (tenant, ...).
+    # Stored as the "owner" payload field, which incremental runs and prune select on.
+    scope = json.dumps({**(metadata or {}), "source": source}, sort_keys=True, ensure_ascii=False, default=str)
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, scope))
+
+def validate_filter(query_filter: Optional[SearchFilter]) -> None:
+    for field, condition in (query_filter or {}).items():
+        if not isinstance(field, str) or not field:
+            raise ValueError("Filter fields must be non-empty strings")
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(RANGE_OPERATORS)
+            if not condition or unknown:
+                raise ValueError(f"Range filter on {field} must use {', '.join(RANGE_OPERATORS)}")
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in condition.values()):
+                raise ValueError(f"Range filter on {field} must use numeric bounds")
+        elif isinstance(condition, list):
+            if not condition or not all(isinstance(v, (str, int, bool)) for v in condition):
+                raise ValueError(f"Filter on {field} must list strings, integers or booleans")
+        elif not isinstance(condition, (str, int, bool)):
+            raise ValueError(f"Filter on {field} must be a string, integer, boolean, list or range")
+
+def matches_filter(payload: dict, query_filter: Optional[SearchFilter]) -> bool:
+    # Same semantics as the Qdrant translation, for backends that filter in-process.
+    for field, condition in (query_filter or {}).items():
+        value = payload.get(field)
+        if isinstance(condition, dict):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return False
+            if ("gt" in condition and not value > condition["gt"]) or \
+                    ("gte" in condition and not value >= condition["gte"]) or \
+                    ("lt" in condition and not value < condition["lt"]) or \
+                    ("lte" in condition and not value <= condition["lte"]):
+                return False
+        else:
+            allowed = condition if isinstance(condition, list) else [condition]
+            # A list-valued payload field matches when any of its elements does, as in Qdrant.
+            values = value if isinstance(value, list) else [value]
+            if not any(v == a and type(v) is type(a) for v in values for a in allowed):
+                return False
+    return True
+
+def select_payload(payload: Optional[dict], with_payload: PayloadSelector) -> Optional[dict]:
+    if not with_payload:
+        return None
+    payload = payload or {}
+    if with_payload is True:
+        return dict(payload)
+    return {field: payload[field] for field in with_payload if field in payload}
+
+def to_hit(pid: PointId, score: float, payload: Optional[dict], with_payload: PayloadSelector = False) -> dict:
+    hit = {"id": pid, "text": (payload or {}).get("text"), "score": score}
+    if with_payload:
+        hit["payload"] = select_payload(payload, with_payload)
+    return hit
+
+class WriteStamp:
+    # Write counter shared by every process using the same collections (the API workers and
+    # scripts/ingest.py). Writers append one byte and readers take the file size, so a check is a
+    # single stat() and O_APPEND keeps concurrent bumps from different processes from being lost.
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        open(path, "ab").close()
+
+    def bump(self) -> None:
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+        finally:
+            os.close(fd)
+
+    def read(self) -> int:
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+def write_stamp_path() -> Optional[str]:
+    path = os.getenv("VECTOR_STORE_WRITE_STAMP")
+    if path:
+        return path
+    directory = SharedCacheConfig().directory
+    return os.path.join(directory, "writes.stamp") if directory else None
+
+class VectorStore(ABC):
+    # Everything the API, ingestion and demos need from a vector backend.
+    # Hits are dicts with "id", "text" and "score", plus "payload" when with_payload selects any fields.
+
+    # Writes made through this store object; without a write stamp that is all the generation sees.
+    _writes: int = 0
+    write_stamp: Optional[WriteStamp] = None
+
+    @property
+    def generation(self) -> int:
+        # Changes after every write, so cached search results can tell they are stale. With a write
+        # stamp that includes writes made by other processes.
+        if self.write_stamp is not None:
+            return self.write_stamp.read()
+        return self._writes
+
+    def _written(self) -> None:
+        self._writes += 1
+        if self.write_stamp is not None:
+            self.write_stamp.bump()
+
+    @abstractmethod
+    def create_collection(
+            self,
+            collection_name: Optional[str] = None,
+            vector_size: Optional[int] = None,
+            distance_metric: Optional[str] = None
+            ) -> bool: ...
+
+    @abstractmethod
+    def get_vector_size(self, collection_name: Optional[str] = None) -> int: ...
+
+    @abstractmethod
+    def insert_embeddings(
+            self,
+            texts: List[str],
+            embeddings: List[List[float]],
+            collection_name: Optional[str] = None,
+            ids: Optional[List[PointId]] = None,
+            payloads: Optional[List[dict]] = None,
+            ) -> bool: ...
+
+    @abstractmethod
+    def retrieve_payloads(
+            self,
+            ids: List[PointId],
+            fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            ) -> Dict[PointId, dict]: ...
+
+    @abstractmethod
+    def iter_ids(self, field: str, value: str, collection_name: Optional[str] = None) -> Iterator[PointId]: ...
+
+    @abstractmethod
+    def delete_points(self, ids: List[PointId], collection_name: Optional[str] = None) -> bool: ...
+
+    @abstractmethod
+    def create_payload_index(
+            self,
+            field: str,
+            field_schema: str = "keyword",
+            collection_name: Optional[str] = None,
+            ) -> bool: ...
+
+    @abstractmethod
+    def search_similar_texts(
+            self,
+            query_vector: List[float],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[dict]: ...
+
+    @abstractmethod
+    async def asearch_similar_texts(
+            self,
+            query_vector: List[float],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[dict]: ...
+
+    @abstractmethod
+    def search_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]: ...
+
+    @abstractmethod
+    async def asearch_similar_texts_batch(
+            self,
+            query_vectors: List[List[float]],
+            top_k: int = 3,
+            collection_name: Optional[str] = None,
+            query_filter: Optional[SearchFilter] = None,
+            with_payload: PayloadSelector = False,
+            ) -> List[List[dict]]: ...
+
+    def insert_from_embedding_store(
+            self,
+            store: "EmbeddingStore",
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+            payload: Optional[dict] = None,
+            owner: Optional[str] = None,
+            ) -> int:
+        # Bulk load precomputed embeddings without calling the model again. With an owner the stored
+        # ids are re-derived under it, the same way file ingestion scopes them. Payload fields given
+        # here are added to the ones stored with each row.
+        inserted = 0
+        for ids, texts, vectors, stored in store.iter_batches(batch_size, with_payloads=True):
+            if owner is not None:
+                ids = [point_id(text, owner) for text in texts]
+            self.insert_embeddings(
+                texts,
+                vectors,
+                collection_name=collection_name,
+                ids=ids,
+                payloads=[{**row, **(payload or {})} for row in stored],
+            )
+            inserted += len(texts)
+        return inserted
+
+    async def aclose(self) -> None:
+        pass
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "qdrant")).lower()
+    if backend == "qdrant":
+        from app.qdrant_utils import QdrantVectorStore
+        store = QdrantVectorStore()
+    elif backend == "local":
+        from app.local_store import LocalVectorStore
+        store = LocalVectorStore()
+    else:
+        raise ValueError(f"Unsupported vector store backend: {backend}")
+    stamp_path = write_stamp_path()
+    if stamp_path:
+        store.write_stamp = WriteStamp(stamp_path)
+    return store
+
+def check_vector_size(store: VectorStore, dimension: Optional[int], collection_name: Optional[str] = None) -> None:
+    # The collection may predate a change to EMBEDDING_OUTPUT_DIMENSIONALITY or QDRANT_VECTOR_SIZE.
+    if dimension is None:
+        return
+    size = store.get_vector_size(collection_name)
+    if size != dimension:
+        raise ValueError(
+            f"Collection vector size {size} does not match the embedding dimensionality {dimension}; "
+            "set QDRANT_VECTOR_SIZE and EMBEDDING_OUTPUT_DIMENSIONALITY to the same value"
+        )
+
+def prepare_collection(store: VectorStore, dimension: Optional[int] = None) -> None:
+    # A new collection takes the embedding dimensionality; only an existing one can disagree with it.
+    store.create_collection(vector_size=dimension)
+    check_vector_size(store, dimension)
+
+def initialize_vector_store(backend: Optional[str] = None, dimension: Optional[int] = None) -> VectorStore:
+    store = create_vector_store(backend)
+    try:
+        prepare_collection(store, dimension)
+    except Exception:
+        # Startup retries build a new store per attempt, so a failed one releases its clients here.
+        # Called from worker threads and scripts, where no event loop is running.
+        asyncio.run(store.aclose())
+        raise
+    return store
@@ -0,0 +1,51 @@
+import os
+import threading
+from typing import List, Optional
+
+import vertexai
+from dotenv import load_dotenv
+from vertexai.language_models import TextEmbeddingModel
+
+from app.embedding_backend import EmbeddingBackend
+
+load_dotenv()
+
+# Full output size of each supported model, used when no output dimensionality is requested.
+MODEL_DIMENSIONS = {"text-embedding-005": 768}
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, project_id: Optional[str] = None, location: Optional[str] = None):
+        self.project_id = project_id or os.getenv("GOOGLE_PROJECT_ID")
+        self.location = location or os.getenv("GOOGLE_CLOUD_LOCATION")
+        if not self.project_id:
+            raise ValueError("No Google Project ID provided!!")
+
+        vertexai.init(project=self.project_id, location=self.location)
+        self.model_name = "text-embedding-005"
+        self._model: Optional[TextEmbeddingModel] = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def dimension(self) -> int:
+        return MODEL_DIMENSIONS[self.model_name]
+
+    @property
+    def model(self) -> TextEmbeddingModel:
+        # Built once per process; the handle is stateless and safe to share between threads.
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = TextEmbeddingModel.from_pretrained(self.model_name)
+        return self._model
+
+    def warm_up(self, text: Optional[str] = "warm-up") -> None:
+        model = self.model
+        if text:
+            model.get_embeddings([text])
+
+    def embed(self, texts: List[str], output_dimensionality: Optional[int] = None) -> List[List[float]]:
+        kwargs = {}
+        if output_dimensionality:
+            kwargs["output_dimensionality"] = output_dimensionality
+        embeddings = self.model.get_embeddings(texts, **kwargs)
+        return [embedding.values for embedding in embeddings]
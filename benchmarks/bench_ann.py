@@ -0,0 +1,81 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.ann_index import IVFIndex
+from app.embedding_store import EmbeddingStore
+from app.vector_index import VectorIndex
+
+def synthetic(n, dim, rng, n_clusters=256):
+    # Real embeddings are clustered by topic; isotropic noise would be a worst case for any ANN index.
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, n_clusters, size=n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+
+def from_store(path, n, rng):
+    # Grows the sample_sentences.txt embeddings (as written by the similarity demo) to n rows by jittering them.
+    base = np.asarray(EmbeddingStore.open(path).vectors, dtype=np.float32)
+    rows = base[rng.integers(0, len(base), size=n)]
+    return rows + 0.02 * rng.normal(size=rows.shape).astype(np.float32)
+
+def ids_of(results):
+    return [[pid for pid, _, _ in hits] for hits in results]
+
+def qps(fn, n_queries, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return n_queries / best
+
+def run(name, corpus, queries, args):
+    dim = corpus.shape[1]
+    ids = list(range(len(corpus)))
+    exact = VectorIndex(dimension=dim, initial_capacity=len(corpus))
+    exact.add(ids, corpus)
+    truth = ids_of(exact.search(queries, args.k))
+    exact_qps = qps(lambda: [exact.search(q, args.k) for q in queries], len(queries), args.repeat)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(dimension=dim, initial_capacity=len(corpus), n_lists=args.lists or None,
+                   train_size=len(corpus))
+    ivf.add(ids, corpus)
+    build = time.perf_counter() - start
+
+    print(f"{name}: n={len(corpus)} d={dim} lists={ivf.n_lists} build={build:.2f}s")
+    print(f"  exact            recall@{args.k}=1.000  {exact_qps:9.0f} qps")
+    for nprobe in args.nprobe:
+        found = ids_of(ivf.search(queries, args.k, nprobe=nprobe))
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        ivf_qps = qps(lambda: [ivf.search(q, args.k, nprobe=nprobe) for q in queries], len(queries), args.repeat)
+        print(f"  ivf nprobe={nprobe:<4} recall@{args.k}={recall:.3f}  {ivf_qps:9.0f} qps  "
+              f"({ivf_qps / exact_qps:5.1f}x)")
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="IVF recall@k and single-query QPS against exact search")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists (0 = 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--store", default=os.path.join(base_dir, "sample_sentences.emb"),
+                        help="Embedding store used for the real-data run (skipped if missing)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.size + args.queries, args.dim, rng)
+    run("synthetic", data[args.queries:], data[:args.queries], args)
+
+    if EmbeddingStore.exists(args.store):
+        data = from_store(args.store, args.size + args.queries, rng)
+        run("sample_sentences", data[args.queries:], data[:args.queries], args)
+    else:
+        print(f"No embedding store at {args.store}; run scripts/similarity_demo.py once to create it")
+
+if __name__ == "__main__":
+    main()
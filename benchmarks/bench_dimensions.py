@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.embedding_store import EmbeddingStore
+from app.similarity import truncate_embeddings
+from app.vector_index import VectorIndex
+
+def synthetic(n, dim, rng):
+    # Variance decays along the dimensions, roughly like a Matryoshka-trained model's output.
+    scale = 1.0 / np.sqrt(1.0 + np.arange(dim) / 32.0)
+    centers = rng.normal(size=(512, dim)) * scale
+    rows = centers[rng.integers(0, 512, size=n)] + 0.3 * rng.normal(size=(n, dim)) * scale
+    return rows.astype(np.float32)
+
+def from_store(path, n, rng):
+    base = np.asarray(EmbeddingStore.open(path).vectors, dtype=np.float32)
+    rows = base[rng.integers(0, len(base), size=n)]
+    return rows + 0.02 * rng.normal(size=rows.shape).astype(np.float32)
+
+def live(path, dims):
+    # Asks the model itself for each size instead of truncating client-side.
+    from app.embeddings import EmbeddingGenerator
+    with open(path, "r", encoding="utf-8") as f:
+        sentences = [line.strip() for line in f if line.strip()]
+    return {d: np.asarray(EmbeddingGenerator(output_dimensionality=d).generate_embeddings(sentences), dtype=np.float32)
+            for d in dims}
+
+def neighbours(corpus, queries, k):
+    index = VectorIndex(dimension=corpus.shape[1], initial_capacity=len(corpus))
+    index.add(list(range(len(corpus))), corpus)
+    start = time.perf_counter()
+    results = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return [[pid for pid, _, _ in hits] for hits in results], elapsed / len(queries), index.nbytes
+
+def report(name, by_dim, n_queries, k):
+    full_dim = max(by_dim)
+    truth, _, _ = neighbours(by_dim[full_dim][n_queries:], by_dim[full_dim][:n_queries], k)
+    print(f"{name}: n={len(by_dim[full_dim]) - n_queries} k={k} (recall against {full_dim}-d neighbours)")
+    for dim in sorted(by_dim, reverse=True):
+        vectors = by_dim[dim]
+        found, latency, nbytes = neighbours(vectors[n_queries:], vectors[:n_queries], k)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        payload = len(json.dumps(vectors[0].tolist()))
+        print(f"  d={dim:<4} recall@{k}={recall:.3f}  {latency * 1000:7.3f}ms/query  "
+              f"{nbytes / 2**20:8.1f}MiB  {payload:6d} JSON bytes/vector")
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Search latency, memory and recall of reduced-dimension embeddings")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 512, 256, 128])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--store", default=os.path.join(base_dir, "sample_sentences.emb"))
+    parser.add_argument("--live", action="store_true",
+                        help="Also embed sample_sentences.txt at every size through Vertex (needs credentials)")
+    args = parser.parse_args()
+    full_dim = max(args.dims)
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.size + args.queries, full_dim, rng)
+    report("synthetic, truncated", {d: truncate_embeddings(data, d) for d in args.dims}, args.queries, args.k)
+
+    if EmbeddingStore.exists(args.store):
+        data = from_store(args.store, args.size + args.queries, rng)
+        report("sample_sentences, truncated", {d: truncate_embeddings(data, d) for d in args.dims}, args.queries, args.k)
+
+    if args.live:
+        by_dim = live(os.path.join(base_dir, "sample_sentences.txt"), args.dims)
+        report("sample_sentences, model output_dimensionality", by_dim, 50, args.k)
+
+if __name__ == "__main__":
+    main()
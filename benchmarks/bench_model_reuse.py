@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import time
+import types
+
+import app.vertex_backend as vertex_backend
+from app.embeddings import EmbeddingGenerator
+
+class StubModel:
+    def __init__(self, call_latency: float):
+        self.call_latency = call_latency
+
+    def get_embeddings(self, texts):
+        time.sleep(self.call_latency)
+        return [types.SimpleNamespace(values=[0.0] * 768) for _ in texts]
+
+def install_stub(load_latency: float, call_latency: float):
+    def from_pretrained(name):
+        time.sleep(load_latency)
+        return StubModel(call_latency)
+
+    vertex_backend.vertexai.init = lambda **kwargs: None
+    vertex_backend.TextEmbeddingModel.from_pretrained = from_pretrained
+
+def per_call(generator: EmbeddingGenerator, text: str):
+    model = vertex_backend.TextEmbeddingModel.from_pretrained(generator.model_name)
+    return model.get_embeddings([text])[0].values
+
+def reused(generator: EmbeddingGenerator, text: str):
+    return generator.generate_embedding(text)
+
+def measure(fn, generator, n: int):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(generator, f"query {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call model construction vs reused model handle")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--load-ms", type=float, default=5.0)
+    parser.add_argument("--call-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    install_stub(args.load_ms / 1000, args.call_ms / 1000)
+    os.environ.setdefault("GOOGLE_PROJECT_ID", "benchmark")
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    generator = EmbeddingGenerator()
+
+    for name, fn in (("per-call from_pretrained", per_call), ("reused handle", reused)):
+        result = measure(fn, generator, args.requests)
+        print(f"{name:<26} mean={result['mean_ms']:.3f}ms "
+              f"p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import time
+
+from app.batch_embedder import BatchEmbedderConfig, ParallelBatchEmbedder
+
+def fake_model(latency: float, dim: int):
+    def embed_batch(batch):
+        time.sleep(latency)
+        return [[0.0] * dim for _ in batch]
+    return embed_batch
+
+def run(texts, latency, dim, batch_size, max_in_flight):
+    cfg = BatchEmbedderConfig()
+    cfg.batch_size = batch_size
+    cfg.max_in_flight = max_in_flight
+    # Quota is not what is being measured here.
+    cfg.requests_per_minute = 10_000_000
+    embedder = ParallelBatchEmbedder(fake_model(latency, dim), cfg)
+
+    start = time.perf_counter()
+    embedder.embed(texts)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs parallel batch embedding against a fake model")
+    parser.add_argument("--texts", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=250)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    texts = [f"sentence number {i}" for i in range(args.texts)]
+    baseline = None
+    print(f"{args.texts} texts, batch size {args.batch_size}, {args.latency_ms}ms per upstream call")
+    for concurrency in args.concurrency:
+        elapsed = run(texts, args.latency_ms / 1000, args.dim, args.batch_size, concurrency)
+        baseline = baseline or elapsed
+        print(f"in-flight={concurrency:<3} {elapsed:7.3f}s  {args.texts / elapsed:10.0f} texts/s  "
+              f"speedup={baseline / elapsed:5.2f}x")
+
+if __name__ == "__main__":
+    main()
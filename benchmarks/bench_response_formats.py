@@ -0,0 +1,59 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from dto.encoding import ResponseFormat, dumps, encode_vector, orjson, pack_vectors
+from dto.pydantic_utils import EmbedBatchItem, EmbedBatchResponse
+
+def pydantic_json(texts, vectors):
+    # What FastAPI did before: validate into the response model, walk it with jsonable_encoder, then json.dumps.
+    items = [EmbedBatchItem(index=i, text=t, embedding=v, dimension=len(v)) for i, (t, v) in enumerate(zip(texts, vectors))]
+    body = EmbedBatchResponse(items=items, succeeded=len(items), failed=0)
+    return json.dumps(jsonable_encoder(body)).encode("utf-8")
+
+def fast_json(texts, vectors, fmt):
+    items = [{"index": i, "text": t, "embedding": encode_vector(v, fmt), "dimension": len(v), "error": None}
+             for i, (t, v) in enumerate(zip(texts, vectors))]
+    return dumps({"items": items, "succeeded": len(items), "failed": 0})
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization time and response size per embedding response format")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"JSON encoder for the fast path: {'orjson' if orjson is not None else 'stdlib json'}")
+    for batch in args.batch_sizes:
+        texts = [f"text {i}" for i in range(batch)]
+        vectors = rng.normal(size=(batch, args.dim)).astype(np.float32).tolist()
+        formats = [
+            ("pydantic + jsonable_encoder", lambda: pydantic_json(texts, vectors)),
+            ("fast json", lambda: fast_json(texts, vectors, ResponseFormat())),
+            ("json + base64 float32", lambda: fast_json(texts, vectors, ResponseFormat("base64", "float32"))),
+            ("json + base64 float16", lambda: fast_json(texts, vectors, ResponseFormat("base64", "float16"))),
+            ("binary float32", lambda: pack_vectors(vectors, "float32")),
+            ("binary float16", lambda: pack_vectors(vectors, "float16")),
+        ]
+        print(f"\n{batch} vector(s) x {args.dim} dims")
+        baseline = None
+        for name, fn in formats:
+            elapsed, size = timed(fn, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {name:<28} {elapsed * 1000:9.3f}ms  {size / batch:9.0f} bytes/vector  "
+                  f"({baseline / elapsed:6.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.similarity import CorpusMatrix, cosine_similarity
+
+def per_pair_top_k(query, corpus, k):
+    # The original find_top_k_similar loop: one cosine_similarity call per corpus row, then a full sort.
+    scored = [(i, cosine_similarity(query, vec)) for i, vec in enumerate(corpus)]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-pair similarity loop vs batched matrix kernels")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=8192)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    for n in args.sizes:
+        corpus = rng.normal(size=(n, args.dim)).astype(np.float32)
+        corpus_lists = corpus.tolist()
+        query_list = queries[0].tolist()
+
+        build = timed(lambda: CorpusMatrix(corpus), 1)
+        matrix = CorpusMatrix(corpus)
+        per_pair = timed(lambda: per_pair_top_k(query_list, corpus_lists, args.k), 1)
+        single = timed(lambda: matrix.top_k(queries[:1], args.k), args.repeat)
+        batched = timed(lambda: matrix.top_k(queries, args.k), args.repeat)
+        chunked = timed(lambda: matrix.top_k(queries, args.k, chunk_size=args.chunk_size), args.repeat)
+
+        print(f"n={n:<7} d={args.dim}  build={build * 1000:8.2f}ms")
+        print(f"  per-pair loop, 1 query      {per_pair * 1000:10.2f}ms")
+        print(f"  matrix, 1 query             {single * 1000:10.2f}ms  ({per_pair / single:7.1f}x)")
+        print(f"  matrix, {args.queries} queries         {batched * 1000:10.2f}ms  "
+              f"({per_pair * args.queries / batched:7.1f}x per query)")
+        print(f"  chunked {args.chunk_size}, {args.queries} queries {chunked * 1000:8.2f}ms")
+
+if __name__ == "__main__":
+    main()
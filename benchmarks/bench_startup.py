@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(client, path, deadline, status=200):
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == status:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{path} did not return {status} in time")
+
+def timed_post(client, path, body):
+    start = time.perf_counter()
+    resp = client.post(path, json=body)
+    resp.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+def cold_start(env, timeout):
+    # One uvicorn process from spawn to first served requests. Times are ms since spawn.
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            deadline = start + timeout
+            live = wait_for(client, "/healthz", deadline)
+            ready = wait_for(client, "/readyz", deadline)
+            return {
+                "live_ms": (live - start) * 1000,
+                "ready_ms": (ready - start) * 1000,
+                "first_embedding_ms": timed_post(client, "/embedding", {"text": "first request"}),
+                "second_embedding_ms": timed_post(client, "/embedding", {"text": "second request"}),
+                "first_search_ms": timed_post(client, "/search", {"text": "first search"}),
+                "second_search_ms": timed_post(client, "/search", {"text": "second search"}),
+            }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Cold start: time to live, time to ready and first-request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of each local embedding call, warm-up included")
+    parser.add_argument("--remote", action="store_true",
+                        help="Use the configured Vertex and Qdrant backends instead of the local ones")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    base_env = {**os.environ, "PYTHONPATH": base_dir}
+    if not args.remote:
+        base_env.update(EMBEDDING_BACKEND="local", VECTOR_STORE_BACKEND="local", EMBEDDING_CACHE_ENABLED="false",
+                        LOCAL_EMBEDDING_LATENCY_MS=str(args.embed_latency_ms))
+        base_env.setdefault("QDRANT_COLLECTION_NAME", "startup_benchmark")
+    variants = {
+        "background connect": {"STARTUP_WAIT": "false", "EMBEDDING_WARMUP": "false"},
+        "background connect + warm-up": {"STARTUP_WAIT": "false", "EMBEDDING_WARMUP": "true"},
+        "blocking startup + warm-up": {"STARTUP_WAIT": "true", "EMBEDDING_WARMUP": "true"},
+    }
+    results = {}
+    for name, overrides in variants.items():
+        runs = [cold_start({**base_env, **overrides}, args.timeout) for _ in range(args.runs)]
+        # Medians over runs; process spawn and imports make single runs noisy.
+        results[name] = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+        print(f"{name:<30} " + "  ".join(f"{key}={value:8.1f}" for key, value in results[name].items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
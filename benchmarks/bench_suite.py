@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+
+# Each scenario adds {name: {metric: value}} entries. Metrics ending in _ms are latencies and
+# "errors" a count (lower is better); everything else is a rate such as qps (higher is better).
+Results = Dict[str, Dict[str, float]]
+
+WORDS = (
+    "vector search embedding index query model latency cache batch cluster token network storage "
+    "document payload filter ranking score shard replica memory thread request response server"
+).split()
+
+def synthetic(n, dim, rng, n_clusters=64):
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, n_clusters, size=n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+
+def sentences(n, rng, length=12):
+    return [" ".join(rng.choice(WORDS, size=length)) + f" {i}" for i in range(n)]
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "mean_ms": float(np.mean(samples)) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+@contextlib.contextmanager
+def quiet():
+    # The stores print one line per call, which would otherwise dominate small-chunk timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+@contextlib.contextmanager
+def env_defaults(**values):
+    # Fills in unset variables for the duration of a run and restores the environment afterwards,
+    # so a benchmark called in-process (e.g. from the tests) leaves no settings behind.
+    added = [name for name in values if name not in os.environ]
+    for name in added:
+        os.environ[name] = values[name]
+    try:
+        yield
+    finally:
+        for name in added:
+            os.environ.pop(name, None)
+
+def memory_qdrant_store(dim, collection="benchmark"):
+    from qdrant_client import QdrantClient
+
+    from app.qdrant_utils import QdrantConfig, QdrantVectorStore
+
+    cfg = QdrantConfig()
+    cfg.collection_name = collection
+    cfg.vector_size = dim
+    cfg.distance_metric = "COSINE"
+    cfg.payload_indexes = {}
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = cfg
+    store.client = QdrantClient(":memory:")
+    with quiet():
+        store.create_collection()
+    return store
+
+def bench_similarity(args, results: Results) -> None:
+    from app.similarity import CorpusMatrix
+
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    for n in args.sizes:
+        matrix = CorpusMatrix(rng.normal(size=(n, args.dim)).astype(np.float32))
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            matrix.top_k(query[None, :], args.k)
+            samples.append(time.perf_counter() - start)
+        batched = best_of(lambda: matrix.top_k(queries, args.k), args.repeat)
+        results[f"similarity/n={n}"] = {**latency_stats(samples), "batched_qps": len(queries) / batched}
+
+def bench_insert(args, results: Results) -> None:
+    rng = np.random.default_rng(1)
+    vectors = synthetic(args.insert_size, args.dim, rng).tolist()
+    texts = sentences(args.insert_size, rng)
+    for chunk in args.chunk_sizes:
+        store = memory_qdrant_store(args.dim)
+        with quiet():
+            start = time.perf_counter()
+            for i in range(0, len(texts), chunk):
+                store.insert_embeddings(texts[i: i + chunk], vectors[i: i + chunk])
+            elapsed = time.perf_counter() - start
+        results[f"insert/qdrant-memory/chunk={chunk}"] = {"points_per_s": len(texts) / elapsed}
+
+def bench_search(args, results: Results) -> None:
+    rng = np.random.default_rng(2)
+    store = memory_qdrant_store(args.dim)
+    corpus = synthetic(args.search_size, args.dim, rng)
+    with quiet():
+        store.insert_embeddings(sentences(args.search_size, rng), corpus.tolist())
+    queries = (corpus[rng.integers(0, len(corpus), size=args.queries)]
+               + 0.1 * rng.normal(size=(args.queries, args.dim))).tolist()
+
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search_similar_texts(query, top_k=args.k)
+        samples.append(time.perf_counter() - start)
+    name = f"search/qdrant-memory/n={args.search_size}"
+    results[f"{name}/single"] = {**latency_stats(samples), "qps": len(samples) / sum(samples)}
+
+    batch = args.search_batch
+    elapsed = best_of(
+        lambda: [store.search_similar_texts_batch(queries[i: i + batch], top_k=args.k)
+                 for i in range(0, len(queries), batch)],
+        args.repeat,
+    )
+    results[f"{name}/batch={batch}"] = {"qps": len(queries) / elapsed}
+
+async def run_requests(client, path: str, bodies: List[dict], concurrency: int):
+    samples, errors = [], 0
+    pending = iter(bodies)
+
+    async def worker():
+        nonlocal errors
+        for body in pending:
+            start = time.perf_counter()
+            resp = await client.post(path, json=body)
+            samples.append(time.perf_counter() - start)
+            errors += resp.status_code != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+async def mirror_to_async(store, texts, vectors):
+    # The embedded client keeps its data per instance, so the async side gets its own copy.
+    from qdrant_client import AsyncQdrantClient, models
+
+    client = AsyncQdrantClient(":memory:")
+    name = store.config.collection_name
+    await client.create_collection(name, vectors_config=models.VectorParams(size=len(vectors[0]),
+                                                                            distance=models.Distance.COSINE))
+    records = store.client.scroll(name, limit=len(texts), with_payload=True, with_vectors=True)[0]
+    await client.upsert(name, points=[models.PointStruct(id=r.id, vector=r.vector, payload=r.payload) for r in records])
+    return client
+
+async def bench_api_async(args, results: Results) -> None:
+    import httpx
+
+    import main as api
+    from app.batch_embedder import BatchEmbedderConfig
+    from app.embeddings import EmbeddingGenerator
+    from app.local_embedder import HashingEmbeddingBackend, LocalEmbedderConfig
+    from app.local_store import LocalStoreConfig, LocalVectorStore
+
+    # Embeddings come from the deterministic hashing backend, optionally with simulated upstream
+    # latency, so the numbers cover the API itself: validation, concurrency, search and encoding.
+    embedder_config = LocalEmbedderConfig()
+    embedder_config.dimension = args.dim
+    embedder_config.latency_ms = args.embed_latency_ms
+    backend = HashingEmbeddingBackend(embedder_config)
+    batch_config = BatchEmbedderConfig()
+    # The default quota limit would cap every scenario at 25 embedding calls per second.
+    batch_config.requests_per_minute = args.embed_rpm
+    generator = EmbeddingGenerator(backend=backend, batch_config=batch_config)
+
+    rng = np.random.default_rng(3)
+    texts = sentences(args.api_corpus, rng)
+    vectors = [backend.embed_one(text, args.dim).tolist() for text in texts]
+    with quiet():
+        if args.api_store == "qdrant":
+            store = memory_qdrant_store(args.dim)
+            store.insert_embeddings(texts, vectors)
+            store.async_client = await mirror_to_async(store, texts, vectors)
+        else:
+            store_config = LocalStoreConfig()
+            store_config.collection_name = "benchmark"
+            store_config.vector_size = args.dim
+            store_config.distance_metric = "COSINE"
+            store = LocalVectorStore(store_config)
+            store.create_collection()
+            store.insert_embeddings(texts, vectors)
+
+    api.embedding_generator, api.vector_store = generator, store
+    api.embedding_batcher, api.search_cache = None, None
+    queries = sentences(args.api_requests, np.random.default_rng(4), length=6)
+    batch = args.search_batch
+    scenarios = [
+        ("/embedding", [{"text": q} for q in queries]),
+        ("/search", [{"text": q, "top_k": args.k} for q in queries]),
+        ("/search/batch", [{"queries": queries[i: i + batch], "top_k": args.k}
+                           for i in range(0, len(queries), batch)]),
+    ]
+    transport = httpx.ASGITransport(app=api.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for path, bodies in scenarios:
+                await run_requests(client, path, bodies[: args.concurrency], args.concurrency)  # warm-up
+                samples, errors, elapsed = await run_requests(client, path, bodies, args.concurrency)
+                results[f"api{path}/{args.api_store}/c={args.concurrency}"] = {
+                    **latency_stats(samples), "rps": len(samples) / elapsed, "errors": errors,
+                }
+    finally:
+        generator.close()
+        await store.aclose()
+
+def bench_api(args, results: Results) -> None:
+    asyncio.run(bench_api_async(args, results))
+
+SCENARIOS = {"similarity": bench_similarity, "insert": bench_insert, "search": bench_search, "api": bench_api}
+
+def lower_is_better(metric: str) -> bool:
+    return metric.endswith("_ms") or metric == "errors"
+
+def compare(results: Results, baseline: Results, tolerance: float) -> List[dict]:
+    # A metric regresses when it is worse than the baseline by more than `tolerance` (a fraction).
+    # Entries missing on either side are skipped, so scenarios can be added without a new baseline.
+    rows = []
+    for name, base_metrics in baseline.items():
+        for metric, base in base_metrics.items():
+            current = results.get(name, {}).get(metric)
+            if current is None:
+                continue
+            if base == 0:
+                change = 0.0 if current == 0 else float("inf")
+            else:
+                change = (current - base) / abs(base)
+            worse = change if lower_is_better(metric) else -change
+            rows.append({"name": name, "metric": metric, "baseline": base, "current": current,
+                         "change": change, "regressed": worse > tolerance})
+    return rows
+
+def print_results(results: Results) -> None:
+    for name, metrics in results.items():
+        values = "  ".join(f"{metric}={value:,.3f}" for metric, value in metrics.items())
+        print(f"{name:<48} {values}")
+
+def print_comparison(rows: List[dict], tolerance: float) -> None:
+    regressions = [row for row in rows if row["regressed"]]
+    print(f"\nCompared {len(rows)} metrics against the baseline (tolerance {tolerance:.0%}): "
+          f"{len(regressions)} regression(s)")
+    for row in rows:
+        marker = "REGRESSION" if row["regressed"] else ""
+        print(f"  {row['name'] + ' ' + row['metric']:<60} {row['baseline']:>12,.3f} -> {row['current']:>12,.3f} "
+              f"({row['change']:+.1%}) {marker}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks with JSON output and baseline comparison")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Corpus sizes for the similarity kernels")
+    parser.add_argument("--insert-size", type=int, default=5_000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[16, 128, 1024],
+                        help="Texts per insert_embeddings call")
+    parser.add_argument("--search-size", type=int, default=10_000)
+    parser.add_argument("--search-batch", type=int, default=16)
+    parser.add_argument("--api-store", choices=["local", "qdrant"], default="local")
+    parser.add_argument("--api-corpus", type=int, default=10_000)
+    parser.add_argument("--api-requests", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0,
+                        help="Simulated upstream latency per embedding call")
+    parser.add_argument("--embed-rpm", type=float, default=1e9,
+                        help="Upstream rate limit applied to the simulated embedder (calls per minute)")
+    parser.add_argument("--quick", action="store_true", help="Small sizes for a smoke run")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown per metric before it counts as a regression")
+    parser.add_argument("--no-fail", action="store_true", help="Report regressions without a failing exit code")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.dim, args.queries, args.repeat = 64, 20, 1
+        args.sizes, args.insert_size, args.chunk_sizes = [1_000], 200, [50]
+        args.search_size, args.api_corpus, args.api_requests = 500, 500, 40
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results: Results = {}
+    # QdrantConfig reads these; the benchmark collections override them anyway.
+    with env_defaults(QDRANT_VECTOR_SIZE=str(args.dim), EMBEDDING_CACHE_ENABLED="false"):
+        for name in args.scenarios:
+            SCENARIOS[name](args, results)
+    print_results(results)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline["results"], args.tolerance)
+        print_comparison(rows, args.tolerance)
+        if any(row["regressed"] for row in rows) and not args.no_fail:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
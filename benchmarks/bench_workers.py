@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_startup import free_port, wait_for
+
+def zipf_queries(count, vocabulary, exponent, seed):
+    # Repeated queries with a long tail, the way real traffic repeats popular texts.
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, vocabulary + 1)
+    weights = ranks ** -exponent
+    picks = rng.choice(vocabulary, size=count, p=weights / weights.sum())
+    return [f"query number {i} about topic {i % 97}" for i in picks]
+
+async def drive(base_url, queries, concurrency, search_share, timeout):
+    latencies = []
+    errors = 0
+    position = 0
+
+    async def worker(client):
+        nonlocal position, errors
+        while position < len(queries):
+            i = position
+            position += 1
+            path = "/search" if (i % 100) < search_share * 100 else "/embedding"
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json={"text": queries[i]})
+                resp.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # Up to `concurrency` keep-alive connections; the kernel spreads them over the workers' shared socket.
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+def run(workers, shared, env, args):
+    port = free_port()
+    command = [sys.executable, os.path.join(env["PYTHONPATH"], "scripts", "serve.py"),
+               "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A fresh directory per run, so every run starts with cold caches.
+        run_env = {**env, "SHARED_CACHE_DIR": cache_dir, "SHARED_CACHE_CACHES": "true" if shared else "false"}
+        if not shared:
+            command.append("--per-process-caches")
+        proc = subprocess.Popen(command, env=run_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+                wait_for(client, "/readyz", time.perf_counter() + args.timeout)
+            queries = zipf_queries(args.requests, args.vocabulary, args.zipf, args.seed)
+            latencies, errors, elapsed = asyncio.run(
+                drive(base_url, queries, args.concurrency, args.search_share, args.timeout))
+            # Let every worker publish its final counters before reading the totals.
+            time.sleep(float(env.get("SHARED_CACHE_STATS_INTERVAL_S", "1")) + 0.5)
+            with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+                totals = client.get("/stats").json()["workers"]
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    embedding_cache = totals["embedding_cache"] or {}
+    search_cache = totals["search_cache"] or {}
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "workers_reporting": totals["count"],
+        "rps": len(queries) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "errors": errors,
+        "embedding_hit_rate": embedding_cache.get("hit_rate", 0.0),
+        "embedding_shared_hits": embedding_cache.get("disk_hits", 0),
+        "embedding_misses": embedding_cache.get("misses", 0),
+        "search_hit_rate": search_cache.get("hit_rate", 0.0),
+    }
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Throughput and cache hit rate from 1 to N workers, per-process vs shared caches")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--vocabulary", type=int, default=2000, help="Distinct query texts")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the query distribution")
+    parser.add_argument("--search-share", type=float, default=0.5, help="Fraction of requests sent to /search")
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0,
+                        help="Simulated latency of each local embedding call, i.e. the cost of a cache miss")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": base_dir,
+        "EMBEDDING_BACKEND": "local",
+        "VECTOR_STORE_BACKEND": "local",
+        "LOCAL_EMBEDDING_LATENCY_MS": str(args.embed_latency_ms),
+        "EMBEDDING_REQUESTS_PER_MINUTE": "1000000000",
+        "EMBEDDING_CACHE_ENABLED": "true",
+        "EMBEDDING_CACHE_PATH": "",
+        "SEARCH_CACHE_ENABLED": "true",
+        "SEARCH_CACHE_PATH": "",
+        "EMBEDDING_WARMUP": "false",
+        "METRICS_LOOP_LAG_INTERVAL_MS": "0",
+    }
+    env.setdefault("QDRANT_COLLECTION_NAME", "workers_benchmark")
+
+    results = {}
+    for workers in (int(n) for n in args.workers.split(",")):
+        for shared in (False, True):
+            name = f"{workers} workers, {'shared' if shared else 'per-process'} caches"
+            results[name] = run(workers, shared, env, args)
+            print(f"{name:<32} " + "  ".join(
+                f"{key}={value:8.2f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in results[name].items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import base64
+import json
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # in requirements.txt; the stdlib encoder is only a fallback for minimal installs
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Binary body: a 16-byte little-endian header followed by count x dimension values, row-major.
+#   magic "EMB1" | dtype code (u8) | reserved (u8) | reserved (u16) | count (u32) | dimension (u32)
+BINARY_MAGIC = b"EMB1"
+BINARY_HEADER = struct.Struct("<4sBBHII")
+DTYPES = {"float32": (1, np.dtype("<f4")), "float16": (2, np.dtype("<f2"))}
+DTYPE_NAMES = {code: name for name, (code, _) in DTYPES.items()}
+
+@dataclass(frozen=True)
+class ResponseFormat:
+    kind: str = "json"  # "json", "base64" (vectors as base64 strings inside JSON) or "binary"
+    dtype: str = "float32"
+
+    @property
+    def media_type(self) -> str:
+        return BINARY_MEDIA_TYPE if self.kind == "binary" else JSON_MEDIA_TYPE
+
+def _parse_accept(accept: str) -> List[Tuple[str, dict]]:
+    entries = []
+    for position, part in enumerate(accept.split(",")):
+        media, *params = [piece.strip() for piece in part.split(";")]
+        values = {}
+        for param in params:
+            key, _, value = param.partition("=")
+            values[key.strip().lower()] = value.strip().strip('"').lower()
+        try:
+            q = float(values.pop("q", "1"))
+        except ValueError:
+            q = 0.0
+        if media and q > 0:
+            entries.append((-q, position, media.lower(), values))
+    return [(media, values) for _, _, media, values in sorted(entries)]
+
+def negotiate(accept: Optional[str]) -> ResponseFormat:
+    # Accept: application/json                                  -> JSON float arrays (default)
+    #         application/json; encoding=base64[; dtype=float16] -> base64 vectors inside JSON
+    #         application/octet-stream[; dtype=float16]          -> raw binary
+    if not accept:
+        return ResponseFormat()
+    for media, params in _parse_accept(accept):
+        dtype = params.get("dtype", "float32")
+        if dtype not in DTYPES:
+            continue
+        if media == BINARY_MEDIA_TYPE:
+            return ResponseFormat("binary", dtype)
+        if media in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            if params.get("encoding") == "base64":
+                return ResponseFormat("base64", dtype)
+            if dtype == "float32":
+                return ResponseFormat()
+    raise ValueError(f"None of the accepted media types are supported: {accept}")
+
+def to_bytes(vectors, dtype: str = "float32") -> bytes:
+    return np.asarray(vectors, dtype=DTYPES[dtype][1]).tobytes()
+
+def pack_vectors(vectors, dtype: str = "float32") -> bytes:
+    matrix = np.asarray(vectors, dtype=DTYPES[dtype][1])
+    if matrix.ndim == 1:  # a single vector, or no vectors at all
+        matrix = matrix.reshape(1, -1) if matrix.size else matrix.reshape(0, 0)
+    header = BINARY_HEADER.pack(BINARY_MAGIC, DTYPES[dtype][0], 0, 0, matrix.shape[0], matrix.shape[1])
+    return header + matrix.tobytes()
+
+def unpack_vectors(data: bytes) -> np.ndarray:
+    magic, code, _, _, count, dimension = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or code not in DTYPE_NAMES:
+        raise ValueError("Not an embedding payload")
+    dtype = DTYPES[DTYPE_NAMES[code]][1]
+    return np.frombuffer(data, dtype=dtype, count=count * dimension, offset=BINARY_HEADER.size).reshape(count, dimension)
+
+def encode_vector(vector: Sequence[float], fmt: ResponseFormat):
+    if fmt.kind == "base64":
+        return base64.b64encode(to_bytes(vector, fmt.dtype)).decode("ascii")
+    return vector
+
+def decode_vector(value: str, dtype: str = "float32") -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=DTYPES[dtype][1])
+
+def dumps(content) -> bytes:
+    # Vectors are already plain floats, so they are encoded directly instead of being
+    # validated and walked element by element by pydantic and jsonable_encoder.
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -1,11 +1,72 @@
-from typing import List
+import os
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-class EmbedRequest(BaseModel):
+from app.metrics import span
+
+MAX_BATCH_ITEMS = int(os.getenv("API_MAX_BATCH_ITEMS", "1000"))
+MAX_TEXT_CHARS = int(os.getenv("API_MAX_TEXT_CHARS", "20000"))
+# Hybrid search fetches a multiple of top_k from each side, so it is capped like the batch size.
+MAX_TOP_K = int(os.getenv("API_MAX_TOP_K", "100"))
+
+# "dense": vector search; "sparse": BM25 keyword search, no embedding call; "hybrid": both, fused by rank.
+SearchMode = Literal["dense", "sparse", "hybrid"]
+
+class TimedRequest(BaseModel):
+    # Request bodies time their own validation, which FastAPI runs before the endpoint is entered.
+    @model_validator(mode="wrap")
+    @classmethod
+    def _timed(cls, data, handler):
+        with span("validation"):
+            return handler(data)
+
+class EmbedRequest(TimedRequest):
     text: str = Field(min_length=1)
 
 class EmbedResponse(BaseModel):
     text:str
-    embedding: List[float]
-    dimension: int
\ No newline at end of file
+    # A base64 string of little-endian floats when requested with "Accept: application/json; encoding=base64".
+    embedding: Union[List[float], str]
+    dimension: int
+    encoding: Optional[str] = None
+    dtype: Optional[str] = None
+
+class EmbedBatchRequest(TimedRequest):
+    texts: List[str] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+class EmbedBatchItem(BaseModel):
+    index: int
+    text: str
+    embedding: Optional[Union[List[float], str]] = None
+    dimension: Optional[int] = None
+    encoding: Optional[str] = None
+    dtype: Optional[str] = None
+    error: Optional[str] = None
+
+class EmbedBatchResponse(BaseModel):
+    items: List[EmbedBatchItem]
+    succeeded: int
+    failed: int
+
+class SearchBatchRequest(TimedRequest):
+    queries: List[str] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+    top_k: int = Field(default=5, ge=1, le=MAX_TOP_K)
+    mode: SearchMode = "dense"
+    # Payload conditions, e.g. {"tenant": "acme", "year": {"gte": 2020}}; see app.vector_store.SearchFilter.
+    filter: Optional[Dict[str, Any]] = None
+    # Payload fields returned with each hit: a list of field names, or true for the whole payload.
+    with_payload: Union[bool, List[str]] = False
+
+class SearchBatchItem(BaseModel):
+    index: int
+    query: str
+    results: List[dict] = Field(default_factory=list)
+    error: Optional[str] = None
+
+class SearchBatchResponse(BaseModel):
+    top_k: int
+    mode: SearchMode
+    items: List[SearchBatchItem]
+    succeeded: int
+    failed: int
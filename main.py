@@ -1,30 +1,178 @@
+import asyncio
+import os
+import time
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import FastAPI, Header, HTTPException, Response, status, Depends
+from fastapi.concurrency import run_in_threadpool
+from pydantic import Field
 
+from app.batching import EmbeddingBatcher, EmbeddingBatcherConfig
+from app.concurrency import ConcurrencyLimiter, OverloadedError
 from app.embeddings import EmbeddingGenerator
-from app.qdrant_utils import QdrantVectorStore, initialize_collection
-from dto.pydantic_utils import EmbedResponse, EmbedRequest
+from app.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, flatten_stats, monitor_event_loop, span
+from app.profiler import ProfilerConfig, SlowRequestProfiler
+from app.search_cache import SearchCache, SearchCacheConfig, options_key
+from app.shared_cache import SharedCacheConfig, WorkerStats, sum_stats
+from app.sparse_index import BM25Index, SparseIndexConfig, index_mtime, load_or_create, reciprocal_rank_fusion
+from app.startup import StartupConfig, StartupTracker
+from app.vector_store import (
+    PayloadSelector,
+    SearchFilter,
+    VectorStore,
+    initialize_vector_store,
+    matches_filter,
+    select_payload,
+    validate_filter,
+)
+from dto.encoding import BINARY_MEDIA_TYPE, JSON_MEDIA_TYPE, ResponseFormat, dumps, encode_vector, negotiate, pack_vectors
+from dto.pydantic_utils import (
+    MAX_TEXT_CHARS,
+    MAX_TOP_K,
+    EmbedBatchRequest,
+    EmbedBatchResponse,
+    EmbedRequest,
+    EmbedResponse,
+    SearchBatchRequest,
+    SearchBatchResponse,
+    SearchMode,
+)
 
 embedding_generator: Optional[EmbeddingGenerator] = None
-vector_store: Optional[QdrantVectorStore] = None
+vector_store: Optional[VectorStore] = None
+embedding_batcher: Optional[EmbeddingBatcher] = None
+sparse_index: Optional[BM25Index] = None
+sparse_config = SparseIndexConfig()
+# mtime of the sparse index file when it was last loaded; a newer file is loaded on the next search.
+sparse_index_mtime: Optional[int] = None
+search_cache: Optional[SearchCache] = None
+startup: Optional[StartupTracker] = None
+# Set when workers share caches (SHARED_CACHE_DIR); /stats then also reports totals over all workers.
+worker_stats: Optional[WorkerStats] = None
+# Cold-start timings (startup_ready_seconds, /readyz) count from module load.
+PROCESS_STARTED = time.perf_counter()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global embedding_generator, vector_store
-    print("🚀 Starting Embeddings API...")
+profiler_config = ProfilerConfig()
+slow_request_profiler = SlowRequestProfiler(profiler_config) if profiler_config.enabled else None
+# Event loop lag is sampled at this interval; 0 disables the monitor.
+loop_lag_interval_ms = float(os.getenv("METRICS_LOOP_LAG_INTERVAL_MS", "100"))
+
+# Requests beyond max in-flight wait in a bounded queue; once that is full we shed load with a 503.
+request_limiter = ConcurrencyLimiter(
+    max_in_flight=int(os.getenv("API_MAX_IN_FLIGHT", "64")),
+    max_waiting=int(os.getenv("API_MAX_QUEUE", "256")),
+)
+
+async def connect_services(tracker: StartupTracker) -> None:
+    warm_up = os.getenv("EMBEDDING_WARMUP", "false").lower() == "true"
+    tracker.expect("embedding", "vector_store", *(["warm_up"] if warm_up else []),
+                   *(["sparse_index"] if sparse_config.enabled else []))
+
+    async def load_sparse_index():
+        # Independent of Vertex and Qdrant, so sparse-only search works even while they are down.
+        global sparse_index
 
+        def load():
+            global sparse_index_mtime
+            # Taken before reading, so a save that lands during the load is picked up later.
+            sparse_index_mtime = index_mtime(sparse_config.path)
+            return load_or_create(sparse_config)
+
+        sparse_index = await tracker.run("sparse_index", load)
+        print(f"Sparse index loaded with {len(sparse_index)} documents.")
+
+    async def connect_embedding_and_store():
+        global embedding_generator, embedding_batcher
+        generator = await tracker.run("embedding", EmbeddingGenerator)
+        batcher_config = EmbeddingBatcherConfig()
+        if batcher_config.enabled:
+            embedding_batcher = EmbeddingBatcher(generator, batcher_config)
+        embedding_generator = generator
+
+        async def connect_store():
+            global vector_store
+            vector_store = await tracker.run(
+                "vector_store", lambda: initialize_vector_store(dimension=generator.dimension)
+            )
+
+        steps = [connect_store()]
+        if warm_up:
+            # Loads the model handle so the first request does not pay for it.
+            steps.append(tracker.run("warm_up", generator.warm_up))
+        await asyncio.gather(*steps)
+
+    tasks = [connect_embedding_and_store()]
+    if sparse_config.enabled:
+        tasks.append(load_sparse_index())
     try:
-        embedding_generator = EmbeddingGenerator()
-        vector_store = initialize_collection()
-        print("Embedding service and Qdrant connection initialized.")
+        await asyncio.gather(*tasks)
     except Exception as e:
+        # Only reached once STARTUP_MAX_ATTEMPTS is used up; /readyz keeps reporting the error.
         print(f"Error during startup: {e}")
+        if tracker.config.wait:
+            raise
+        return
+    print(f"Embedding service and vector store initialized in {time.perf_counter() - tracker.started:.2f}s.")
+
+def service_stats(generator: EmbeddingGenerator) -> dict:
+    return {
+        "embedding_cache": generator.cache.stats() if generator.cache else None,
+        "upstream": generator.batch_embedder.stats(),
+        "requests": request_limiter.stats(),
+        "batching": embedding_batcher.stats() if embedding_batcher else None,
+        "sparse_index": sparse_index.stats() if sparse_index else None,
+        "search_cache": search_cache.stats() if search_cache else None,
+    }
+
+async def publish_worker_stats(publisher: WorkerStats, interval_s: float) -> None:
+    while True:
+        if embedding_generator is not None:
+            await run_in_threadpool(publisher.publish, service_stats(embedding_generator))
+        await asyncio.sleep(interval_s)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global search_cache, startup, worker_stats
+    print("🚀 Starting Embeddings API...")
+
+    loop_monitor = None
+    if loop_lag_interval_ms > 0:
+        loop_monitor = asyncio.create_task(monitor_event_loop(loop_lag_interval_ms / 1000))
+    if slow_request_profiler is not None:
+        slow_request_profiler.start()
+
+    cache_config = SearchCacheConfig()
+    if cache_config.enabled:
+        search_cache = SearchCache(cache_config)
+
+    stats_publisher = None
+    shared_config = SharedCacheConfig()
+    if shared_config.directory:
+        worker_stats = WorkerStats(shared_config)
+        stats_publisher = asyncio.create_task(publish_worker_stats(worker_stats, shared_config.stats_interval_s))
+
+    # Nothing here blocks on Vertex or Qdrant: components come up in the background with retries,
+    # and each one is served as soon as it is ready. /readyz turns 200 once all of them are.
+    startup = StartupTracker(StartupConfig(), started=PROCESS_STARTED)
+    connect = asyncio.create_task(connect_services(startup))
+    if startup.config.wait:
+        await connect
 
     yield
 
     print("Shutting down Embeddings API...")
+    connect.cancel()
+    if stats_publisher is not None:
+        stats_publisher.cancel()
+    if loop_monitor is not None:
+        loop_monitor.cancel()
+    if slow_request_profiler is not None:
+        slow_request_profiler.stop()
+    if vector_store is not None:
+        await vector_store.aclose()
+    if embedding_generator is not None:
+        embedding_generator.close()
 
 
 # FastAPI app configuration
@@ -34,6 +182,7 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan,
 )
+app.add_middleware(MetricsMiddleware, profiler=slow_request_profiler)
 
 def get_embedding_generator() -> EmbeddingGenerator:
     if embedding_generator is None:
@@ -43,7 +192,7 @@ def get_embedding_generator() -> EmbeddingGenerator:
         )
     return embedding_generator
 
-def get_vector_store() -> QdrantVectorStore:
+def get_vector_store() -> VectorStore:
     if vector_store is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -51,27 +200,287 @@ def get_vector_store() -> QdrantVectorStore:
         )
     return vector_store
 
+def get_sparse_index() -> BM25Index:
+    if sparse_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sparse index not enabled"
+        )
+    return sparse_index
+
+async def current_sparse_index() -> BM25Index:
+    # Ingestion runs in another process and rewrites the index file, so it is reloaded when that changes.
+    global sparse_index, sparse_index_mtime
+    index = get_sparse_index()
+    mtime = index_mtime(sparse_config.path)
+    if mtime is not None and mtime != sparse_index_mtime:
+        # Set first, so concurrent searches keep using the old index instead of loading it again.
+        sparse_index_mtime = mtime
+        index = await run_in_threadpool(BM25Index.load, sparse_config.path)
+        sparse_index = index
+        print(f"Sparse index reloaded with {len(index)} documents.")
+    return index
+
+def overloaded(e: OverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
+
+async def limit_concurrency():
+    try:
+        await request_limiter.acquire()
+    except OverloadedError as e:
+        raise overloaded(e) from e
+    try:
+        yield
+    finally:
+        request_limiter.release()
+
+
+def get_response_format(accept: Optional[str] = Header(default=None)) -> ResponseFormat:
+    try:
+        return negotiate(accept)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=str(e)) from e
+
+def json_response(content, status_code: int = status.HTTP_200_OK) -> Response:
+    # Bypasses response_model validation and jsonable_encoder, which dominate the cost for large vectors.
+    with span("encode"):
+        body = dumps(content)
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+def binary_response(vectors, dtype: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    with span("encode"):
+        body = pack_vectors(vectors, dtype)
+    return Response(content=body, media_type=BINARY_MEDIA_TYPE, headers=headers)
+
+def embedding_fields(embedding: List[float], fmt: ResponseFormat) -> dict:
+    fields = {"embedding": encode_vector(embedding, fmt), "dimension": len(embedding)}
+    if fmt.kind == "base64":
+        fields.update(encoding="base64", dtype=fmt.dtype)
+    return fields
+
+BINARY_RESPONSES = {200: {"content": {BINARY_MEDIA_TYPE: {}}}}
+
+async def embed_text(generator: EmbeddingGenerator, text: str):
+    # Single-text requests are coalesced into shared upstream batches when batching is enabled.
+    if embedding_batcher is not None:
+        return await embedding_batcher.embed(text)
+    return await generator.agenerate_embedding(text)
+
+async def filter_sparse_hits(
+        store: VectorStore,
+        hits: List[List[dict]],
+        limit: int,
+        query_filter: Optional[SearchFilter],
+        with_payload: PayloadSelector,
+        ) -> List[List[dict]]:
+    # The BM25 index holds no payloads, so filters and payload fields are resolved against the vector store.
+    # That also drops hits the store no longer has, e.g. points pruned after the index was loaded.
+    fields = None if with_payload is True else list(dict.fromkeys([*(query_filter or {}), *(with_payload or [])]))
+    ids = list(dict.fromkeys(hit["id"] for query_hits in hits for hit in query_hits))
+    payloads = await run_in_threadpool(store.retrieve_payloads, ids, fields)
+    filtered = []
+    for query_hits in hits:
+        kept = [hit for hit in query_hits if hit["id"] in payloads and matches_filter(payloads[hit["id"]], query_filter)]
+        if with_payload:
+            kept = [{**hit, "payload": select_payload(payloads[hit["id"]], with_payload)} for hit in kept]
+        filtered.append(kept[:limit])
+    return filtered
+
+async def embed_queries(texts: List[str], single: bool = False) -> List[List[float]]:
+    generator = get_embedding_generator()
+    if single:
+        # Single queries go through the request coalescer when it is enabled.
+        return [await embed_text(generator, texts[0])]
+    return await generator.agenerate_embeddings(texts)
+
+async def search_texts(texts: List[str], request, single: bool = False) -> List[List[dict]]:
+    # request is a SearchRequest or SearchBatchRequest; both carry top_k, mode, filter and with_payload.
+    try:
+        validate_filter(request.filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if search_cache is None:
+        return await run_search(texts, request, single)
+
+    options = options_key(request.top_k, request.mode, request.filter, request.with_payload)
+    generation = vector_store.generation if vector_store is not None else 0
+    results = [search_cache.get(text, options, generation) for text in texts]
+    missing = [i for i, hits in enumerate(results) if hits is None]
+    vectors = None
+    if missing and request.mode != "sparse" and search_cache.config.similarity > 0:
+        # Paraphrases of cached queries are answered from the cache; the embedding is needed
+        # for the search anyway, so only the store round-trip is saved or spent.
+        vectors = dict(zip(missing, await embed_queries([texts[i] for i in missing], single)))
+        for i in missing:
+            results[i] = search_cache.get_similar(vectors[i], options, generation)
+        missing = [i for i in missing if results[i] is None]
+    else:
+        for _ in missing:
+            search_cache.miss()
+    if missing:
+        query_vectors = [vectors[i] for i in missing] if vectors is not None else None
+        fresh = await run_search([texts[i] for i in missing], request, single, query_vectors)
+        for i, hits in zip(missing, fresh):
+            results[i] = hits
+            search_cache.put(texts[i], options, hits, generation, vectors[i] if vectors is not None else None)
+    return results
+
+async def run_search(
+        texts: List[str],
+        request,
+        single: bool = False,
+        query_vectors: Optional[List[List[float]]] = None,
+        ) -> List[List[dict]]:
+    top_k, mode, query_filter, with_payload = request.top_k, request.mode, request.filter, request.with_payload
+    # Hybrid mode over-fetches from both sides so fusion has enough overlap to work with.
+    limit = top_k * sparse_config.candidates if mode == "hybrid" else top_k
+    sparse_hits = []
+    if mode != "dense":
+        index = await current_sparse_index()
+        # Filtered sparse hits are dropped after retrieval, so fetch extra to still fill the limit.
+        fetch = limit * sparse_config.candidates if query_filter else limit
+        sparse_hits = await run_in_threadpool(lambda: [index.search(text, fetch) for text in texts])
+        if query_filter or with_payload or vector_store is not None:
+            # Without a filter the store is only consulted once connected, so sparse-only search still
+            # works while Qdrant is down.
+            sparse_hits = await filter_sparse_hits(get_vector_store(), sparse_hits, limit, query_filter, with_payload)
+        if mode == "sparse":
+            return sparse_hits
+
+    store = get_vector_store()
+    if query_vectors is None:
+        query_vectors = await embed_queries(texts, single)
+    options = dict(top_k=limit, query_filter=query_filter, with_payload=with_payload)
+    if single:
+        dense_hits = [await store.asearch_similar_texts(query_vector=query_vectors[0], **options)]
+    else:
+        # One query_batch_points round-trip instead of one query_points call per query.
+        dense_hits = await store.asearch_similar_texts_batch(query_vectors=query_vectors, **options)
+    if mode == "dense":
+        return dense_hits
+    return [
+        reciprocal_rank_fusion([dense, sparse], top_k, k=sparse_config.rrf_k)
+        for dense, sparse in zip(dense_hits, sparse_hits)
+    ]
+
+async def run_sub_batches(
+        indices: List[int],
+        texts: List[str],
+        run: Callable[[List[int]], Awaitable[list]],
+        errors: Dict[int, str],
+        message: str,
+        ) -> Dict[int, Any]:
+    # Splits the items along the upstream batch plan and runs the sub-batches concurrently, so a failed
+    # Vertex or Qdrant call only fails its own items. Their errors are added to errors in place.
+    # HTTPExceptions concern the whole request (bad filter, service not ready) and are re-raised.
+    if embedding_generator is not None:
+        plan = embedding_generator.batch_embedder.plan_batches([texts[i] for i in indices])
+    else:
+        plan = [(0, len(indices))] if indices else []
+    chunks = [indices[start:end] for start, end in plan]
+    outcomes = await asyncio.gather(*(run(chunk) for chunk in chunks), return_exceptions=True)
+    results = {}
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, HTTPException):
+            raise outcome
+        if isinstance(outcome, OverloadedError):
+            raise overloaded(outcome) from outcome
+        if isinstance(outcome, BaseException):
+            for i in chunk:
+                errors[i] = f"{message}: {outcome}"
+            continue
+        results.update(zip(chunk, outcome))
+    return results
+
+def validate_batch_texts(texts: List[str]) -> Dict[int, str]:
+    errors = {}
+    for i, text in enumerate(texts):
+        if not text.strip():
+            errors[i] = "Text cannot be empty"
+        elif len(text) > MAX_TEXT_CHARS:
+            errors[i] = f"Text exceeds {MAX_TEXT_CHARS} characters"
+    return errors
+
+
+def component_stats() -> Dict[str, float]:
+    # The counters behind /stats, exported as gauges at scrape time.
+    generator = embedding_generator
+    gauges = flatten_stats("embeddings_api_requests", request_limiter.stats())
+    if generator is not None:
+        gauges.update(flatten_stats("embeddings_api_upstream", generator.batch_embedder.stats()))
+        gauges.update(flatten_stats("embeddings_api_embedding_cache", generator.cache.stats() if generator.cache else None))
+    gauges.update(flatten_stats("embeddings_api_batching", embedding_batcher.stats() if embedding_batcher else None))
+    gauges.update(flatten_stats("embeddings_api_search_cache", search_cache.stats() if search_cache else None))
+    gauges.update(flatten_stats("embeddings_api_sparse_index", sparse_index.stats() if sparse_index else None))
+    return gauges
+
+REGISTRY.add_collector(component_stats)
+
 
 # API ENDPOINTS
 @app.get("/")
 async def root():
     return {"message": "Welcome to Embeddings API"}
 
-@app.post("/embedding", response_model=EmbedResponse, status_code=200, tags=["Embeddings"])
+@app.get("/stats", tags=["Monitoring"])
+async def stats(generator: EmbeddingGenerator = Depends(get_embedding_generator)):
+    current = service_stats(generator)
+    if worker_stats is None:
+        return current
+    # This worker's counters, plus totals over every worker that published recently.
+    await run_in_threadpool(worker_stats.publish, current)
+    workers = await run_in_threadpool(worker_stats.collect)
+    return {
+        **current,
+        "pid": os.getpid(),
+        "workers": {
+            "count": len(workers),
+            **{section: sum_stats([w.get(section) for w in workers])
+               for section in ("embedding_cache", "upstream", "requests", "search_cache")},
+        },
+    }
+
+@app.get("/healthz", tags=["Monitoring"])
+async def healthz():
+    # Liveness: the process is up and the event loop is responsive. Never depends on Vertex or Qdrant,
+    # so an outage of either does not get the pod restarted.
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Monitoring"])
+async def readyz():
+    # Readiness: every startup component is initialized.
+    if startup is None:
+        return json_response({"ready": False, "components": {}}, status.HTTP_503_SERVICE_UNAVAILABLE)
+    state = startup.status()
+    return json_response(state, status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@app.get("/metrics", tags=["Monitoring"], include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition format.
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.post("/embedding", response_model=EmbedResponse, status_code=200, tags=["Embeddings"],
+          responses=BINARY_RESPONSES)
 async def generate_embedding(
     request: EmbedRequest,
-    generator: EmbeddingGenerator = Depends(get_embedding_generator)
-) -> EmbedResponse:
+    generator: EmbeddingGenerator = Depends(get_embedding_generator),
+    fmt: ResponseFormat = Depends(get_response_format),
+    _: None = Depends(limit_concurrency)
+) -> Response:
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
 
     try:
-        embedding = generator.generate_embedding(request.text)
-        return EmbedResponse(
-            text=request.text,
-            embedding=embedding,
-            dimension=len(embedding)
-        )
+        embedding = await embed_text(generator, request.text)
+        if fmt.kind == "binary":
+            return binary_response(embedding, fmt.dtype)
+        return json_response({"text": request.text, **embedding_fields(embedding, fmt)})
+    except OverloadedError as e:
+        raise overloaded(e) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -79,28 +488,87 @@ async def generate_embedding(
         ) from e
 
 class SearchRequest(EmbedRequest):
-    top_k: int = 5
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+    mode: SearchMode = "dense"
+    filter: Optional[Dict[str, Any]] = None
+    with_payload: Union[bool, List[str]] = False
 
 @app.post("/search", status_code=200, tags=["Search"])
 async def semantic_search(
     request: SearchRequest,
-    generator: EmbeddingGenerator = Depends(get_embedding_generator),
-    store: QdrantVectorStore = Depends(get_vector_store)
+    _: None = Depends(limit_concurrency)
 ):
     text = (request.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Text cannot be empty!!")
 
     try:
-        query_vec = generator.generate_embedding(text)
-        hits = store.search_similar_texts(query_vector=query_vec, top_k=request.top_k)
-        return {
+        hits = (await search_texts([text], request, single=True))[0]
+        return json_response({
             "query": text,
             "top_k": request.top_k,
+            "mode": request.mode,
             "results": hits
-        }
+        })
+    except HTTPException:
+        raise
+    except OverloadedError as e:
+        raise overloaded(e) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error performing search: {str(e)}"
         ) from e
+
+@app.post("/embeddings", response_model=EmbedBatchResponse, status_code=200, tags=["Embeddings"],
+          responses=BINARY_RESPONSES)
+async def generate_embeddings(
+    request: EmbedBatchRequest,
+    generator: EmbeddingGenerator = Depends(get_embedding_generator),
+    fmt: ResponseFormat = Depends(get_response_format),
+    _: None = Depends(limit_concurrency)
+) -> Response:
+    errors = validate_batch_texts(request.texts)
+    valid = [i for i in range(len(request.texts)) if i not in errors]
+
+    async def embed(indices):
+        return await generator.agenerate_embeddings([request.texts[i] for i in indices])
+
+    embedded = await run_sub_batches(valid, request.texts, embed, errors, "Error generating embedding")
+    if fmt.kind == "binary":
+        # One row per input text; rows of failed texts are zero and listed in X-Embedding-Errors.
+        dimension = len(next(iter(embedded.values()))) if embedded else 0
+        rows = [embedded.get(i, [0.0] * dimension) for i in range(len(request.texts))]
+        return binary_response(
+            rows, fmt.dtype,
+            headers={"X-Embedding-Errors": dumps({str(i): e for i, e in errors.items()}).decode("utf-8")},
+        )
+
+    items = []
+    for i, text in enumerate(request.texts):
+        if i in embedded:
+            items.append({"index": i, "text": text, **embedding_fields(embedded[i], fmt), "error": None})
+        else:
+            items.append({"index": i, "text": text, "embedding": None, "dimension": None, "error": errors[i]})
+    return json_response({"items": items, "succeeded": len(embedded), "failed": len(errors)})
+
+@app.post("/search/batch", response_model=SearchBatchResponse, status_code=200, tags=["Search"])
+async def semantic_search_batch(
+    request: SearchBatchRequest,
+    _: None = Depends(limit_concurrency)
+) -> Response:
+    queries = [q.strip() for q in request.queries]
+    errors = validate_batch_texts(queries)
+    valid = [i for i in range(len(queries)) if i not in errors]
+
+    async def search(indices):
+        return await search_texts([queries[i] for i in indices], request)
+
+    found = await run_sub_batches(valid, queries, search, errors, "Error performing search")
+    items = []
+    for i, query in enumerate(queries):
+        if i in found:
+            items.append({"index": i, "query": query, "results": found[i], "error": None})
+        else:
+            items.append({"index": i, "query": query, "results": [], "error": errors[i]})
+    return json_response({"top_k": request.top_k, "mode": request.mode, "items": items, "succeeded": len(found), "failed": len(errors)})
@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import time
+
+from app.dedup import DedupConfig, Deduplicator
+from app.embedding_store import EmbeddingStore
+from app.embeddings import EmbeddingGenerator
+from app.ingestion import IngestionConfig, ingest_file
+from app.sparse_index import SparseIndexConfig, load_or_create
+from app.vector_store import initialize_vector_store, owner_key, point_id
+
+def parse_args():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Stream a text file (one document per line) into Qdrant")
+    parser.add_argument("path", nargs="?", default=os.path.join(base_dir, "sample_sentences.txt"))
+    parser.add_argument("--collection", default=None, help="Target collection (defaults to QDRANT_COLLECTION_NAME)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Lines embedded per batch")
+    parser.add_argument("--queue-depth", type=int, default=None, help="Embedded batches buffered for upsert")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file used to resume after a crash")
+    parser.add_argument("--incremental", action="store_true", help="Only embed lines not already in the collection")
+    parser.add_argument("--prune", action="store_true", help="Delete points of this source and metadata missing from the file")
+    parser.add_argument("--source", default=None,
+                        help="Source name stored on each point and part of its id, so it must stay the same across "
+                             "runs; two files with the same name need distinct sources (defaults to the file name)")
+    parser.add_argument("--from-store", action="store_true",
+                        help="Treat path as a prebuilt embedding store and upload it without re-embedding")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Drop exact and near-duplicate lines before embedding (see DEDUP_* settings)")
+    parser.add_argument("--metadata", action="append", default=[], metavar="KEY=VALUE",
+                        help="Payload field stored on every point, usable in search filters (repeatable)")
+    return parser.parse_args()
+
+def parse_metadata(pairs):
+    # Values are read as JSON when possible so numbers and booleans keep their type: year=2024, public=true.
+    metadata = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            raise SystemExit(f"Invalid --metadata {pair!r}, expected KEY=VALUE")
+        try:
+            metadata[key] = json.loads(value)
+        except json.JSONDecodeError:
+            metadata[key] = value
+    return metadata
+
+def load_sparse_index(sparse_config: SparseIndexConfig):
+    if not sparse_config.enabled:
+        return None
+    sparse = load_or_create(sparse_config)
+    print(f"Sparse index: {len(sparse)} documents loaded from {sparse_config.path}")
+    return sparse
+
+def save_sparse_index(sparse, sparse_config: SparseIndexConfig):
+    if sparse is not None:
+        sparse.save(sparse_config.path)
+        print(f"Sparse index: {len(sparse)} documents saved to {sparse_config.path}")
+
+def upload_embedding_store(args, config: IngestionConfig, sparse_config: SparseIndexConfig):
+    embeddings = EmbeddingStore.open(args.path)
+    embeddings.verify()
+    store = initialize_vector_store(dimension=embeddings.dimension)
+
+    metadata = parse_metadata(args.metadata)
+    source = args.source or os.path.basename(os.path.normpath(args.path))
+    owner = owner_key(source, metadata)
+    start = time.perf_counter()
+    count = store.insert_from_embedding_store(
+        embeddings,
+        collection_name=args.collection,
+        batch_size=config.batch_size,
+        payload={**metadata, "source": source, "owner": owner, "model": embeddings.header["model"]},
+        owner=owner,
+    )
+    print(f"Finished: {count} embeddings uploaded in {time.perf_counter() - start:.1f}s")
+
+    sparse = load_sparse_index(sparse_config)
+    if sparse is not None:
+        for _, texts, _ in embeddings.iter_batches(config.batch_size):
+            sparse.add([point_id(text, owner) for text in texts], texts)
+        save_sparse_index(sparse, sparse_config)
+
+def main():
+    args = parse_args()
+    config = IngestionConfig()
+    if args.batch_size:
+        config.batch_size = args.batch_size
+    if args.queue_depth:
+        config.queue_depth = args.queue_depth
+    if args.checkpoint:
+        config.checkpoint_path = args.checkpoint
+    if args.incremental:
+        config.incremental = True
+    if args.prune:
+        config.prune = True
+
+    sparse_config = SparseIndexConfig()
+    if args.from_store:
+        upload_embedding_store(args, config, sparse_config)
+        return
+
+    embedder = EmbeddingGenerator()
+    store = initialize_vector_store(dimension=embedder.dimension)
+    sparse = load_sparse_index(sparse_config)
+    dedup_config = DedupConfig()
+    deduplicator = Deduplicator(dedup_config) if dedup_config.enabled or args.dedup else None
+
+    start = time.perf_counter()
+    report = ingest_file(
+        args.path,
+        embedder,
+        store,
+        config=config,
+        collection_name=args.collection,
+        progress=lambda count: print(f"Ingested {count} lines"),
+        source=args.source,
+        sparse_index=sparse,
+        metadata=parse_metadata(args.metadata),
+        deduplicator=deduplicator,
+        sparse_index_path=sparse_config.path,
+    )
+    save_sparse_index(sparse, sparse_config)
+    elapsed = time.perf_counter() - start
+    print(f"Finished: {report['ingested']} lines ingested in {elapsed:.1f}s "
+          f"(resumed from {report['resumed_from']}, total {report['total']})")
+    print(f"added={report['added']} updated={report['updated']} "
+          f"unchanged={report['unchanged']} removed={report['removed']}")
+    if deduplicator is not None:
+        dedup = report["dedup"]
+        print(f"dedup: kept={dedup['kept']} dropped={dedup['dropped']} clusters={dedup['clusters']} "
+              f"cluster sizes={dedup['cluster_sizes']}")
+        saved = deduplicator.save_report()
+        if saved:
+            print(f"Duplicate pointers written to {saved}")
+
+if __name__ == "__main__":
+    main()
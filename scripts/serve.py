@@ -0,0 +1,33 @@
+import argparse
+import os
+
+import uvicorn
+
+def parse_args():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Serve the API, optionally with several worker processes")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")))
+    parser.add_argument("--shared-cache-dir", default=os.getenv("SHARED_CACHE_DIR") or os.path.join(base_dir, ".cache"),
+                        help="Cache files shared by the workers (used when --workers > 1)")
+    parser.add_argument("--per-process-caches", action="store_true",
+                        help="Give each worker its own caches instead of sharing them")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.workers > 1:
+        # Read by every worker at import; the embedding and search caches then put their
+        # second tier in WAL-mode SQLite files here, so a vector embedded by one worker is a
+        # hit in all of them. /stats sums the workers' counters either way.
+        os.environ["SHARED_CACHE_DIR"] = args.shared_cache_dir
+        os.environ["SHARED_CACHE_CACHES"] = "false" if args.per_process_caches else "true"
+        mode = "per-process" if args.per_process_caches else f"shared ({args.shared_cache_dir})"
+        print(f"Serving with {args.workers} workers, {mode} caches")
+    # Workers are separate processes, each with its own model handle and store clients.
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+if __name__ == "__main__":
+    main()
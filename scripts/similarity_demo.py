@@ -1,6 +1,10 @@
+import hashlib
 import os
+from typing import Optional
+
+from app.embedding_store import EmbeddingStore, EmbeddingStoreError
 from app.embeddings import EmbeddingGenerator
-from app.similarity import cosine_similarity, dot_product_similarity, euclidean_distance
+from app.similarity import CorpusMatrix
 
 
 def load_sentences(path: str):
@@ -10,38 +14,74 @@ def load_sentences(path: str):
         lines = [line.strip() for line in f.readlines()]
     return [ln for ln in lines if ln]
 
-def find_top_k_similar(query_vector, sentence_embeddings, sentences, top_k=3):
-    similarities = []
-    sort_desc = None
-    for i, embedding in enumerate(sentence_embeddings):
-        # Cosine
-        sim_score = cosine_similarity(query_vector, embedding)
-        sort_desc=True
+def print_progress(done: int, total: int):
+    print(f"Embedded {done}/{total} sentences")
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-        # Dot-Product
-        # sim_score = dot_product_similarity(query_vector, embedding)
-        # sort_desc = True
+def open_cached_store(path: str, embedder, source_sha256: str) -> Optional[EmbeddingStore]:
+    # A store is only reused when it was built from the same file by the same model at the same size.
+    if not EmbeddingStore.exists(path):
+        return None
+    try:
+        store = EmbeddingStore.open(path)
+    except EmbeddingStoreError as e:
+        print(f"Rebuilding {path}: {e}")
+        return None
+    expected = {"model": embedder.model_name, "dimension": embedder.dimension}
+    stale = [key for key, value in expected.items() if store.header.get(key) != value]
+    if store.header.get("metadata", {}).get("source_sha256") != source_sha256:
+        stale.append("source file")
+    if stale:
+        store.close()
+        print(f"Rebuilding {path}: {', '.join(stale)} changed")
+        return None
+    return store
 
-        # Euclidean
-        # sim_score = euclidean_distance(query_vector, embedding)
-        # sort_desc = False
+def load_or_build_store(path: str, sentences_file: str, embedder) -> EmbeddingStore:
+    # Embeddings are computed once and reopened (memory-mapped) on later runs.
+    source_sha256 = file_sha256(sentences_file)
+    store = open_cached_store(path, embedder, source_sha256)
+    if store is not None:
+        print(f"Loaded {len(store)} embeddings from {path}")
+        return store
+    sentences = load_sentences(sentences_file)
+    print(f"Loaded {len(sentences)} sentences")
+    print("Generating embeddings..")
+    embeddings = embedder.generate_embeddings(sentences, progress=print_progress)
+    store = EmbeddingStore.create(path, dimension=embedder.dimension, model=embedder.model_name,
+                                  metadata={"source_sha256": source_sha256}, overwrite=True)
+    store.append(sentences, embeddings)
+    print(f"Embeddings generated successfully and saved to {path}!!")
+    return store
 
-        similarities.append((sentences[i], sim_score))
+def find_top_k_similar(query_vector, sentence_embeddings, sentences, top_k=3, metric="cosine"):
+    # metric: "cosine" or "dot" (higher is closer), "euclidean" (lower is closer)
+    corpus = sentence_embeddings
+    if isinstance(corpus, EmbeddingStore):
+        # Scored block by block straight from the memory map.
+        indices, scores = corpus.search(query_vector, k=top_k, metric=metric)
+        return [(sentences[i], float(score)) for i, score in zip(indices[0], scores[0])]
+    if not isinstance(corpus, CorpusMatrix):
+        corpus = CorpusMatrix(sentence_embeddings)
 
-    similarities.sort(key=lambda x: x[1], reverse=sort_desc)
-    return similarities[:top_k]
+    indices, scores = corpus.top_k(query_vector, k=top_k, metric=metric)
+    return [(sentences[i], float(score)) for i, score in zip(indices[0], scores[0])]
 
 def main():
     embedder = EmbeddingGenerator()
 
     base_dir = os.path.dirname(os.path.dirname(__file__))
     sentences_file = os.path.join(base_dir, "sample_sentences.txt")
-    sentences = load_sentences(sentences_file)
-    print(f"Loaded {len(sentences)} sentences")
 
-    print("Generating embeddings..")
-    sentence_embeddings = embedder.generate_embeddings(sentences)
-    print("Embeddings generated successfully!!")
+    store_path = os.getenv("EMBEDDING_STORE_PATH") or os.path.join(base_dir, "sample_sentences.emb")
+    store = load_or_build_store(store_path, sentences_file, embedder)
+    sentences = store.texts()
 
     while True:
         query = input("\nEnter your query sentence or type exit to quit:: ").strip()
@@ -54,7 +94,7 @@ def main():
             continue
 
         query_embedding = embedder.generate_embedding(query)
-        top_results = find_top_k_similar(query_embedding, sentence_embeddings, sentences, top_k=3)
+        top_results = find_top_k_similar(query_embedding, store, sentences, top_k=3)
 
         print("\nTop 3 most similar sentences:")
         for i, (text, score) in enumerate(top_results, start=1):
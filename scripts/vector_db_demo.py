@@ -1,34 +1,21 @@
 import os
 
 from app.embeddings import EmbeddingGenerator
-from app.qdrant_utils import initialize_collection
-
-def load_sentences(path: str):
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"File not found: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        lines = [line.strip() for line in f.readlines()]
-    return [ln for ln in lines if ln]
+from app.ingestion import ingest_file
+from app.vector_store import initialize_vector_store
 
 def main():
     print("Starting Qdrant Vector DB Demo")
 
     embedder = EmbeddingGenerator()
-    store = initialize_collection()
+    store = initialize_vector_store(dimension=embedder.dimension)
 
     base_dir = os.path.dirname(os.path.dirname(__file__))
     sentences_file = os.path.join(base_dir, "sample_sentences.txt")
 
-    sentences = load_sentences(sentences_file)
-    print(f"Loaded {len(sentences)} sentences from file")
-
-    print("Generating embeddings (this may take a minute)..")
-    embeddings = embedder.generate_embeddings(sentences)
-    print(f"Generated {len(embeddings)} embeddings")
-
-    print("Inserting embeddings into Qdrant collection..")
-    store.insert_embeddings(texts=sentences, embeddings=embeddings)
-    print("Embeddings inserted successfully!")
+    print("Streaming sentences into Qdrant collection (this may take a minute)..")
+    report = ingest_file(sentences_file, embedder, store)
+    print(f"Inserted {report['ingested']} embeddings successfully!")
 
     print("\nEnter a query to find similar sentences (type 'exit' to quit)")
     while True:
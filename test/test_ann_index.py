@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.ann_index import IVFIndex, assign_clusters, kmeans
+from app.local_store import LocalStoreConfig, LocalVectorStore
+from app.similarity import CorpusMatrix
+
+def clustered(n_clusters=20, per_cluster=50, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)) * 5
+    points = centers[:, None, :] + rng.normal(size=(n_clusters, per_cluster, dim))
+    return points.reshape(-1, dim).astype(np.float32)
+
+def build(corpus, metric="cosine", **kwargs):
+    index = IVFIndex(dimension=corpus.shape[1], metric=metric, initial_capacity=8, **kwargs)
+    index.add(list(range(len(corpus))), corpus, [{"text": f"t{i}"} for i in range(len(corpus))])
+    return index
+
+def recall(index, corpus, queries, k, metric, nprobe=None):
+    expected, _ = CorpusMatrix(corpus).top_k(queries, k=k, metric=metric)
+    found = [[pid for pid, _, _ in hits] for hits in index.search(queries, k, nprobe=nprobe)]
+    return np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected.tolist())])
+
+def inertia(corpus, centroids):
+    assign = assign_clusters(corpus, centroids, spherical=False)
+    return float(((corpus - centroids[assign]) ** 2).sum())
+
+def test_kmeans_improves_on_its_random_initialization():
+    corpus = clustered(n_clusters=5, per_cluster=40)
+    initial = kmeans(corpus, 5, n_iter=0, seed=1)
+    trained = kmeans(corpus, 5, seed=1)
+    assert inertia(corpus, trained) < 0.5 * inertia(corpus, initial)
+    # Converged: every centroid is the mean of the rows assigned to it.
+    assign = assign_clusters(corpus, trained, spherical=False)
+    for c in set(assign):
+        np.testing.assert_allclose(trained[c], corpus[assign == c].mean(axis=0), atol=1e-4)
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_probing_every_list_is_exact(metric):
+    corpus = clustered()
+    index = build(corpus, metric, n_lists=10, train_size=len(corpus))
+    assert index.is_trained
+    assert recall(index, corpus, corpus[:10] + 0.01, 5, metric, nprobe=10) == 1.0
+
+def test_small_nprobe_keeps_high_recall_on_clustered_data():
+    corpus = clustered()
+    index = build(corpus, n_lists=20, nprobe=2, train_size=len(corpus))
+    queries = corpus[::37] + 0.05
+    assert recall(index, corpus, queries, 10, "cosine") >= 0.9
+
+def test_untrained_index_falls_back_to_exact_search():
+    corpus = clustered()
+    index = build(corpus, train_size=len(corpus) + 1)
+    assert not index.is_trained
+    assert recall(index, corpus, corpus[:5], 5, "cosine") == 1.0
+
+def test_writes_after_training_are_searchable():
+    corpus = clustered()
+    index = build(corpus[:500], n_lists=8, nprobe=8, train_size=500)
+    index.add(list(range(500, len(corpus))), corpus[500:])
+    assert index.delete([0, 1, 999]) == 3
+    index.add([2], corpus[900:901], [{"text": "moved"}])
+
+    hits = index.search(corpus[900], k=2)[0]
+    assert {pid for pid, _, _ in hits} == {2, 900}
+    assert 0 not in {pid for pid, _, _ in index.search(corpus[0], k=5)[0]}
+
+def test_save_and_load_round_trip(tmp_path):
+    corpus = clustered()
+    index = build(corpus, n_lists=10, nprobe=3, train_size=len(corpus))
+    path = str(tmp_path / "ivf.idx")
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert loaded.nprobe == 3 and loaded.n_lists == 10 and len(loaded) == len(corpus)
+    queries = corpus[:20] + 0.01
+    assert loaded.search(queries, k=5) == index.search(queries, k=5)
+
+def test_local_store_uses_ivf_when_configured():
+    cfg = LocalStoreConfig()
+    cfg.collection_name = "ann"
+    cfg.vector_size = 16
+    cfg.search_threads = 1
+    cfg.index_type = "ivf"
+    cfg.ivf_lists = 10
+    cfg.ivf_train_size = 100
+    store = LocalVectorStore(cfg)
+    store.create_collection()
+    assert isinstance(store.collections["ann"], IVFIndex)
+
+    corpus = clustered()
+    store.insert_embeddings([f"t{i}" for i in range(len(corpus))], corpus)
+    assert store.collections["ann"].is_trained
+    assert store.search_similar_texts(corpus[42], top_k=1)[0]["text"] == "t42"
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import types
+
+import httpx
+import numpy as np
+import pytest
+
+import main
+from app.batch_embedder import ParallelBatchEmbedder
+from dto.encoding import decode_vector, unpack_vectors
+from dto.pydantic_utils import MAX_BATCH_ITEMS, MAX_TOP_K, SearchBatchResponse
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+        self.cache = None
+        self.failing = set()
+        # Only plan_batches is used; it decides how batch endpoints split their items.
+        self.batch_embedder = ParallelBatchEmbedder(lambda texts: [])
+
+    async def agenerate_embeddings(self, texts):
+        self.calls.append(list(texts))
+        if self.failing.intersection(texts):
+            raise RuntimeError("503 upstream unavailable")
+        return [[float(len(t)), 1.0] for t in texts]
+
+    async def agenerate_embedding(self, text):
+        return (await self.agenerate_embeddings([text]))[0]
+
+class FakeStore:
+    def __init__(self):
+        self.batch_calls = []
+        self.options = None
+
+    async def asearch_similar_texts_batch(self, query_vectors, top_k=3, collection_name=None, query_filter=None,
+                                          with_payload=False):
+        self.batch_calls.append((query_vectors, top_k))
+        self.options = {"query_filter": query_filter, "with_payload": with_payload}
+        return [[{"id": i, "text": f"hit-{i}", "score": v[0]} for i in range(top_k)] for v in query_vectors]
+
+@pytest.fixture
+def client(monkeypatch):
+    generator = FakeGenerator()
+    store = FakeStore()
+    monkeypatch.setattr(main, "embedding_generator", generator)
+    monkeypatch.setattr(main, "vector_store", store)
+    monkeypatch.setattr(main, "embedding_batcher", None)
+
+    def post(path, json, headers=None):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                return await c.post(path, json=json, headers=headers)
+        return asyncio.run(run())
+
+    return types.SimpleNamespace(post=post, generator=generator, store=store)
+
+def test_embeddings_batch_reports_per_item_errors(client):
+    resp = client.post("/embeddings", json={"texts": ["abc", "   ", "de"]})
+    assert resp.status_code == 200
+    body = resp.json()
+
+    assert client.generator.calls == [["abc", "de"]]
+    assert body["succeeded"] == 2
+    assert body["failed"] == 1
+    assert [item["index"] for item in body["items"]] == [0, 1, 2]
+    assert body["items"][0]["embedding"] == [3.0, 1.0]
+    assert body["items"][1]["embedding"] is None
+    assert body["items"][1]["error"] == "Text cannot be empty"
+    assert body["items"][2]["dimension"] == 2
+
+def test_embeddings_batch_reports_upstream_failures_per_sub_batch(client):
+    client.generator.batch_embedder.config.batch_size = 2
+    client.generator.failing.add("ccc")
+    resp = client.post("/embeddings", json={"texts": ["a", "bb", "ccc", "dddd", ""]})
+    assert resp.status_code == 200
+    body = resp.json()
+
+    assert client.generator.calls == [["a", "bb"], ["ccc", "dddd"]]
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    assert [item["error"] is None for item in body["items"]] == [True, True, False, False, False]
+    assert body["items"][3]["error"] == "Error generating embedding: 503 upstream unavailable"
+    assert body["items"][4]["error"] == "Text cannot be empty"
+
+def test_search_batch_reports_upstream_failures_per_sub_batch(client):
+    client.generator.batch_embedder.config.batch_size = 1
+    client.generator.failing.add("b")
+    resp = client.post("/search/batch", json={"queries": ["a", "b", "c"], "top_k": 1})
+    assert resp.status_code == 200
+    body = resp.json()
+
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert body["items"][0]["results"][0]["score"] == 1.0
+    assert body["items"][1]["results"] == []
+    assert body["items"][1]["error"] == "Error performing search: 503 upstream unavailable"
+    assert body["items"][2]["error"] is None
+
+def test_embeddings_batch_size_limit(client):
+    resp = client.post("/embeddings", json={"texts": ["x"] * (MAX_BATCH_ITEMS + 1)})
+    assert resp.status_code == 422
+
+    resp = client.post("/embeddings", json={"texts": []})
+    assert resp.status_code == 422
+
+def test_search_batch_uses_one_store_round_trip(client):
+    resp = client.post("/search/batch", json={"queries": ["a", "", "ccc"], "top_k": 2})
+    assert resp.status_code == 200
+    body = resp.json()
+
+    assert len(client.store.batch_calls) == 1
+    assert client.store.batch_calls[0][1] == 2
+    assert body["items"][0]["results"][0]["score"] == 1.0
+    assert body["items"][1]["error"] == "Text cannot be empty"
+    assert body["items"][2]["results"][0]["score"] == 3.0
+    assert body["failed"] == 1
+
+def test_search_top_k_is_bounded(client):
+    for path, body in (("/search", {"text": "a"}), ("/search/batch", {"queries": ["a"]})):
+        assert client.post(path, json={**body, "top_k": MAX_TOP_K + 1}).status_code == 422
+        assert client.post(path, json={**body, "top_k": 0}).status_code == 422
+    assert client.store.batch_calls == []
+
+def test_search_batch_response_matches_its_model(client):
+    resp = client.post("/search/batch", json={"queries": ["a"], "top_k": 1})
+    assert resp.status_code == 200
+    assert SearchBatchResponse.model_validate(resp.json()).mode == "dense"
+    assert set(resp.json()) == set(SearchBatchResponse.model_fields)
+
+def test_search_batch_all_invalid_skips_backends(client):
+    resp = client.post("/search/batch", json={"queries": [" ", ""]})
+    assert resp.status_code == 200
+    assert resp.json()["succeeded"] == 0
+    assert client.generator.calls == []
+    assert client.store.batch_calls == []
+
+def test_embedding_default_json_response(client):
+    resp = client.post("/embedding", json={"text": "abcd"})
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {"text": "abcd", "embedding": [4.0, 1.0], "dimension": 2}
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_embedding_binary_response(client, dtype):
+    accept = "application/octet-stream" + ("; dtype=float16" if dtype == "float16" else "")
+    resp = client.post("/embedding", json={"text": "abcd"}, headers={"Accept": accept})
+    assert resp.headers["content-type"] == "application/octet-stream"
+    vectors = unpack_vectors(resp.content)
+    assert vectors.dtype == np.dtype(dtype) and vectors.tolist() == [[4.0, 1.0]]
+    assert len(resp.content) == 16 + 2 * vectors.itemsize
+
+def test_embedding_base64_response(client):
+    resp = client.post("/embedding", json={"text": "abc"},
+                       headers={"Accept": "application/json; encoding=base64; dtype=float16"})
+    body = resp.json()
+    assert body["encoding"] == "base64" and body["dtype"] == "float16"
+    assert decode_vector(body["embedding"], "float16").tolist() == [3.0, 1.0]
+
+def test_unsupported_accept_is_rejected(client):
+    resp = client.post("/embedding", json={"text": "abc"}, headers={"Accept": "text/csv"})
+    assert resp.status_code == 406
+    # Preferences are honoured in q order and unsupported entries are skipped.
+    resp = client.post("/embedding", json={"text": "abc"},
+                       headers={"Accept": "text/csv, application/json;q=0.5, application/octet-stream;q=0.9"})
+    assert resp.headers["content-type"] == "application/octet-stream"
+
+def test_embeddings_batch_binary_marks_failed_rows(client):
+    resp = client.post("/embeddings", json={"texts": ["abc", "   ", "de"]},
+                       headers={"Accept": "application/octet-stream"})
+    assert unpack_vectors(resp.content).tolist() == [[3.0, 1.0], [0.0, 0.0], [2.0, 1.0]]
+    assert json.loads(resp.headers["X-Embedding-Errors"]) == {"1": "Text cannot be empty"}
+
+def test_search_batch_passes_filter_and_rejects_invalid_ones(client):
+    query_filter = {"tenant": "acme", "year": {"gte": 2020}}
+    resp = client.post("/search/batch", json={"queries": ["a"], "filter": query_filter, "with_payload": ["year"]})
+    assert resp.status_code == 200
+    assert client.store.options == {"query_filter": query_filter, "with_payload": ["year"]}
+
+    resp = client.post("/search/batch", json={"queries": ["a"], "filter": {"year": {"around": 2020}}})
+    assert resp.status_code == 400
+    assert len(client.store.batch_calls) == 1
@@ -0,0 +1,94 @@
+import asyncio
+import time
+import types
+
+import httpx
+import pytest
+
+import app.vertex_backend as vertex_backend
+import main
+from app.batching import EmbeddingBatcher, EmbeddingBatcherConfig
+from app.concurrency import ConcurrencyLimiter
+from app.embeddings import EmbeddingGenerator
+from app.qdrant_utils import QdrantVectorStore
+
+EMBED_LATENCY = 0.2
+QUERY_LATENCY = 0.1
+
+class SlowModel:
+    def get_embeddings(self, texts):
+        time.sleep(EMBED_LATENCY)
+        return [types.SimpleNamespace(values=[0.1, 0.2, 0.3]) for _ in texts]
+
+class SlowAsyncQdrantClient:
+    async def query_points(self, collection_name, query, limit, with_payload, with_vectors, search_params=None,
+                           query_filter=None):
+        await asyncio.sleep(QUERY_LATENCY)
+        points = [types.SimpleNamespace(id=i, payload={"text": f"text-{i}"}, score=1.0) for i in range(limit)]
+        return types.SimpleNamespace(points=points)
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("GOOGLE_PROJECT_ID", "test-project")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "vertex")
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    monkeypatch.setattr(vertex_backend.vertexai, "init", lambda **kwargs: None)
+    monkeypatch.setattr(vertex_backend.TextEmbeddingModel, "from_pretrained", lambda name: SlowModel())
+
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = types.SimpleNamespace(collection_name="test_col", quantization="none")
+    store.async_client = SlowAsyncQdrantClient()
+
+    generator = EmbeddingGenerator()
+    monkeypatch.setattr(main, "embedding_generator", generator)
+    monkeypatch.setattr(main, "vector_store", store)
+    monkeypatch.setattr(main, "request_limiter", ConcurrencyLimiter(max_in_flight=64, max_waiting=64))
+    yield main.app
+    generator.close()
+
+async def fire(app, path, payloads):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path, json=p) for p in payloads))
+        return responses, time.perf_counter() - start
+
+def test_concurrent_embedding_requests_overlap(api):
+    n = 8
+    responses, elapsed = asyncio.run(fire(api, "/embedding", [{"text": f"t{i}"} for i in range(n)]))
+    assert all(r.status_code == 200 for r in responses)
+    # Serialized handlers would need n * EMBED_LATENCY.
+    assert elapsed < n * EMBED_LATENCY / 2
+
+def test_concurrent_search_requests_overlap(api):
+    n = 8
+    responses, elapsed = asyncio.run(fire(api, "/search", [{"text": f"q{i}", "top_k": 2} for i in range(n)]))
+    assert all(r.status_code == 200 for r in responses)
+    assert len(responses[0].json()["results"]) == 2
+    assert elapsed < n * (EMBED_LATENCY + QUERY_LATENCY) / 2
+
+def test_overload_is_rejected_with_503(api, monkeypatch):
+    monkeypatch.setattr(main, "request_limiter", ConcurrencyLimiter(max_in_flight=1, max_waiting=1))
+    responses, _ = asyncio.run(fire(api, "/embedding", [{"text": f"t{i}"} for i in range(4)]))
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [200, 200, 503, 503]
+    assert main.request_limiter.stats()["rejected"] == 2
+    assert main.request_limiter.stats()["in_flight"] == 0
+
+def test_batcher_coalesces_concurrent_requests(api, monkeypatch):
+    calls = []
+
+    class CountingModel(SlowModel):
+        def get_embeddings(self, texts):
+            calls.append(len(texts))
+            return super().get_embeddings(texts)
+
+    generator = main.embedding_generator
+    generator.backend._model = CountingModel()
+    cfg = EmbeddingBatcherConfig()
+    cfg.window_ms = 50
+    monkeypatch.setattr(main, "embedding_batcher", EmbeddingBatcher(generator, cfg))
+
+    responses, _ = asyncio.run(fire(api, "/embedding", [{"text": f"t{i}"} for i in range(16)]))
+    assert all(r.status_code == 200 for r in responses)
+    assert calls == [16]
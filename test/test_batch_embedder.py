@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+import pytest
+
+from app.batch_embedder import BatchEmbedderConfig, ParallelBatchEmbedder, TokenBucket
+
+class ApiError(Exception):
+    def __init__(self, code, message="error"):
+        super().__init__(message)
+        self.code = code
+
+def make_config(batch_size=10, max_in_flight=4, max_retries=3, max_tokens=20000):
+    cfg = BatchEmbedderConfig()
+    cfg.batch_size = batch_size
+    cfg.max_in_flight = max_in_flight
+    cfg.requests_per_minute = 600000
+    cfg.max_tokens_per_request = max_tokens
+    cfg.max_retries = max_retries
+    cfg.backoff_base = 0.01
+    return cfg
+
+def echo(batch):
+    return [[float(t)] for t in batch]
+
+def test_parallel_results_keep_input_order():
+    def jittery(batch):
+        time.sleep(random.uniform(0, 0.01))
+        return echo(batch)
+
+    embedder = ParallelBatchEmbedder(jittery, make_config(batch_size=7, max_in_flight=8))
+    texts = [str(i) for i in range(200)]
+    assert embedder.embed(texts) == [[float(i)] for i in range(200)]
+
+def test_in_flight_batches_are_bounded():
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def tracking(batch):
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.01)
+        with lock:
+            state["current"] -= 1
+        return echo(batch)
+
+    ParallelBatchEmbedder(tracking, make_config(batch_size=1, max_in_flight=3)).embed([str(i) for i in range(20)])
+    assert state["peak"] == 3
+
+def test_calls_share_one_pool_of_workers():
+    threads = set()
+
+    def recording(batch):
+        threads.add(threading.current_thread())
+        return echo(batch)
+
+    embedder = ParallelBatchEmbedder(recording, make_config(batch_size=1, max_in_flight=2))
+    for _ in range(5):
+        embedder.embed([str(i) for i in range(6)])
+    assert len(threads) <= 2
+
+    embedder.close()
+    for thread in threads:
+        thread.join(timeout=1)
+    assert not any(thread.is_alive() for thread in threads)
+
+def test_retries_transient_errors_with_backoff():
+    failures = {"left": 2}
+    sleeps = []
+
+    def flaky(batch):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise ApiError(429)
+        return echo(batch)
+
+    embedder = ParallelBatchEmbedder(flaky, make_config(), sleep=sleeps.append)
+    assert embedder.embed(["1", "2"]) == [[1.0], [2.0]]
+    assert embedder.stats()["retries"] == 2
+    assert len(sleeps) == 2
+
+def test_non_retryable_errors_are_raised():
+    def broken(batch):
+        raise ApiError(403)
+
+    embedder = ParallelBatchEmbedder(broken, make_config(), sleep=lambda s: None)
+    with pytest.raises(ApiError):
+        embedder.embed(["1"])
+    assert embedder.stats()["retries"] == 0
+
+def test_retries_give_up_after_max_retries():
+    def down(batch):
+        raise ApiError(503)
+
+    embedder = ParallelBatchEmbedder(down, make_config(max_retries=2), sleep=lambda s: None)
+    with pytest.raises(ApiError):
+        embedder.embed(["1"])
+    assert embedder.stats()["requests"] == 3
+
+def test_token_limit_error_splits_batch():
+    def limited(batch):
+        if len(batch) > 2:
+            raise ApiError(400, "Request exceeds the token limit")
+        return echo(batch)
+
+    embedder = ParallelBatchEmbedder(limited, make_config(batch_size=8))
+    assert embedder.embed([str(i) for i in range(8)]) == [[float(i)] for i in range(8)]
+    assert embedder.stats()["splits"] == 3
+
+def test_planner_respects_token_budget():
+    embedder = ParallelBatchEmbedder(echo, make_config(batch_size=100, max_tokens=30))
+    texts = ["x" * 40] * 6
+    assert embedder.plan_batches(texts) == [(0, 2), (2, 4), (4, 6)]
+
+def test_progress_callback_reaches_total():
+    seen = []
+    embedder = ParallelBatchEmbedder(echo, make_config(batch_size=3))
+    embedder.embed([str(i) for i in range(10)], progress=lambda done, total: seen.append((done, total)))
+    assert seen[-1] == (10, 10)
+    assert [d for d, _ in seen] == sorted(d for d, _ in seen)
+
+def test_token_bucket_waits_when_empty():
+    sleeps = []
+    bucket = TokenBucket(rate=1000.0, capacity=1.0, sleep=lambda s: (sleeps.append(s), time.sleep(s)))
+    bucket.acquire()
+    bucket.acquire()
+    assert sleeps and sleeps[0] > 0
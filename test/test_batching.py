@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.batching import EmbeddingBatcher, EmbeddingBatcherConfig
+from app.concurrency import OverloadedError
+
+class FakeGenerator:
+    def __init__(self, latency=0.0, fail=False):
+        self.calls = []
+        self.latency = latency
+        self.fail = fail
+
+    async def agenerate_embeddings(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return [[float(len(t))] for t in texts]
+
+def make_batcher(generator, window_ms=5.0, max_batch_size=250, max_queue_depth=1000):
+    cfg = EmbeddingBatcherConfig()
+    cfg.window_ms = window_ms
+    cfg.max_batch_size = max_batch_size
+    cfg.max_queue_depth = max_queue_depth
+    return EmbeddingBatcher(generator, cfg)
+
+async def embed_all(batcher, texts):
+    return await asyncio.gather(*(batcher.embed(t) for t in texts))
+
+def test_concurrent_requests_share_one_upstream_call():
+    generator = FakeGenerator()
+    batcher = make_batcher(generator)
+    texts = ["a" * (i + 1) for i in range(20)]
+
+    results = asyncio.run(embed_all(batcher, texts))
+
+    assert len(generator.calls) == 1
+    assert results == [[float(len(t))] for t in texts]
+    stats = batcher.stats()
+    assert stats["upstream_batches"] == 1
+    assert stats["avg_batch_size"] == 20
+    assert stats["batch_fill_ratio"] == pytest.approx(20 / 250)
+
+def test_full_batches_are_sent_without_waiting_for_window():
+    generator = FakeGenerator()
+    batcher = make_batcher(generator, window_ms=10_000, max_batch_size=4)
+
+    results = asyncio.run(asyncio.wait_for(embed_all(batcher, ["x"] * 8), timeout=2))
+
+    assert [len(c) for c in generator.calls] == [4, 4]
+    assert len(results) == 8
+
+def test_partial_batch_flushes_after_window():
+    generator = FakeGenerator()
+    batcher = make_batcher(generator, window_ms=1, max_batch_size=4)
+
+    asyncio.run(embed_all(batcher, ["x"] * 6))
+
+    assert sorted(len(c) for c in generator.calls) == [2, 4]
+    assert batcher.stats()["max_queue_delay_ms"] >= 0
+
+def test_queue_depth_limit_rejects():
+    generator = FakeGenerator()
+    batcher = make_batcher(generator, max_queue_depth=3)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(t) for t in "abcde"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, OverloadedError) for r in results) == 2
+    assert batcher.stats()["rejected"] == 2
+
+def test_upstream_error_reaches_every_waiter():
+    batcher = make_batcher(FakeGenerator(fail=True))
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(t) for t in "abc"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.stats()["in_flight"] == 0
@@ -0,0 +1,57 @@
+import json
+import os
+
+from benchmarks.bench_suite import compare, latency_stats, main
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = {
+        "search": {"qps": 1000.0, "p50_ms": 2.0, "errors": 0},
+        "insert": {"points_per_s": 500.0},
+        "removed": {"qps": 1.0},
+    }
+    results = {
+        "search": {"qps": 850.0, "p50_ms": 2.6, "errors": 0},
+        "insert": {"points_per_s": 900.0},
+        "added": {"qps": 1.0},
+    }
+    rows = {(row["name"], row["metric"]): row for row in compare(results, baseline, tolerance=0.2)}
+
+    assert set(rows) == {("search", "qps"), ("search", "p50_ms"), ("search", "errors"), ("insert", "points_per_s")}
+    assert not rows[("search", "qps")]["regressed"]  # 15% slower is inside the tolerance
+    assert rows[("search", "p50_ms")]["regressed"]  # latency up 30%
+    assert not rows[("search", "errors")]["regressed"]
+    assert not rows[("insert", "points_per_s")]["regressed"]  # faster is never a regression
+
+    rows = compare({"search": {"errors": 3}}, {"search": {"errors": 0}}, tolerance=0.2)
+    assert rows[0]["regressed"]
+
+def test_latency_stats_percentiles():
+    stats = latency_stats([i / 1000 for i in range(1, 101)])
+    assert stats["p50_ms"] == 51
+    assert stats["p99_ms"] == 100
+
+def test_quick_run_writes_json_and_fails_against_a_faster_baseline(tmp_path, capsys, monkeypatch):
+    monkeypatch.delenv("QDRANT_VECTOR_SIZE", raising=False)
+    monkeypatch.delenv("EMBEDDING_CACHE_ENABLED", raising=False)
+    output = tmp_path / "results.json"
+    assert main(["--quick", "--scenarios", "similarity", "api", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    names = set(report["results"])
+    assert "similarity/n=1000" in names
+    assert "api/search/local/c=16" in names
+    assert report["results"]["api/search/local/c=16"]["errors"] == 0
+    assert report["meta"]["args"]["quick"] is True
+
+    # A baseline ten times faster than anything this run can reach.
+    faster = {name: {metric: value * 10 if not metric.endswith("_ms") else value / 10
+                     for metric, value in metrics.items() if metric != "errors"}
+              for name, metrics in report["results"].items()}
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": faster}))
+    args = ["--quick", "--scenarios", "similarity", "--baseline", str(baseline)]
+    assert main(args) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert main(args + ["--no-fail"]) == 0
+    # Settings the run filled in are gone again afterwards.
+    assert "QDRANT_VECTOR_SIZE" not in os.environ
+    assert "EMBEDDING_CACHE_ENABLED" not in os.environ
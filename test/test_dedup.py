@@ -0,0 +1,142 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.dedup import DedupConfig, Deduplicator, MinHasher, lsh_bands
+from app.ingestion import IngestionConfig, ingest_file
+from app.sparse_index import BM25Index
+from app.vector_store import point_id
+
+def make_config(minhash_threshold=0.8, cosine_threshold=0.0, report_path=None):
+    cfg = DedupConfig()
+    cfg.minhash_threshold = minhash_threshold
+    cfg.num_perm = 128
+    cfg.shingle_size = 5
+    cfg.cosine_threshold = cosine_threshold
+    cfg.report_path = report_path
+    return cfg
+
+def test_minhash_estimates_jaccard_and_bands_match_threshold():
+    hasher = MinHasher(num_perm=256)
+    a = hasher.signature("the quick brown fox jumps over the lazy dog")
+    assert np.mean(a == hasher.signature("The quick brown fox jumps over the lazy dog!")) > 0.8
+    assert np.mean(a == hasher.signature("an entirely different sentence about finance")) < 0.2
+    bands, rows = lsh_bands(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+def test_exact_and_near_duplicates_point_to_canonical():
+    dedup = Deduplicator(make_config())
+    kept = dedup.filter([
+        "The weather is lovely today.",
+        "the weather is  lovely today.",
+        "The weather is lovely today!",
+        "Stocks fell sharply on Monday.",
+    ])
+    assert kept == ["The weather is lovely today.", "Stocks fell sharply on Monday."]
+    # State carries over to later batches.
+    assert dedup.filter(["The weather is lovely today.", "A new sentence."]) == ["A new sentence."]
+
+    canonical = point_id("The weather is lovely today.")
+    assert dedup.canonical(point_id("The weather is lovely today!")) == canonical
+    assert dedup.duplicates[point_id("the weather is lovely today.")] == (canonical, "exact")
+    stats = dedup.stats()
+    assert stats["kept"] == 3
+    assert stats["dropped"] == {"exact": 2, "near": 1, "cosine": 0}
+    assert stats["cluster_sizes"] == {4: 1}
+    assert stats["largest_clusters"] == [{"canonical_id": canonical, "size": 4}]
+
+def test_near_pass_can_be_disabled():
+    dedup = Deduplicator(make_config(minhash_threshold=0))
+    assert dedup.filter(["Hello world.", "Hello world!", "hello world."]) == ["Hello world.", "Hello world!"]
+
+def test_cosine_pass_drops_close_embeddings_across_batches(tmp_path):
+    dedup = Deduplicator(make_config(minhash_threshold=0, cosine_threshold=0.99, report_path=str(tmp_path / "dups.jsonl")))
+    texts, vectors = dedup.filter_embedded(["a", "b", "c"], [[1.0, 0.0], [0.0, 1.0], [1.0, 0.01]])
+    assert texts == ["a", "b"] and vectors == [[1.0, 0.0], [0.0, 1.0]]
+    texts, _ = dedup.filter_embedded(["d", "e"], [[0.01, 1.0], [-1.0, 0.0]])
+    assert texts == ["e"]
+    assert dedup.canonical(point_id("d")) == point_id("b")
+
+    dedup.save_report()
+    records = [json.loads(line) for line in open(tmp_path / "dups.jsonl", encoding="utf-8")]
+    assert [(r["text"], r["reason"]) for r in records] == [("c", "cosine"), ("d", "cosine")]
+    assert records[0]["canonical_id"] == point_id("a")
+
+class Generator:
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.embedded = []
+
+    def generate_embeddings(self, texts):
+        self.embedded.extend(texts)
+        return [[1.0, float(len(t))] for t in texts]
+
+class Store:
+    def __init__(self, fail_on_call=None):
+        self.texts = []
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def insert_embeddings(self, texts, embeddings, collection_name=None, ids=None, payloads=None):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("qdrant went away")
+        self.texts.extend(texts)
+        return True
+
+    def retrieve_payloads(self, ids, fields=None, collection_name=None):
+        return {}
+
+def ingest_config(batch_size=2, checkpoint_path=None, incremental=False):
+    config = IngestionConfig()
+    config.batch_size = batch_size
+    config.checkpoint_path = checkpoint_path
+    config.incremental = incremental
+    config.prune = False
+    return config
+
+def test_ingestion_skips_duplicates_before_embedding(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text("Red apples are sweet.\nGreen pears are crisp.\nred apples are sweet.\n"
+                    "Red apples are sweet!\nBlue skies ahead.\n", encoding="utf-8")
+    config = ingest_config()
+    generator, store, sparse = Generator(), Store(), BM25Index()
+    report = ingest_file(str(path), generator, store, config=config, sparse_index=sparse,
+                         deduplicator=Deduplicator(make_config()))
+
+    unique = ["Red apples are sweet.", "Green pears are crisp.", "Blue skies ahead."]
+    assert generator.embedded == unique
+    assert store.texts == unique
+    assert len(sparse) == 3
+    assert report["ingested"] == 5 and report["added"] == 3
+    assert report["dedup"]["dropped"]["exact"] == 1 and report["dedup"]["dropped"]["near"] == 1
+
+def test_counts_only_include_lines_that_survive_the_cosine_pass(tmp_path):
+    path = tmp_path / "corpus.txt"
+    # "ab" and "cd" embed to the same vector, so the cosine pass drops "cd" after embedding.
+    path.write_text("ab\ncd\nlonger line\n", encoding="utf-8")
+    store = Store()
+    report = ingest_file(str(path), Generator(), store, config=ingest_config(batch_size=10, incremental=True),
+                         deduplicator=Deduplicator(make_config(minhash_threshold=0, cosine_threshold=0.999)))
+    assert store.texts == ["ab", "longer line"]
+    assert (report["added"], report["unchanged"]) == (2, 0)
+
+def test_resumed_run_still_drops_duplicates_of_lines_ingested_before_the_crash(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text("Red apples are sweet.\nGreen pears are crisp.\nBlue skies ahead.\nred apples are sweet.\n",
+                    encoding="utf-8")
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    with pytest.raises(RuntimeError):
+        ingest_file(str(path), Generator(), Store(fail_on_call=2), config=ingest_config(checkpoint_path=checkpoint),
+                    deduplicator=Deduplicator(make_config()))
+
+    generator, store = Generator(), Store()
+    report = ingest_file(str(path), generator, store, config=ingest_config(checkpoint_path=checkpoint),
+                         deduplicator=Deduplicator(make_config()))
+    assert report["resumed_from"] == 2
+    assert store.texts == ["Blue skies ahead."]
+    assert generator.embedded == ["Blue skies ahead."]
+    assert report["dedup"]["dropped"]["exact"] == 1
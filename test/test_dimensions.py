@@ -0,0 +1,114 @@
+import types
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+import app.vector_store as vector_store
+import app.vertex_backend as vertex_backend
+from app.embedding_cache import EmbeddingCache, EmbeddingCacheConfig
+from app.embeddings import EmbeddingGenerator
+from app.qdrant_utils import QdrantConfig, QdrantVectorStore
+from app.similarity import truncate_embeddings
+from app.vector_store import initialize_vector_store, prepare_collection
+
+class FakeModel:
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.calls = []
+
+    def get_embeddings(self, texts, output_dimensionality=None):
+        self.calls.append(output_dimensionality)
+        size = output_dimensionality or self.dimension
+        return [types.SimpleNamespace(values=[float(len(t) + i) for i in range(size)]) for t in texts]
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setenv("GOOGLE_PROJECT_ID", "test-project")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "vertex")
+    monkeypatch.setattr(vertex_backend.vertexai, "init", lambda **kwargs: None)
+    monkeypatch.setattr(vertex_backend.TextEmbeddingModel, "from_pretrained", lambda name: model)
+    return model
+
+def make_cache():
+    cfg = EmbeddingCacheConfig()
+    cfg.path = None
+    return EmbeddingCache(cfg)
+
+def test_truncate_embeddings_renormalizes_prefix():
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]])
+    reduced = truncate_embeddings(vectors, 2)
+    np.testing.assert_allclose(reduced, [[0.6, 0.8], [0.0, 0.0]])
+    np.testing.assert_allclose(truncate_embeddings(vectors, 2, normalize=False), [[3.0, 4.0], [0.0, 0.0]])
+    with pytest.raises(ValueError):
+        truncate_embeddings(vectors, 4)
+
+def test_output_dimensionality_is_requested_from_model(fake_model):
+    cache = make_cache()
+    full = EmbeddingGenerator(cache=cache)
+    reduced = EmbeddingGenerator(cache=cache, output_dimensionality=4)
+    assert full.dimension == 768 and reduced.dimension == 4
+
+    assert len(full.generate_embedding("abc")) == 8
+    assert len(reduced.generate_embedding("abc")) == 4
+    # Different sizes use different cache entries, so the reduced call still went upstream.
+    assert fake_model.calls == [None, 4]
+    reduced.generate_embedding("abc")
+    assert fake_model.calls == [None, 4]
+
+def test_empty_output_dimensionality_means_full_size(fake_model, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_OUTPUT_DIMENSIONALITY", "")
+    generator = EmbeddingGenerator()
+    assert generator.output_dimensionality is None
+    assert len(generator.generate_embedding("abc")) == 8
+    generator.close()
+
+def test_truncate_mode_reuses_full_size_vectors(fake_model):
+    cache = make_cache()
+    full = EmbeddingGenerator(cache=cache)
+    truncated = EmbeddingGenerator(cache=cache, output_dimensionality=3, truncate=True)
+
+    vector = full.generate_embedding("abcd")
+    reduced = truncated.generate_embeddings(["abcd"])[0]
+    assert fake_model.calls == [None]
+    np.testing.assert_allclose(reduced, truncate_embeddings(vector, 3)[0], rtol=1e-6)
+    assert np.linalg.norm(reduced) == pytest.approx(1.0)
+
+def memory_qdrant_store(monkeypatch):
+    monkeypatch.setenv("QDRANT_COLLECTION_NAME", "dims")
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "768")
+    monkeypatch.setenv("QDRANT_DISTANCE_METRIC", "COSINE")
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = QdrantConfig()
+    store.client = QdrantClient(":memory:")
+    return store
+
+def test_new_collection_takes_the_embedding_dimensionality(monkeypatch):
+    # QDRANT_VECTOR_SIZE says 768, the embeddings are 256-d and no collection exists yet.
+    store = memory_qdrant_store(monkeypatch)
+    prepare_collection(store, dimension=256)
+    assert store.get_vector_size() == 256
+    assert initialize_vector_store("local", dimension=256).get_vector_size() == 256
+
+def test_startup_rejects_mismatched_collection_size(monkeypatch):
+    store = memory_qdrant_store(monkeypatch)
+    prepare_collection(store)
+    with pytest.raises(ValueError, match="does not match"):
+        prepare_collection(store, dimension=256)
+    # The existing collection is left as it was.
+    assert store.get_vector_size() == 768
+
+def test_failed_initialization_closes_the_store(monkeypatch):
+    store = memory_qdrant_store(monkeypatch)
+    prepare_collection(store)
+    closed = []
+
+    async def aclose():
+        closed.append(True)
+
+    store.aclose = aclose
+    monkeypatch.setattr(vector_store, "create_vector_store", lambda backend=None: store)
+    with pytest.raises(ValueError, match="does not match"):
+        initialize_vector_store(dimension=256)
+    assert closed == [True]
@@ -0,0 +1,101 @@
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app.vertex_backend as vertex_backend
+from app.embedding_cache import EmbeddingCache, EmbeddingCacheConfig, cache_key
+from app.embeddings import EmbeddingGenerator
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def get_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return [types.SimpleNamespace(values=[float(len(t)), float(ord(t[0])), 1.0]) for t in texts]
+
+def make_cache(max_entries=100, max_bytes=1 << 20, path=None):
+    cfg = EmbeddingCacheConfig()
+    cfg.max_entries = max_entries
+    cfg.max_bytes = max_bytes
+    cfg.path = path
+    return EmbeddingCache(cfg)
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setenv("GOOGLE_PROJECT_ID", "test-project")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "vertex")
+    monkeypatch.setattr(vertex_backend.vertexai, "init", lambda **kwargs: None)
+    monkeypatch.setattr(vertex_backend.TextEmbeddingModel, "from_pretrained", lambda name: model)
+    return model
+
+def test_cache_key_normalizes_whitespace_and_includes_model():
+    assert cache_key("m", "  hello   world ") == cache_key("m", "hello world")
+    assert cache_key("m", "hello") != cache_key("other", "hello")
+    assert cache_key("m", "Hello") != cache_key("m", "hello")
+
+def test_lru_evicts_least_recently_used():
+    cache = make_cache(max_entries=2)
+    cache.put_many(["a", "b"], [[1.0], [2.0]])
+    assert cache.get_many(["a"]) == [[1.0]]
+    cache.put_many(["c"], [[3.0]])
+
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+def test_byte_limit_evicts():
+    cache = make_cache(max_entries=100, max_bytes=3 * 4 * 2)
+    cache.put_many(["a", "b", "c"], [[1.0, 1.0, 1.0]] * 3)
+    assert cache.stats()["entries"] == 2
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = make_cache(path=path)
+    first.put_many(["k"], [[0.5, 0.25]])
+
+    second = make_cache(path=path)
+    assert second.get_many(["k", "missing"]) == [[0.5, 0.25], None]
+    assert second.stats()["disk_hits"] == 1
+    assert second.stats()["misses"] == 1
+
+def test_generator_only_sends_misses_in_input_order(fake_model):
+    generator = EmbeddingGenerator(cache=make_cache())
+    generator.generate_embeddings(["bb", "c"])
+    fake_model.calls.clear()
+
+    result = generator.generate_embeddings(["a", "bb", "dddd", "a", "c"])
+    assert fake_model.calls == [["a", "dddd"]]
+    assert [v[0] for v in result] == [1.0, 2.0, 4.0, 1.0, 1.0]
+    assert result[0] == result[3]
+
+def test_generate_embedding_hits_cache(fake_model):
+    generator = EmbeddingGenerator(cache=make_cache())
+    first = generator.generate_embedding("query")
+    second = generator.generate_embedding(" query ")
+    assert first == second
+    assert len(fake_model.calls) == 1
+
+def test_model_handle_is_built_once_across_threads(monkeypatch):
+    loads = []
+    model = FakeModel()
+
+    def from_pretrained(name):
+        loads.append(name)
+        return model
+
+    monkeypatch.setenv("GOOGLE_PROJECT_ID", "test-project")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "vertex")
+    monkeypatch.setattr(vertex_backend.vertexai, "init", lambda **kwargs: None)
+    monkeypatch.setattr(vertex_backend.TextEmbeddingModel, "from_pretrained", from_pretrained)
+
+    generator = EmbeddingGenerator(cache=make_cache())
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(generator.generate_embedding, [f"text {i}" for i in range(32)]))
+    generator.warm_up()
+
+    assert loads == ["text-embedding-005"]
@@ -0,0 +1,175 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.embedding_store import EmbeddingStore, EmbeddingStoreError
+from app.local_store import LocalStoreConfig, LocalVectorStore
+from app.similarity import CorpusMatrix
+from app.vector_store import point_id
+
+TEXTS = ["alpha", "béta ünïcode", "", "gamma 🚀", "delta"]
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(3)
+    return rng.normal(size=(len(TEXTS), 8)).astype(np.float32)
+
+def test_round_trip_through_memmap(tmp_path, vectors):
+    path = str(tmp_path / "corpus.emb")
+    store = EmbeddingStore.create(path, dimension=8, model="m")
+    # Plain lists, as returned by EmbeddingGenerator.generate_embeddings.
+    store.append(TEXTS, vectors.tolist())
+
+    reopened = EmbeddingStore.open(path)
+    assert len(reopened) == len(TEXTS)
+    assert isinstance(reopened.vectors, np.memmap)
+    np.testing.assert_array_equal(reopened.vectors, vectors)
+    assert reopened.texts() == TEXTS
+    assert reopened.text(3) == "gamma 🚀"
+    assert reopened.ids() == [point_id(t) for t in TEXTS]
+    assert reopened.header["model"] == "m"
+    assert reopened.verify()
+
+def test_append_only_growth_across_reopens(tmp_path, vectors):
+    path = str(tmp_path / "corpus.emb")
+    EmbeddingStore.create(path, dimension=8).append(TEXTS[:2], vectors[:2])
+    writer = EmbeddingStore.open(path, writable=True)
+    writer.append(TEXTS[2:], vectors[2:])
+
+    store = EmbeddingStore.open(path)
+    assert store.texts(1, 4) == TEXTS[1:4]
+    np.testing.assert_array_equal(store.vectors, vectors)
+    assert store.verify()
+    with pytest.raises(EmbeddingStoreError):
+        store.append(["x"], vectors[:1])
+
+def test_uncommitted_tail_is_ignored_and_truncated(tmp_path, vectors):
+    path = str(tmp_path / "corpus.emb")
+    EmbeddingStore.create(path, dimension=8).append(TEXTS, vectors)
+    # Simulate a crash after the blocks were written but before the header was replaced.
+    with open(os.path.join(path, "texts.bin"), "ab") as f:
+        f.write(b"half-written")
+
+    assert EmbeddingStore.open(path).texts() == TEXTS
+    EmbeddingStore.open(path, writable=True).append(["epsilon"], vectors[:1])
+    store = EmbeddingStore.open(path)
+    assert store.texts()[-1] == "epsilon"
+    assert store.verify()
+
+def test_checksum_detects_corruption(tmp_path, vectors):
+    path = str(tmp_path / "corpus.emb")
+    EmbeddingStore.create(path, dimension=8).append(TEXTS, vectors)
+    with open(os.path.join(path, "vectors.bin"), "r+b") as f:
+        f.seek(5)
+        f.write(b"\xff")
+
+    with pytest.raises(EmbeddingStoreError):
+        EmbeddingStore.open(path).verify()
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_search_matches_in_memory_corpus(tmp_path, metric):
+    rng = np.random.default_rng(4)
+    corpus = rng.normal(size=(200, 8)).astype(np.float32)
+    store = EmbeddingStore.create(str(tmp_path / "c.emb"), dimension=8)
+    store.append([f"t{i}" for i in range(200)], corpus)
+
+    queries = corpus[:3] + 0.01
+    expected, _ = CorpusMatrix(corpus).top_k(queries, k=4, metric=metric)
+    idx, _ = store.search(queries, k=4, metric=metric, block_size=64)
+    assert idx.tolist() == expected.tolist()
+
+def test_payloads_and_deletes_leave_only_live_rows(tmp_path, vectors):
+    path = str(tmp_path / "corpus.emb")
+    store = EmbeddingStore.create(path, dimension=8)
+    store.append(TEXTS, vectors, payloads=[{"n": i} for i in range(len(TEXTS))])
+    # "alpha" is written again with a new payload, "delta" is deleted, "gamma" deleted and re-added.
+    store.append(["alpha"], vectors[:1] * 2, payloads=[{"n": 10}])
+    store.delete([point_id("delta"), point_id("gamma 🚀")])
+    store.append(["gamma 🚀"], vectors[3:4], payloads=[{"n": 11}])
+
+    reopened = EmbeddingStore.open(path)
+    assert reopened.verify()
+    assert reopened.payloads(0, 2) == [{"n": 0}, {"n": 1}]
+    assert reopened.live_rows().tolist() == [1, 2, 5, 6]
+    ids, texts, batch, payloads = zip(*reopened.iter_batches(batch_size=3, with_payloads=True))
+    assert sum(texts, []) == ["béta ünïcode", "", "alpha", "gamma 🚀"]
+    assert sum(payloads, []) == [{"n": 1}, {"n": 2}, {"n": 10}, {"n": 11}]
+    np.testing.assert_array_equal(np.concatenate(batch)[2], vectors[0] * 2)
+
+    # Superseded and deleted rows never come back from a search.
+    idx, _ = reopened.search(vectors, k=4, metric="dot")
+    assert set(idx.ravel().tolist()) <= {1, 2, 5, 6}
+
+def test_search_computes_row_norms_once(tmp_path, vectors):
+    store = EmbeddingStore.create(str(tmp_path / "c.emb"), dimension=8)
+    store.append(TEXTS[:3], vectors[:3])
+    store.search(vectors[:1], k=1)
+    cached = store._norms
+    assert len(cached) == 3
+    store.search(vectors[1:2], k=1)
+    assert store._norms is cached
+
+    # Appended rows only extend the cache.
+    store.append(TEXTS[3:], vectors[3:])
+    idx, _ = store.search(vectors[4], k=1)
+    assert idx[0, 0] == 4
+    np.testing.assert_array_equal(store._norms[:3], cached)
+    assert len(store._norms) == len(TEXTS)
+
+def test_float16_store_and_bulk_load_into_vector_store(tmp_path, vectors):
+    store = EmbeddingStore.create(str(tmp_path / "c.emb"), dimension=8, dtype="float16")
+    store.append(TEXTS, vectors)
+    assert os.path.getsize(os.path.join(store.path, "vectors.bin")) == vectors.size * 2
+
+    cfg = LocalStoreConfig()
+    cfg.collection_name = "local"
+    cfg.vector_size = 8
+    cfg.search_threads = 1
+    local = LocalVectorStore(cfg)
+    local.create_collection()
+    assert local.insert_from_embedding_store(store, batch_size=2, payload={"source": "emb"}) == len(TEXTS)
+
+    hit = local.search_similar_texts(vectors[4], top_k=1)[0]
+    assert hit["text"] == "delta" and hit["id"] == point_id("delta")
+    assert local.retrieve_payloads([point_id("alpha")], fields=["source"]) == {point_id("alpha"): {"source": "emb"}}
+
+def test_demo_rebuilds_a_store_built_from_other_input(tmp_path):
+    from scripts.similarity_demo import load_or_build_store
+
+    class Embedder:
+        def __init__(self, model_name="m", dimension=4):
+            self.model_name = model_name
+            self.dimension = dimension
+            self.calls = 0
+
+        def generate_embeddings(self, texts, progress=None):
+            self.calls += 1
+            return [[float(len(t))] * self.dimension for t in texts]
+
+    sentences = tmp_path / "sentences.txt"
+    sentences.write_text("one\ntwo\n", encoding="utf-8")
+    path = str(tmp_path / "sentences.emb")
+
+    def build(embedder):
+        store = load_or_build_store(path, str(sentences), embedder)
+        texts = store.texts()
+        store.close()
+        return embedder.calls, texts
+
+    assert build(Embedder()) == (1, ["one", "two"])
+    assert build(Embedder()) == (0, ["one", "two"])
+    assert build(Embedder(dimension=8)) == (1, ["one", "two"])
+    assert build(Embedder(model_name="other", dimension=8)) == (1, ["one", "two"])
+
+    sentences.write_text("one\ntwo\nthree\n", encoding="utf-8")
+    assert build(Embedder(model_name="other", dimension=8)) == (1, ["one", "two", "three"])
+
+    # Stores in an older format cannot be opened; they are rebuilt as well.
+    header = os.path.join(path, "header.json")
+    with open(header, "r", encoding="utf-8") as f:
+        old = {**json.load(f), "version": 1}
+    with open(header, "w", encoding="utf-8") as f:
+        json.dump(old, f)
+    assert build(Embedder(model_name="other", dimension=8)) == (1, ["one", "two", "three"])
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.ann_index import IVFIndex
+from app.ingestion import IngestionConfig, ingest_file
+from app.local_store import LocalStoreConfig, LocalVectorStore
+from app.qdrant_utils import QdrantConfig, QdrantVectorStore
+from app.quantization import QuantizedIndex, ScalarQuantizer
+from app.vector_index import VectorIndex
+from app.vector_store import matches_filter, validate_filter
+
+DOCS = [
+    ("acme launches rockets", "acme", 2021, ["en"]),
+    ("acme sells anvils", "acme", 2019, ["en", "de"]),
+    ("globex builds domes", "globex", 2023, ["en"]),
+    ("globex hires villains", "globex", 2018, ["fr"]),
+]
+
+class FakeGenerator:
+    model_name = "fake-model"
+
+    def generate_embeddings(self, texts):
+        return [[1.0, float(len(t)) / 10.0] for t in texts]
+
+def test_matches_filter_semantics():
+    payload = {"tenant": "acme", "year": 2021, "lang": ["en", "de"], "public": True}
+    assert matches_filter(payload, None)
+    assert matches_filter(payload, {"tenant": "acme", "year": {"gte": 2020, "lt": 2022}})
+    assert matches_filter(payload, {"lang": "de"})
+    assert matches_filter(payload, {"tenant": ["globex", "acme"]})
+    assert not matches_filter(payload, {"year": {"gt": 2021}})
+    assert not matches_filter(payload, {"missing": "x"})
+    # Booleans and integers are distinct values, as in Qdrant.
+    assert not matches_filter(payload, {"public": 1})
+
+    validate_filter({"tenant": "acme", "year": {"lte": 3.5}, "lang": ["en"]})
+    for bad in ({"year": {"near": 1}}, {"year": {}}, {"tenant": []}, {"tenant": {"gte": "a"}}, {"x": 1.5}):
+        with pytest.raises(ValueError):
+            validate_filter(bad)
+
+@pytest.mark.parametrize("make_index", [
+    lambda: VectorIndex(dimension=8),
+    lambda: IVFIndex(dimension=8, n_lists=4, nprobe=4, train_size=100),
+    lambda: QuantizedIndex(dimension=8, quantizer=ScalarQuantizer(8), rerank=2, train_size=100),
+])
+def test_filtered_index_search_returns_k_matching_rows(make_index):
+    rng = np.random.default_rng(0)
+    corpus = rng.normal(size=(400, 8)).astype(np.float32)
+    index = make_index()
+    index.add(list(range(400)), corpus, [{"even": i % 2 == 0} for i in range(400)])
+
+    hits = index.search(corpus[:3], k=5, where=lambda payload: payload["even"])
+    assert all(len(row) == 5 for row in hits)
+    assert all(pid % 2 == 0 for row in hits for pid, _, _ in row)
+    # Row 0 is even, so it is still its own nearest neighbour.
+    assert hits[0][0][0] == 0
+    assert index.search(corpus[:1], k=5, where=lambda payload: False) == [[]]
+
+def test_local_store_filters_and_selects_payload_fields():
+    cfg = LocalStoreConfig()
+    cfg.collection_name = "filtered"
+    cfg.vector_size = 2
+    cfg.distance_metric = "COSINE"
+    store = LocalVectorStore(cfg)
+    store.create_collection()
+    texts = [text for text, _, _, _ in DOCS]
+    store.insert_embeddings(
+        texts,
+        FakeGenerator().generate_embeddings(texts),
+        payloads=[{"tenant": tenant, "year": year, "lang": lang} for _, tenant, year, lang in DOCS],
+    )
+
+    hits = store.search_similar_texts([1.0, 2.0], top_k=4, query_filter={"tenant": "globex"}, with_payload=["year"])
+    assert {hit["text"] for hit in hits} == {"globex builds domes", "globex hires villains"}
+    assert all(set(hit["payload"]) == {"year"} for hit in hits)
+    assert "payload" not in store.search_similar_texts([1.0, 2.0], top_k=1)[0]
+
+def test_ingested_metadata_is_filterable_in_qdrant(tmp_path, monkeypatch):
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "2")
+    cfg = QdrantConfig()
+    cfg.collection_name = "metadata"
+    cfg.vector_size = 2
+    cfg.distance_metric = "COSINE"
+    cfg.quantization = "none"
+    cfg.payload_indexes = {}
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = cfg
+    store.client = QdrantClient(":memory:")
+    store.create_collection()
+
+    config = IngestionConfig()
+    config.checkpoint_path = None
+    for tenant in ("acme", "globex"):
+        path = tmp_path / f"{tenant}.txt"
+        path.write_text("\n".join(text for text, owner, _, _ in DOCS if owner == tenant), encoding="utf-8")
+        ingest_file(str(path), FakeGenerator(), store, config=config, metadata={"tenant": tenant, "year": 2024})
+
+    hits = store.search_similar_texts([1.0, 2.0], top_k=4, query_filter={"tenant": "acme", "year": {"gte": 2024}},
+                                      with_payload=["tenant", "source"])
+    assert {hit["text"] for hit in hits} == {"acme launches rockets", "acme sells anvils"}
+    assert hits[0]["payload"] == {"tenant": "acme", "source": "acme.txt"}
+    assert store.search_similar_texts_batch([[1.0, 2.0]], top_k=4, query_filter={"tenant": ["initech"]}) == [[]]
+
+def test_same_text_ingested_for_two_tenants_is_stored_once_per_tenant(tmp_path, monkeypatch):
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "2")
+    cfg = QdrantConfig()
+    cfg.collection_name = "owners"
+    cfg.vector_size = 2
+    cfg.distance_metric = "COSINE"
+    cfg.quantization = "none"
+    cfg.payload_indexes = {}
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = cfg
+    store.client = QdrantClient(":memory:")
+    store.create_collection()
+
+    config = IngestionConfig()
+    config.checkpoint_path = None
+    config.incremental = True
+    config.prune = True
+    path = tmp_path / "shared.txt"
+    path.write_text("quarterly report\n", encoding="utf-8")
+    for tenant in ("acme", "globex"):
+        report = ingest_file(str(path), FakeGenerator(), store, config=config, metadata={"tenant": tenant})
+        assert (report["added"], report["removed"]) == (1, 0)
+
+    for tenant in ("acme", "globex"):
+        hits = store.search_similar_texts([1.0, 2.0], top_k=5, query_filter={"tenant": tenant}, with_payload=["tenant"])
+        assert [(hit["text"], hit["payload"]["tenant"]) for hit in hits] == [("quarterly report", tenant)]
+
+    rerun = ingest_file(str(path), FakeGenerator(), store, config=config, metadata={"tenant": "acme"})
+    assert (rerun["added"], rerun["unchanged"], rerun["removed"]) == (0, 1, 0)
+
+    # Pruning globex's copy of the file leaves acme's point alone.
+    path.write_text("annual report\n", encoding="utf-8")
+    pruned = ingest_file(str(path), FakeGenerator(), store, config=config, metadata={"tenant": "globex"})
+    assert pruned["removed"] == 1
+    acme = store.search_similar_texts([1.0, 2.0], top_k=5, query_filter={"tenant": "acme"})
+    assert [hit["text"] for hit in acme] == ["quarterly report"]
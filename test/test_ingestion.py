@@ -0,0 +1,196 @@
+import os
+
+import pytest
+from qdrant_client import QdrantClient
+
+from app.ingestion import IngestionConfig, ingest_file, iter_batches, iter_lines
+from app.qdrant_utils import QdrantConfig, QdrantVectorStore, point_id
+
+class FakeGenerator:
+    def __init__(self, model_name="fake-model"):
+        self.model_name = model_name
+        self.batches = []
+
+    def generate_embeddings(self, texts, progress=None):
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+class FakeStore:
+    def __init__(self, fail_on_call=None):
+        self.points = {}
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def insert_embeddings(self, texts, embeddings, collection_name=None, ids=None, payloads=None):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("qdrant went away")
+        for text in texts:
+            self.points[point_id(text)] = text
+        return True
+
+def make_config(batch_size=3, checkpoint_path=None, incremental=False, prune=False):
+    cfg = IngestionConfig()
+    cfg.batch_size = batch_size
+    cfg.queue_depth = 1
+    cfg.checkpoint_path = checkpoint_path
+    cfg.incremental = incremental
+    cfg.prune = prune
+    return cfg
+
+@pytest.fixture
+def local_store(monkeypatch):
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "1")
+    cfg = QdrantConfig()
+    cfg.collection_name = "incremental"
+    cfg.vector_size = 1
+    cfg.distance_metric = "DOT"
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.config = cfg
+    store.client = QdrantClient(":memory:")
+    store.create_collection()
+    return store
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text("one\n\ntwo\nthree\nfour\n  \nfive\nsix\nseven\n", encoding="utf-8")
+    return str(path)
+
+def test_iter_lines_skips_blanks_and_tracks_offsets(corpus):
+    lines = list(iter_lines(corpus))
+    assert [text for text, _ in lines] == ["one", "two", "three", "four", "five", "six", "seven"]
+    assert lines[-1][1] == os.path.getsize(corpus)
+
+    resumed = list(iter_lines(corpus, start_offset=lines[2][1]))
+    assert [text for text, _ in resumed] == ["four", "five", "six", "seven"]
+
+def test_iter_batches():
+    assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_ingest_streams_in_batches(corpus):
+    generator = FakeGenerator()
+    store = FakeStore()
+
+    report = ingest_file(corpus, generator, store, config=make_config(batch_size=3))
+
+    assert [len(b) for b in generator.batches] == [3, 3, 1]
+    assert sorted(store.points.values()) == sorted(["one", "two", "three", "four", "five", "six", "seven"])
+    assert report["ingested"] == 7
+
+def test_ingest_resumes_from_checkpoint_after_crash(corpus, tmp_path):
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    crashing = FakeStore(fail_on_call=2)
+
+    with pytest.raises(RuntimeError):
+        ingest_file(corpus, FakeGenerator(), crashing, config=make_config(checkpoint_path=checkpoint))
+    assert sorted(crashing.points.values()) == ["one", "three", "two"]
+
+    generator = FakeGenerator()
+    store = FakeStore()
+    report = ingest_file(corpus, generator, store, config=make_config(checkpoint_path=checkpoint))
+
+    assert generator.batches[0] == ["four", "five", "six"]
+    assert sorted(store.points.values()) == ["five", "four", "seven", "six"]
+    assert report["resumed_from"] == 3
+    assert report["total"] == 7
+
+def test_checkpoint_is_removed_after_a_finished_run(corpus, tmp_path):
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    with pytest.raises(RuntimeError):
+        ingest_file(corpus, FakeGenerator(), FakeStore(fail_on_call=2), config=make_config(checkpoint_path=checkpoint))
+    ingest_file(corpus, FakeGenerator(), FakeStore(), config=make_config(checkpoint_path=checkpoint))
+    assert not os.path.exists(checkpoint)
+
+    # The next run starts from the top, so incremental and prune passes see the whole file again.
+    report = ingest_file(corpus, FakeGenerator(), FakeStore(), config=make_config(checkpoint_path=checkpoint))
+    assert (report["resumed_from"], report["ingested"]) == (0, 7)
+
+def test_checkpoint_is_discarded_when_the_file_changed(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("a\nb\nc\nd\n", encoding="utf-8")
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    with pytest.raises(RuntimeError):
+        ingest_file(str(corpus), FakeGenerator(), FakeStore(fail_on_call=2),
+                    config=make_config(batch_size=2, checkpoint_path=checkpoint))
+
+    # The old offset (4) would now land inside "B-changed".
+    corpus.write_text("a\nB-changed\nc\nd\n", encoding="utf-8")
+    generator = FakeGenerator()
+    report = ingest_file(str(corpus), generator, FakeStore(), config=make_config(batch_size=2, checkpoint_path=checkpoint))
+    assert generator.batches == [["a", "B-changed"], ["c", "d"]]
+    assert report["resumed_from"] == 0
+
+def test_checkpoint_survives_appends_and_blank_tails(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("a\nb\n\nc\n\n\n", encoding="utf-8")
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    with pytest.raises(RuntimeError):
+        ingest_file(str(corpus), FakeGenerator(), FakeStore(fail_on_call=2),
+                    config=make_config(batch_size=2, checkpoint_path=checkpoint))
+
+    with open(corpus, "a", encoding="utf-8") as f:
+        f.write("d\n")
+    generator = FakeGenerator()
+    report = ingest_file(str(corpus), generator, FakeStore(), config=make_config(batch_size=2, checkpoint_path=checkpoint))
+    assert generator.batches == [["c", "d"]]
+    assert report["resumed_from"] == 2
+
+def test_checkpoint_for_other_file_is_rejected(corpus, tmp_path):
+    checkpoint = str(tmp_path / "ingest.ckpt")
+    with pytest.raises(RuntimeError):
+        ingest_file(corpus, FakeGenerator(), FakeStore(fail_on_call=2), config=make_config(checkpoint_path=checkpoint))
+
+    other = tmp_path / "other.txt"
+    other.write_text("x\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        ingest_file(str(other), FakeGenerator(), FakeStore(), config=make_config(checkpoint_path=checkpoint))
+
+def test_incremental_run_only_embeds_new_and_changed(tmp_path, local_store):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("one\ntwo\nthree\n", encoding="utf-8")
+    first = ingest_file(str(corpus), FakeGenerator(), local_store, config=make_config(incremental=True))
+    assert (first["added"], first["unchanged"]) == (3, 0)
+
+    corpus.write_text("one\ntwo\nthree\nfour\nfour\n", encoding="utf-8")
+    generator = FakeGenerator()
+    second = ingest_file(str(corpus), generator, local_store, config=make_config(incremental=True))
+
+    assert generator.batches == [["four"]]
+    assert (second["added"], second["updated"], second["unchanged"]) == (1, 0, 4)
+
+    upgraded = FakeGenerator(model_name="new-model")
+    third = ingest_file(str(corpus), upgraded, local_store, config=make_config(batch_size=10, incremental=True))
+    assert upgraded.batches == [["one", "two", "three", "four"]]
+    assert third["updated"] == 4
+
+def test_same_file_from_another_directory_keeps_its_point_ids(tmp_path, local_store):
+    for directory in ("checkout-a", "checkout-b"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "corpus.txt").write_text("one\ntwo\n", encoding="utf-8")
+    ingest_file(str(tmp_path / "checkout-a" / "corpus.txt"), FakeGenerator(), local_store,
+                config=make_config(incremental=True))
+
+    generator = FakeGenerator()
+    report = ingest_file(str(tmp_path / "checkout-b" / "corpus.txt"), generator, local_store,
+                         config=make_config(incremental=True, prune=True))
+
+    assert generator.batches == []
+    assert (report["unchanged"], report["removed"]) == (2, 0)
+    assert local_store.client.count("incremental").count == 2
+
+def test_prune_removes_deleted_lines_from_same_source(tmp_path, local_store):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("one\ntwo\nthree\n", encoding="utf-8")
+    other = tmp_path / "other.txt"
+    other.write_text("elsewhere\n", encoding="utf-8")
+    ingest_file(str(corpus), FakeGenerator(), local_store, config=make_config(incremental=True))
+    ingest_file(str(other), FakeGenerator(), local_store, config=make_config(incremental=True))
+
+    corpus.write_text("one\nthree\n", encoding="utf-8")
+    report = ingest_file(str(corpus), FakeGenerator(), local_store, config=make_config(incremental=True, prune=True))
+
+    assert report["removed"] == 1
+    assert report["unchanged"] == 2
+    remaining = {r.payload["text"] for r in local_store.client.scroll("incremental", limit=10)[0]}
+    assert remaining == {"one", "three", "elsewhere"}
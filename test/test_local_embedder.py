@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.batch_embedder import BatchEmbedderConfig
+from app.embedding_backend import create_embedding_backend
+from app.embedding_cache import EmbeddingCache, EmbeddingCacheConfig
+from app.embeddings import EmbeddingGenerator
+from app.local_embedder import HashingEmbeddingBackend, LocalEmbedderConfig, SimulatedEmbeddingError
+
+def make_backend(**overrides):
+    cfg = LocalEmbedderConfig()
+    cfg.dimension = 64
+    cfg.latency_ms = cfg.latency_per_text_ms = cfg.jitter_ms = 0.0
+    cfg.error_rate = 0.0
+    cfg.error_code = 429
+    cfg.seed = 0
+    for name, value in overrides.items():
+        setattr(cfg, name, value)
+    return HashingEmbeddingBackend(cfg)
+
+def test_vectors_are_deterministic_unit_length_and_content_aware():
+    texts = ["The cat sat on the mat", "the cat  sat on the mat!", "Quarterly revenue grew"]
+    first = np.array(make_backend().embed(texts))
+    assert np.array_equal(first, np.array(make_backend().embed(texts)))
+    np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-5)
+    # Casing, spacing and punctuation do not change the features.
+    assert first[0] @ first[1] == pytest.approx(1.0)
+    assert first[0] @ first[2] < 0.5
+    assert len(make_backend().embed(["short"], output_dimensionality=16)[0]) == 16
+
+def test_simulated_latency_and_errors():
+    slow = make_backend(latency_ms=20, latency_per_text_ms=5)
+    start = time.perf_counter()
+    slow.embed(["a", "b"])
+    assert time.perf_counter() - start >= 0.03
+
+    failing = make_backend(error_rate=1.0, error_code=503)
+    with pytest.raises(SimulatedEmbeddingError) as info:
+        failing.embed(["a"])
+    assert info.value.code == 503
+    assert failing.stats() == {"calls": 1, "texts": 1, "errors": 1}
+
+def test_generator_retries_simulated_rate_limits():
+    batch_config = BatchEmbedderConfig()
+    batch_config.backoff_base = 0.0
+    batch_config.max_retries = 50
+    cache_config = EmbeddingCacheConfig()
+    cache_config.path = None
+    backend = make_backend(error_rate=0.5, seed=3)
+    generator = EmbeddingGenerator(backend=backend, batch_config=batch_config, cache=EmbeddingCache(cache_config))
+    try:
+        vectors = generator.generate_embeddings([f"text {i}" for i in range(20)])
+        assert vectors == make_backend().embed([f"text {i}" for i in range(20)])
+        assert backend.stats()["errors"] == generator.batch_embedder.stats()["retries"] > 0
+        assert generator.dimension == 64 and generator.model_name == "local-hashing-64"
+    finally:
+        generator.close()
+
+def test_backend_is_selected_by_config(monkeypatch):
+    monkeypatch.delenv("GOOGLE_PROJECT_ID", raising=False)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_EMBEDDING_DIMENSION", "32")
+    generator = EmbeddingGenerator()
+    try:
+        assert isinstance(generator.backend, HashingEmbeddingBackend)
+        assert len(generator.generate_embedding("no cloud needed")) == 32
+    finally:
+        generator.close()
+    with pytest.raises(ValueError):
+        create_embedding_backend("word2vec")
+
+def test_persistent_cache_is_not_shared_across_dimensions(tmp_path):
+    cache_config = EmbeddingCacheConfig()
+    cache_config.path = str(tmp_path / "cache.sqlite")
+    for dimension in (64, 32):
+        generator = EmbeddingGenerator(backend=make_backend(dimension=dimension), cache=EmbeddingCache(cache_config))
+        try:
+            assert len(generator.generate_embeddings(["same text"])[0]) == dimension
+        finally:
+            generator.close()
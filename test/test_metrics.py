@@ -0,0 +1,185 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+from app.metrics import (
+    BATCH_SIZES,
+    IN_FLIGHT,
+    STAGE_ERRORS,
+    STAGE_SECONDS,
+    MetricsRegistry,
+    flatten_stats,
+    span,
+)
+from app.profiler import ProfilerConfig, SlowRequestProfiler, collapse_stack
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("path",))
+    depth = registry.gauge("queue_depth", "Queued items.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    depth.set(4)
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+    registry.add_collector(lambda: {"cache_hits": 7, "missing": None})
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{path="/a\\"b"} 3' in text
+    assert "queue_depth 4" in text
+    # Buckets are cumulative and end with +Inf, which equals the count.
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert "latency_seconds_sum 5.55" in text
+    assert "cache_hits 7" in text
+    assert "missing" not in text
+
+    with pytest.raises(ValueError):
+        registry.counter("requests_total", "Again.")
+    with pytest.raises(ValueError):
+        requests.labels("a", "b")
+
+def test_span_records_latency_batch_size_and_errors():
+    with span("test_stage", batch_size=12):
+        assert IN_FLIGHT.labels("test_stage").value == 1
+    with pytest.raises(RuntimeError):
+        with span("test_stage"):
+            raise RuntimeError("boom")
+
+    assert STAGE_SECONDS.labels("test_stage").count == 2
+    assert STAGE_ERRORS.labels("test_stage").value == 1
+    assert IN_FLIGHT.labels("test_stage").value == 0
+    assert BATCH_SIZES.labels("test_stage").count == 1
+    assert BATCH_SIZES.labels("test_stage").sum == 12
+
+def test_span_overhead_is_a_few_microseconds():
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        with span("overhead"):
+            pass
+    per_span = (time.perf_counter() - start) / n
+    # Typically 1-3µs; the bound leaves room for slow CI machines.
+    assert per_span < 20e-6
+
+def test_flatten_stats_keeps_numbers():
+    assert flatten_stats("cache", {"hits": 3, "hit_rate": 0.5, "path": "x", "generation": None}) == {
+        "cache_hits": 3.0, "cache_hit_rate": 0.5
+    }
+    assert flatten_stats("cache", None) == {}
+
+class FakeGenerator:
+    cache = None
+
+    class batch_embedder:
+        @staticmethod
+        def stats():
+            return {"requests": 1, "retries": 0}
+
+        @staticmethod
+        def plan_batches(texts):
+            return [(0, len(texts))] if texts else []
+
+    async def agenerate_embeddings(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+def test_metrics_endpoint_reports_routes_and_stages(monkeypatch):
+    monkeypatch.setattr(main, "embedding_generator", FakeGenerator())
+    monkeypatch.setattr(main, "embedding_batcher", None)
+    validations = STAGE_SECONDS.labels("validation").count
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            await c.post("/embeddings", json={"texts": ["a", "b"]})
+            await c.post("/embeddings", json={"texts": []})
+            return await c.get("/metrics")
+
+    resp = asyncio.run(run())
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    # Routes are labelled by template, so request paths never create new series.
+    assert 'http_requests_total{path="/embeddings",method="POST",status="200"}' in text
+    assert 'http_requests_total{path="/embeddings",method="POST",status="422"}' in text
+    assert 'http_request_duration_seconds_count{path="/embeddings"}' in text
+    assert 'pipeline_stage_duration_seconds_count{stage="encode"}' in text
+    assert "embeddings_api_upstream_requests 1" in text
+    assert "embeddings_api_requests_in_flight 0" in text
+    assert STAGE_SECONDS.labels("validation").count == validations + 2
+
+def test_profiler_writes_samples_of_slow_requests(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "5")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    profiler = SlowRequestProfiler(ProfilerConfig())
+    assert profiler.config.enabled
+
+    start = time.perf_counter()
+    profiler.sample()
+    time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    assert profiler.request_finished("/search", start, 0.001) is None
+    path = profiler.request_finished("/search", start, elapsed)
+    assert path is not None and os.path.dirname(path) == str(tmp_path)
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # Folded format: thread name, then frames root first, then the sample count.
+    assert any("test_profiler_writes_samples_of_slow_requests" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    # Samples taken outside the request window are ignored.
+    assert profiler.request_finished("/search", start + 60, elapsed) is None
+
+def test_profiler_thread_samples_in_background(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "1")
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "1")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    profiler = SlowRequestProfiler(ProfilerConfig())
+    profiler.start()
+    try:
+        start = time.perf_counter()
+        time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    finally:
+        profiler.stop()
+    assert profiler.request_finished("/embedding", start, elapsed) is not None
+
+def test_profiler_writes_off_the_calling_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "5")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    profiler = SlowRequestProfiler(ProfilerConfig())
+    start = time.perf_counter()
+    profiler.sample()
+    time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    assert profiler.submit("/search", start, 0.001) is None
+    written_by = []
+    original = profiler.request_finished
+
+    def request_finished(*args):
+        written_by.append(threading.current_thread().name)
+        return original(*args)
+
+    profiler.request_finished = request_finished
+    path = profiler.submit("/search", start, elapsed).result(timeout=5)
+    profiler.stop()
+    assert os.path.exists(path)
+    assert written_by[0].startswith("profile-writer")
+
+def test_collapse_stack_is_root_first():
+    def inner():
+        return collapse_stack(sys._getframe())
+    stack = inner().split(";")
+    assert stack[-1].startswith("inner ")
+    assert any(frame.startswith("test_collapse_stack_is_root_first ") for frame in stack[:-1])
@@ -1,11 +1,8 @@
-import types
 import pytest
 
-from app.qdrant_utils import QdrantVectorStore, QdrantConfig
+from qdrant_client import models
 
-class DummyCollectionsResponse:
-    def __init__(self, names):
-        self.collections = [types.SimpleNamespace(name=n) for n in names]
+from app.qdrant_utils import QdrantVectorStore, QdrantConfig, parse_payload_indexes, point_id
 
 class DummyQueryResultPoint:
     def __init__(self, pid, text, score):
@@ -22,37 +19,62 @@ class FakeQdrantClient:
         self.created = {}
         self.upserts = {}
         self.query_calls = []
+        self.waits = []
+        self.upload_batch_sizes = []
+        self.payload_indexes = {}
 
-    def get_collections(self):
-        return DummyCollectionsResponse(list(self.created.keys()))
+    def collection_exists(self, collection_name):
+        return collection_name in self.created
 
-    def create_collection(self, collection_name, vectors_config):
+    def create_collection(self, collection_name, vectors_config, quantization_config=None):
         self.created[collection_name] = {
             "size": vectors_config.size,
-            "distance": vectors_config.distance
+            "distance": vectors_config.distance,
+            "quantization": quantization_config,
         }
 
-    def upsert(self, collection_name, points):
+    def upsert(self, collection_name, points, wait=True):
         self.upserts.setdefault(collection_name, [])
         self.upserts[collection_name].extend(points)
+        self.waits.append(wait)
 
-    def query_points(self, collection_name, query, limit, with_payload, with_vectors):
+    def upload_points(self, collection_name, points, batch_size=64, parallel=1, wait=False):
+        self.upload_batch_sizes.append(batch_size)
+        self.upload_materialized = isinstance(points, (list, tuple))
+        self.upserts.setdefault(collection_name, [])
+        self.upserts[collection_name].extend(points)
+        self.waits.append(wait)
+
+    def create_payload_index(self, collection_name, field_name, field_schema, wait=True):
+        self.payload_indexes.setdefault(collection_name, {})[field_name] = field_schema
+
+    def query_points(self, collection_name, query, limit, with_payload, with_vectors, search_params=None,
+                     query_filter=None):
         self.query_calls.append(
-            {"collection": collection_name, "query": query, "limit": limit}
+            {"collection": collection_name, "query": query, "limit": limit, "params": search_params,
+             "filter": query_filter, "with_payload": with_payload}
         )
         pts = []
         for i in range(limit):
             pts.append(DummyQueryResultPoint(pid=i, text=f"text-{i}", score=1.0 - 0.01 * i))
         return DummyQueryResult(pts)
 
+    def query_batch_points(self, collection_name, requests):
+        return [self.query_points(collection_name, r.query, r.limit, r.with_payload, r.with_vector, r.params, r.filter)
+                for r in requests]
+
 @pytest.fixture
 def store(monkeypatch):
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "3")
     cfg = QdrantConfig()
     cfg.url = "http://fake"
     cfg.collection_name = "test_col"
     cfg.vector_size = 3
     cfg.distance_metric = "COSINE"
 
+    cfg.upsert_batch_size = 2
+    cfg.quantization = "none"
+    cfg.payload_indexes = {}
     fake_client = FakeQdrantClient()
 
     def fake_init(self, config=None):
@@ -86,4 +108,98 @@ def test_insert_and_query_roundtrip_shapes(store):
     results = store.search_similar_texts(query_vector=[0.1, 0.2, 0.3], top_k=2, collection_name=coll)
     assert isinstance(results, list)
     assert len(results) == 2
-    assert set(results[0].keys()) == {"id", "text", "score"}
\ No newline at end of file
+    assert set(results[0].keys()) == {"id", "text", "score"}
+
+def test_batch_search_returns_one_result_list_per_query(store):
+    results = store.search_similar_texts_batch(
+        query_vectors=[[0.1, 0.2, 0.3], [0.3, 0.2, 0.1]], top_k=2, collection_name="rt_col"
+    )
+    assert len(results) == 2
+    assert all(len(hits) == 2 for hits in results)
+    assert set(results[1][0].keys()) == {"id", "text", "score"}
+
+def test_point_ids_are_content_derived_and_stable(store):
+    store.insert_embeddings(texts=["alpha", "beta"], embeddings=[[1.0, 0, 0], [0, 1.0, 0]], collection_name="ids")
+    store.insert_embeddings(texts=["beta", "alpha"], embeddings=[[0, 1.0, 0], [1.0, 0, 0]], collection_name="ids")
+
+    ids = {p.id for p in store.client.upserts["ids"]}
+    assert ids == {point_id("alpha"), point_id("beta")}
+    assert point_id("alpha") == point_id("  alpha ")
+    assert point_id("alpha") != point_id("Alpha")
+
+def test_insert_streams_points_in_waited_chunks(store):
+    texts = [f"t{i}" for i in range(5)]
+    store.insert_embeddings(texts=texts, embeddings=[[0.1, 0.2, 0.3]] * 5, collection_name="chunks")
+
+    assert store.client.upload_batch_sizes == [2]
+    # Every chunk is acknowledged once applied; no separate barrier write.
+    assert store.client.waits == [True]
+    assert store.client.upload_materialized is False
+    assert [p.id for p in store.client.upserts["chunks"]] == [point_id(t) for t in texts]
+
+def test_explicit_ids_are_respected(store):
+    store.insert_embeddings(texts=["a"], embeddings=[[0.1, 0.2, 0.3]], collection_name="explicit", ids=[42])
+    assert {p.id for p in store.client.upserts["explicit"]} == {42}
+
+def test_native_quantization_is_configured_on_create_and_search(store):
+    store.create_collection(collection_name="plain", vector_size=3, distance_metric="COSINE")
+    assert store.client.created["plain"]["quantization"] is None
+
+    store.config.quantization = "scalar"
+    store.create_collection(collection_name="sq", vector_size=3, distance_metric="COSINE")
+    quantization = store.client.created["sq"]["quantization"]
+    assert quantization.scalar.type == models.ScalarType.INT8
+
+    store.config.quantization = "binary"
+    store.create_collection(collection_name="bq", vector_size=3, distance_metric="COSINE")
+    assert store.client.created["bq"]["quantization"].binary.always_ram is True
+
+    store.search_similar_texts_batch([[0.1, 0.2, 0.3]], top_k=1, collection_name="bq")
+    params = store.client.query_calls[-1]["params"]
+    assert params.quantization.rescore is True and params.quantization.oversampling == 2.0
+
+def test_declared_payload_indexes_are_created_with_collection(store):
+    store.config.payload_indexes = parse_payload_indexes("tenant, year:integer")
+    store.create_collection(collection_name="indexed", vector_size=3, distance_metric="COSINE")
+    assert store.client.payload_indexes["indexed"] == {
+        "tenant": models.PayloadSchemaType.KEYWORD,
+        "year": models.PayloadSchemaType.INTEGER,
+    }
+
+def test_search_filter_and_payload_selection_are_sent_to_qdrant(store):
+    query_filter = {"tenant": "acme", "lang": ["en", "de"], "year": {"gte": 2020, "lt": 2025}}
+    store.search_similar_texts([0.1, 0.2, 0.3], top_k=1, collection_name="f", query_filter=query_filter)
+    call = store.client.query_calls[-1]
+    conditions = {c.key: c for c in call["filter"].must}
+    assert conditions["tenant"].match == models.MatchValue(value="acme")
+    assert conditions["lang"].match == models.MatchAny(any=["en", "de"])
+    assert conditions["year"].range == models.Range(gte=2020, lt=2025)
+    # Only the text is fetched unless more fields are asked for.
+    assert call["with_payload"] == ["text"]
+
+    hits = store.search_similar_texts_batch([[0.1, 0.2, 0.3]], top_k=1, collection_name="f", with_payload=["tenant"])
+    assert store.client.query_calls[-1]["with_payload"] == ["text", "tenant"]
+    assert hits[0][0]["payload"] == {}
+    hits = store.search_similar_texts_batch([[0.1, 0.2, 0.3]], top_k=1, collection_name="f", with_payload=True)
+    assert store.client.query_calls[-1]["with_payload"] is True
+    assert hits[0][0]["payload"] == {"text": "text-0"}
+
+    with pytest.raises(ValueError):
+        store.search_similar_texts([0.1, 0.2, 0.3], query_filter={"year": {"between": [1, 2]}})
+
+def test_client_options_use_pooled_grpc_without_startup_round_trips(monkeypatch):
+    monkeypatch.setenv("QDRANT_POOL_SIZE", "4")
+    monkeypatch.setenv("QDRANT_TIMEOUT_S", "3")
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "3")
+    cfg = QdrantConfig()
+    cfg.url = "http://qdrant:6333"
+    options = cfg.client_options()
+    assert options["prefer_grpc"] is True
+    assert options["grpc_port"] == 6334
+    assert options["pool_size"] == 4
+    assert options["timeout"] == 3
+    assert options["check_compatibility"] is False
+
+    # Constructing the clients must not connect; that happens on the first call.
+    store = QdrantVectorStore(cfg)
+    assert store.client is not None and store.async_client is not None
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.local_store import LocalStoreConfig, LocalVectorStore
+from app.quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+from app.similarity import CorpusMatrix, normalize_rows
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(5)
+    centers = rng.normal(size=(30, 32)) * 3
+    return (centers[rng.integers(0, 30, size=1500)] + rng.normal(size=(1500, 32))).astype(np.float32)
+
+def recall(index, corpus, queries, k, metric):
+    expected, _ = CorpusMatrix(corpus).top_k(queries, k=k, metric=metric)
+    found = [[pid for pid, _, _ in hits] for hits in index.search(queries, k)]
+    return np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected.tolist())])
+
+def build(corpus, quantizer, metric="cosine", rerank=0):
+    index = QuantizedIndex(dimension=corpus.shape[1], quantizer=quantizer, metric=metric, rerank=rerank,
+                           train_size=len(corpus), initial_capacity=8)
+    index.add(list(range(len(corpus))), corpus, [{"text": f"t{i}"} for i in range(len(corpus))])
+    return index
+
+def test_scalar_quantizer_reconstructs_within_one_step(corpus):
+    sq = ScalarQuantizer(32).fit(corpus)
+    codes = sq.encode(corpus)
+    assert codes.dtype == np.int8 and codes.shape == corpus.shape
+    assert np.all(np.abs(sq.decode(codes) - corpus) <= sq.scale / 2 + 1e-5)
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer(32), ProductQuantizer(32, n_subvectors=8, n_bits=6)])
+def test_asymmetric_scores_match_decoded_vectors(corpus, quantizer):
+    quantizer.fit(corpus)
+    codes = quantizer.encode(corpus[:100])
+    decoded = quantizer.decode(codes)
+    queries = corpus[200:203]
+    np.testing.assert_allclose(quantizer.inner_products(queries, codes), queries @ decoded.T, rtol=1e-4, atol=1e-2)
+    expected = ((queries[:, None, :] - decoded[None, :, :]) ** 2).sum(axis=2)
+    np.testing.assert_allclose(quantizer.squared_distances(queries, codes), expected, rtol=1e-4, atol=1e-2)
+
+def test_product_quantizer_rejects_indivisible_dimension():
+    with pytest.raises(ValueError):
+        ProductQuantizer(30, n_subvectors=8)
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_scalar_index_keeps_recall_and_shrinks_memory(corpus, metric):
+    index = build(corpus, ScalarQuantizer(32), metric)
+    assert index.is_trained
+    assert index.nbytes * 4 == corpus.nbytes
+    assert recall(index, corpus, corpus[:20] + 0.01, 10, metric) >= 0.9
+
+def test_product_quantization_with_rerank(corpus):
+    pq = build(corpus, ProductQuantizer(32, n_subvectors=4, n_bits=6))
+    assert pq.nbytes * 32 == corpus.nbytes
+    reranked = build(corpus, ProductQuantizer(32, n_subvectors=4, n_bits=6), rerank=10)
+
+    queries = corpus[:20] + 0.01
+    assert recall(reranked, corpus, queries, 10, "cosine") >= recall(pq, corpus, queries, 10, "cosine")
+    assert recall(reranked, corpus, queries, 10, "cosine") >= 0.95
+    # Reranked scores are exact cosine similarities.
+    pid, score, _ = reranked.search(corpus[3], k=1)[0][0]
+    assert pid == 3 and score == pytest.approx(1.0, abs=1e-5)
+
+def test_writes_after_training_are_encoded(corpus):
+    index = build(corpus[:1000], ScalarQuantizer(32))
+    index.add([5000], corpus[1200:1201])
+    assert index.delete([0, 1]) == 2
+    assert index.search(corpus[1200], k=1)[0][0][0] == 5000
+    ids = [pid for pid, _ in index.items()]
+    assert len(ids) == len(index.vectors()) == 999
+    np.testing.assert_allclose(index.vectors()[ids.index(5000)], normalize_rows(corpus[1200:1201])[0], atol=0.05)
+
+def test_local_store_quantization_setting(corpus):
+    cfg = LocalStoreConfig()
+    cfg.collection_name = "q"
+    cfg.vector_size = 32
+    cfg.search_threads = 1
+    cfg.quantization = "sq8"
+    cfg.quantization_train_size = 100
+    store = LocalVectorStore(cfg)
+    store.create_collection()
+    store.insert_embeddings([f"t{i}" for i in range(len(corpus))], corpus)
+    assert isinstance(store.collections["q"], QuantizedIndex)
+    assert store.search_similar_texts(corpus[7], top_k=1)[0]["text"] == "t7"
+
+    cfg.index_type = "ivf"
+    with pytest.raises(ValueError):
+        store.create_collection("other")
@@ -0,0 +1,140 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+
+import app.search_cache as search_cache_module
+import main
+from app.batch_embedder import ParallelBatchEmbedder
+from app.search_cache import SearchCache, SearchCacheConfig, options_key
+from app.vector_store import create_vector_store
+
+OPTIONS = options_key(5, "dense", None, False)
+
+def make_cache(max_entries=3, ttl_s=60.0, similarity=0.95):
+    cfg = SearchCacheConfig()
+    cfg.max_entries = max_entries
+    cfg.ttl_s = ttl_s
+    cfg.similarity = similarity
+    return SearchCache(cfg)
+
+def test_exact_hits_use_normalized_text_and_options():
+    cache = make_cache()
+    cache.put("hello  world", OPTIONS, [{"id": 1}], generation=0)
+    assert cache.get(" hello world ", OPTIONS, 0) == [{"id": 1}]
+    assert cache.get("hello world", options_key(3, "dense", None, False), 0) is None
+    assert cache.stats()["exact_hits"] == 1
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    cache = make_cache(max_entries=2, ttl_s=10.0)
+    cache.put("a", OPTIONS, [1], 0)
+    cache.put("b", OPTIONS, [2], 0)
+    cache.get("a", OPTIONS, 0)
+    cache.put("c", OPTIONS, [3], 0)
+    assert cache.get("b", OPTIONS, 0) is None
+    assert cache.get("a", OPTIONS, 0) == [1]
+
+    now[0] += 11.0
+    assert cache.get("a", OPTIONS, 0) is None
+    stats = cache.stats()
+    assert (stats["evictions"], stats["expirations"], stats["entries"]) == (1, 1, 1)
+
+def test_semantic_hits_need_close_vectors_and_same_options():
+    cache = make_cache()
+    cache.put("how do I reset my password", OPTIONS, ["reset"], 0, vector=[1.0, 0.0, 0.0])
+    assert cache.get_similar([0.99, 0.05, 0.0], OPTIONS, 0) == ["reset"]
+    assert cache.get_similar([0.7, 0.7, 0.0], OPTIONS, 0) is None
+    assert cache.get_similar([1.0, 0.0, 0.0], options_key(5, "hybrid", None, False), 0) is None
+
+    # Evicted entries free their slot and are never matched again.
+    for i in range(3):
+        cache.put(f"other {i}", OPTIONS, [i], 0, vector=[0.0, 1.0, float(i)])
+    assert cache.get_similar([1.0, 0.0, 0.0], OPTIONS, 0) is None
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 3
+
+def test_generation_change_invalidates_everything():
+    cache = make_cache()
+    cache.put("a", OPTIONS, [1], generation=4, vector=[1.0, 0.0])
+    assert cache.get("a", OPTIONS, 4) == [1]
+    assert cache.get("a", OPTIONS, 5) is None
+    assert cache.get_similar([1.0, 0.0], OPTIONS, 5) is None
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+def test_writes_by_another_store_invalidate_through_the_write_stamp(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE_WRITE_STAMP", str(tmp_path / "writes.stamp"))
+    monkeypatch.setenv("QDRANT_COLLECTION_NAME", "stamped")
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "2")
+    monkeypatch.setenv("LOCAL_SEARCH_THREADS", "1")
+    # The API's store and the one an ingestion process writes through.
+    api, ingestion = create_vector_store("local"), create_vector_store("local")
+    api.create_collection()
+    ingestion.create_collection()
+    cache = make_cache()
+    cache.put("query", OPTIONS, [{"id": 1}], generation=api.generation)
+    assert cache.get("query", OPTIONS, api.generation) == [{"id": 1}]
+
+    ingestion.insert_embeddings(["new"], [[1.0, 0.0]])
+    assert cache.get("query", OPTIONS, api.generation) is None
+    before = api.generation
+    ingestion.delete_points(["missing"])
+    assert api.generation != before
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+        self.cache = None
+        self.batch_embedder = ParallelBatchEmbedder(lambda texts: [])
+
+    async def agenerate_embeddings(self, texts):
+        self.calls.append(list(texts))
+        # "reset password" and "password reset" embed to the same direction.
+        return [[float(len(t)), 1.0] for t in texts]
+
+class FakeStore:
+    def __init__(self):
+        self.generation = 0
+        self.calls = 0
+
+    async def asearch_similar_texts_batch(self, query_vectors, top_k=3, collection_name=None, query_filter=None,
+                                          with_payload=False):
+        self.calls += 1
+        return [[{"id": self.calls, "text": "hit", "score": v[0]}] for v in query_vectors]
+
+@pytest.fixture
+def client(monkeypatch):
+    generator, store = FakeGenerator(), FakeStore()
+    monkeypatch.setattr(main, "embedding_generator", generator)
+    monkeypatch.setattr(main, "vector_store", store)
+    monkeypatch.setattr(main, "embedding_batcher", None)
+    monkeypatch.setattr(main, "search_cache", make_cache(max_entries=10))
+
+    def post(path, json):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                return await c.post(path, json=json)
+        return asyncio.run(run())
+
+    return types.SimpleNamespace(post=post, generator=generator, store=store)
+
+def test_search_batch_serves_repeats_and_paraphrases_from_cache(client):
+    first = client.post("/search/batch", json={"queries": ["reset password"]}).json()
+    assert client.store.calls == 1
+
+    # Exact repeat: no embedding and no store call. Paraphrase: embedded, but answered from the cache.
+    second = client.post("/search/batch", json={"queries": ["reset password", "password reset"]}).json()
+    assert client.store.calls == 1
+    assert client.generator.calls == [["reset password"], ["password reset"]]
+    assert second["items"][0]["results"] == first["items"][0]["results"]
+    assert second["items"][1]["results"] == first["items"][0]["results"]
+
+    # A write through the store invalidates the cached results.
+    client.store.generation += 1
+    client.post("/search/batch", json={"queries": ["reset password"]})
+    assert client.store.calls == 2
+    stats = main.search_cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import sqlite3
+
+import app.search_cache as search_cache_module
+from app.embedding_cache import EmbeddingCache, EmbeddingCacheConfig
+from app.search_cache import SearchCache, SearchCacheConfig, options_key
+from app.shared_cache import SharedCacheConfig, SQLiteConnections, WorkerStats, shared_cache_path, sum_stats
+
+OPTIONS = options_key(5, "dense", None, False)
+
+def embedding_cache(path):
+    cfg = EmbeddingCacheConfig()
+    cfg.path = path
+    return EmbeddingCache(cfg)
+
+def search_cache(path, ttl_s=60.0):
+    cfg = SearchCacheConfig()
+    cfg.path = path
+    cfg.ttl_s = ttl_s
+    return SearchCache(cfg)
+
+def shared_config(directory, share_caches=True):
+    cfg = SharedCacheConfig()
+    cfg.directory = str(directory)
+    cfg.share_caches = share_caches
+    return cfg
+
+def test_shared_cache_path_follows_the_directory_setting(tmp_path):
+    assert shared_cache_path("a.sqlite", shared_config(tmp_path)) == str(tmp_path / "a.sqlite")
+    assert shared_cache_path("a.sqlite", shared_config(tmp_path, share_caches=False)) is None
+    cfg = SharedCacheConfig()
+    cfg.directory = None
+    assert shared_cache_path("a.sqlite", cfg) is None
+
+def test_connections_use_wal_and_trim_keeps_newest_rows(tmp_path):
+    db = SQLiteConnections(str(tmp_path / "t.sqlite"), ["CREATE TABLE t (key TEXT PRIMARY KEY)"])
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.executemany("INSERT OR REPLACE INTO t (key) VALUES (?)", [(str(i),) for i in range(10)])
+    db.trim("t", 4)
+    assert [k for k, in db.execute("SELECT key FROM t ORDER BY rowid")] == ["6", "7", "8", "9"]
+
+def test_embedding_vectors_are_shared_between_caches(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer, reader = embedding_cache(path), embedding_cache(path)
+    writer.put_many(["k1", "k2"], [[1.0, 2.0], [3.0, 4.0]])
+    assert reader.get_many(["k1", "k2", "k3"]) == [[1.0, 2.0], [3.0, 4.0], None]
+    stats = reader.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (0, 2, 1)
+    # Promoted to memory, so the second lookup does not touch the file.
+    reader.get_many(["k1"])
+    assert reader.stats()["hits"] == 1
+
+def test_embedding_disk_tier_is_bounded(tmp_path):
+    cache = embedding_cache(str(tmp_path / "embeddings.sqlite"))
+    cache.config.disk_max_entries = 5
+    for i in range(20):
+        cache.put_many([f"k{i}"], [[float(i)]])
+    assert cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 5
+
+def test_embedding_disk_errors_are_counted_not_raised(tmp_path):
+    cache = embedding_cache(str(tmp_path / "embeddings.sqlite"))
+    cache._db.execute("DROP TABLE embeddings")
+    cache.put_many(["k"], [[1.0]])
+    assert cache.get_many(["k"]) == [[1.0]]
+    assert cache.get_many(["missing"]) == [None]
+    assert cache.stats()["disk_errors"] == 2
+
+def test_search_results_are_shared_between_caches(tmp_path):
+    path = str(tmp_path / "search.sqlite")
+    first, second = search_cache(path), search_cache(path)
+    first.put("hello world", OPTIONS, [{"id": 1}], generation=0)
+    assert second.get(" hello  world", OPTIONS, 0) == [{"id": 1}]
+    assert second.get("hello world", OPTIONS, 0) == [{"id": 1}]
+    stats = second.stats()
+    assert (stats["shared"], stats["shared_hits"], stats["exact_hits"]) == (True, 1, 1)
+    assert stats["hit_rate"] == 1.0
+
+def test_shared_search_results_expire_on_wall_clock(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "search.sqlite")
+    first, second = search_cache(path, ttl_s=10.0), search_cache(path, ttl_s=10.0)
+    first.put("a", OPTIONS, [1], 0)
+    now[0] += 11.0
+    assert second.get("a", OPTIONS, 0) is None
+
+def test_store_writes_clear_shared_search_results(tmp_path):
+    path = str(tmp_path / "search.sqlite")
+    first, second = search_cache(path), search_cache(path)
+    first.put("a", OPTIONS, [1], generation=0)
+    # A write in this process bumps its generation and drops what every worker cached.
+    first.get("b", OPTIONS, 1)
+    assert second.get("a", OPTIONS, 0) is None
+
+def test_worker_stats_are_summed_with_recomputed_hit_rate(tmp_path):
+    stats = WorkerStats(shared_config(tmp_path))
+    stats.publish({"embedding_cache": {"hits": 3, "disk_hits": 1, "misses": 4, "hit_rate": 0.5}})
+    stats.db.execute(
+        "INSERT INTO worker_stats (pid, updated, stats) VALUES (?, ?, ?)",
+        (os.getpid() + 1, 0.0, '{"embedding_cache": {"hits": 99, "misses": 0, "hit_rate": 1.0}}'),
+    )
+    workers = stats.collect()
+    # The second row is older than stats_max_age_s, i.e. its worker is gone.
+    assert [w["pid"] for w in workers] == [os.getpid()]
+
+    total = sum_stats([{"hits": 3, "disk_hits": 1, "misses": 4, "hit_rate": 0.5, "generation": 2},
+                       {"hits": 2, "disk_hits": 0, "misses": 0, "hit_rate": 1.0, "generation": 2}, None])
+    assert total == {"hits": 5, "disk_hits": 1, "misses": 4, "hit_rate": 0.6}
+    assert sum_stats([None]) is None
+
+def _embed_in_child(path, keys):
+    cache = embedding_cache(path)
+    cache.put_many(keys, [[float(i), 1.0] for i in range(len(keys))])
+
+def test_vectors_written_by_another_process_are_hits(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = embedding_cache(path)
+    child = multiprocessing.get_context("spawn").Process(target=_embed_in_child, args=(path, ["a", "b"]))
+    child.start()
+    child.join(timeout=60)
+    assert child.exitcode == 0
+    assert cache.get_many(["a", "b"]) == [[0.0, 1.0], [1.0, 1.0]]
+    assert cache.stats()["disk_hits"] == 2
+
+def test_locked_database_is_skipped_after_busy_timeout(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_BUSY_TIMEOUT_S", "0.01")
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = embedding_cache(path)
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        cache.put_many(["k"], [[1.0]])
+    finally:
+        blocker.execute("ROLLBACK")
+    assert cache.stats()["disk_errors"] == 1
+    assert cache.get_many(["k"]) == [[1.0]]
@@ -1,5 +1,18 @@
 import math
-from app.similarity import cosine_similarity
+
+import numpy as np
+import pytest
+
+from app.similarity import (
+    CorpusMatrix,
+    cosine_similarity,
+    cosine_similarity_matrix,
+    dot_product_matrix,
+    dot_product_similarity,
+    euclidean_distance,
+    euclidean_distance_matrix,
+    top_k_indices,
+)
 
 def test_cosine_identical_is_one():
     a = [1, 2, 3]
@@ -29,4 +42,55 @@ def test_cosine_scale_invariance_and_symmetry():
     cos_ba = cosine_similarity(b, a)
     cos_scaled = cosine_similarity([k*x for x in a], [k*y for y in b])
     assert math.isclose(cos_ab, cos_ba, rel_tol=1e-9, abs_tol=1e-12)
-    assert math.isclose(cos_ab, cos_scaled, rel_tol=1e-9, abs_tol=1e-12)
\ No newline at end of file
+    assert math.isclose(cos_ab, cos_scaled, rel_tol=1e-9, abs_tol=1e-12)
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(5, 8)), rng.normal(size=(40, 8))
+
+def test_matrix_kernels_match_pairwise(vectors):
+    queries, corpus = vectors
+    cos = cosine_similarity_matrix(queries, corpus)
+    dot = dot_product_matrix(queries, corpus)
+    euc = euclidean_distance_matrix(queries, corpus)
+
+    assert cos.shape == (5, 40) and cos.dtype == np.float32
+    for i in range(5):
+        for j in range(0, 40, 7):
+            assert math.isclose(cos[i, j], cosine_similarity(queries[i], corpus[j]), abs_tol=1e-5)
+            assert math.isclose(dot[i, j], dot_product_similarity(queries[i], corpus[j]), rel_tol=1e-4, abs_tol=1e-4)
+            assert math.isclose(euc[i, j], euclidean_distance(queries[i], corpus[j]), rel_tol=1e-4, abs_tol=1e-3)
+
+def test_matrix_cosine_zero_vector_guard():
+    scores = cosine_similarity_matrix([[0, 0, 0]], [[1, 2, 3], [0, 0, 0]])
+    assert np.allclose(scores, 0.0)
+
+def test_top_k_indices_sorted_both_directions():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7]])
+    assert top_k_indices(scores, 2).tolist() == [[1, 3]]
+    assert top_k_indices(scores, 2, largest=False).tolist() == [[0, 2]]
+    assert top_k_indices(scores, 10).tolist() == [[1, 3, 2, 0]]
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_chunked_top_k_matches_full_sort(vectors, metric):
+    queries, corpus = vectors
+    matrix = CorpusMatrix(corpus)
+    full = matrix.scores(queries, metric)
+    expected = np.argsort(-full if metric != "euclidean" else full, axis=1)[:, :4]
+
+    idx, scores = matrix.top_k(queries, k=4, metric=metric, chunk_size=7)
+    assert idx.tolist() == expected.tolist()
+    assert np.allclose(scores, np.take_along_axis(full, expected, axis=1))
+
+def test_corpus_matrix_is_float32_contiguous(vectors):
+    _, corpus = vectors
+    matrix = CorpusMatrix(corpus.tolist())
+    assert matrix.vectors.dtype == np.float32
+    assert matrix.vectors.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(matrix.normalized, axis=1), 1.0, atol=1e-5)
+
+def test_unknown_metric_rejected(vectors):
+    queries, corpus = vectors
+    with pytest.raises(ValueError):
+        CorpusMatrix(corpus).top_k(queries, k=1, metric="manhattan")
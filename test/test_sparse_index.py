@@ -0,0 +1,243 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+
+import main
+from app.batch_embedder import ParallelBatchEmbedder
+from app.ingestion import IngestionConfig, ingest_file
+from app.qdrant_utils import point_id
+from app.vector_store import owner_key
+from app.sparse_index import BM25Index, SparseIndexConfig, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    1: "The cat sat on the mat",
+    2: "Dogs chase cats around the garden",
+    3: "Quarterly revenue grew by ten percent",
+    4: "The cat and the other cat played",
+}
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+def test_tokenize_normalizes_case_and_punctuation():
+    assert tokenize("  Hello,  WORLD!  hello ") == ["hello", "world", "hello"]
+
+def test_bm25_ranks_by_term_frequency_and_rarity(index):
+    hits = index.search("cat", top_k=5)
+    assert [hit["id"] for hit in hits] == [4, 1]
+    assert hits[0]["text"] == DOCS[4]
+    assert index.search("revenue cat", top_k=1)[0]["id"] == 3
+    assert index.search("nothing matches", top_k=3) == []
+
+def test_add_is_an_upsert_and_delete_removes_terms(index):
+    index.add([3], ["cat revenue"])
+    assert len(index) == 4
+    assert index.search("quarterly") == []
+    assert index.delete([1, 99]) == 1
+    assert 1 not in index
+    assert [hit["id"] for hit in index.search("cat", top_k=5)] == [3, 4]
+    assert index.stats()["documents"] == 3
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "sparse.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.search("cat garden") == index.search("cat garden")
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [{"id": "a", "text": "A", "score": 0.9}, {"id": "b", "text": "B", "score": 0.8}]
+    sparse = [{"id": "b", "text": "B", "score": 12.0}, {"id": "c", "text": "C", "score": 3.0}]
+    fused = reciprocal_rank_fusion([dense, sparse], top_k=2, k=60)
+    assert [hit["id"] for hit in fused] == ["b", "a"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert reciprocal_rank_fusion([dense, sparse], top_k=1, weights=[0.0, 1.0])[0]["id"] == "b"
+
+def test_ingestion_indexes_every_line(tmp_path):
+    class Generator:
+        model_name = "fake-model"
+
+        def generate_embeddings(self, texts):
+            return [[float(len(t))] for t in texts]
+
+    class Store:
+        def insert_embeddings(self, texts, embeddings, collection_name=None, ids=None, payloads=None):
+            return True
+
+    path = tmp_path / "corpus.txt"
+    path.write_text("red apple\n\ngreen apple\nblue sky\n", encoding="utf-8")
+    config = IngestionConfig()
+    config.batch_size = 2
+    config.checkpoint_path = None
+    sparse = BM25Index()
+    ingest_file(str(path), Generator(), Store(), config=config, sparse_index=sparse)
+
+    owner = owner_key("corpus.txt")
+    assert len(sparse) == 3
+    assert {hit["id"] for hit in sparse.search("apple")} == {point_id("red apple", owner), point_id("green apple", owner)}
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+        self.batch_embedder = ParallelBatchEmbedder(lambda texts: [])
+
+    async def agenerate_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return [[1.0] for _ in texts]
+
+class FakeStore:
+    def retrieve_payloads(self, ids, fields=None, collection_name=None):
+        return {pid: {"text": DOCS[pid], "tenant": "acme" if pid % 2 else "globex"} for pid in ids if pid in DOCS}
+
+    async def asearch_similar_texts_batch(self, query_vectors, top_k=3, collection_name=None, query_filter=None,
+                                          with_payload=False):
+        return [[{"id": 2, "text": DOCS[2], "score": 0.9}, {"id": 3, "text": DOCS[3], "score": 0.5}]
+                for _ in query_vectors]
+
+@pytest.fixture
+def client(monkeypatch, index, tmp_path):
+    generator = FakeGenerator()
+    monkeypatch.setattr(main, "embedding_generator", generator)
+    monkeypatch.setattr(main, "vector_store", FakeStore())
+    monkeypatch.setattr(main, "embedding_batcher", None)
+    monkeypatch.setattr(main, "sparse_index", index)
+    config = SparseIndexConfig()
+    config.path = str(tmp_path / "sparse.json")
+    monkeypatch.setattr(main, "sparse_config", config)
+    monkeypatch.setattr(main, "sparse_index_mtime", None)
+
+    def post(path, json):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                return await c.post(path, json=json)
+        return asyncio.run(run())
+
+    return types.SimpleNamespace(post=post, generator=generator, config=config)
+
+def test_sparse_search_skips_embedding(client):
+    resp = client.post("/search", json={"text": "cat", "top_k": 1, "mode": "sparse"})
+    assert resp.status_code == 200
+    assert resp.json()["results"][0]["id"] == 4
+    assert client.generator.calls == []
+
+def test_hybrid_search_fuses_dense_and_sparse(client):
+    resp = client.post("/search/batch", json={"queries": ["cats garden"], "top_k": 2, "mode": "hybrid"})
+    assert resp.status_code == 200
+    results = resp.json()["items"][0]["results"]
+    # Doc 2 is first in both lists; doc 3 only comes from the dense side.
+    assert [hit["id"] for hit in results] == [2, 3]
+    assert client.generator.calls == [["cats garden"]]
+
+def test_sparse_search_reloads_the_index_written_by_ingestion(client):
+    # Written by an ingestion run after startup; doc 9 is not in the vector store (pruned since).
+    newer = BM25Index()
+    newer.add([1, 9], [DOCS[1], "cat cat cat"])
+    newer.save(client.config.path)
+
+    resp = client.post("/search", json={"text": "cat", "top_k": 5, "mode": "sparse"})
+    assert resp.status_code == 200
+    assert [hit["id"] for hit in resp.json()["results"]] == [1]
+    assert len(main.sparse_index) == 2
+
+def test_sparse_search_requires_index(client, monkeypatch):
+    monkeypatch.setattr(main, "sparse_index", None)
+    resp = client.post("/search", json={"text": "cat", "mode": "sparse"})
+    assert resp.status_code == 503
+
+def test_sparse_search_applies_filter_through_vector_store(client):
+    resp = client.post("/search", json={"text": "cat", "mode": "sparse", "filter": {"tenant": "acme"},
+                                        "with_payload": ["tenant"]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    # Doc 4 scores higher for "cat" but belongs to the other tenant.
+    assert [hit["id"] for hit in results] == [1]
+    assert results[0]["payload"] == {"tenant": "acme"}
+
+def test_resumed_ingestion_keeps_sparse_entries_of_checkpointed_lines(tmp_path):
+    class Generator:
+        model_name = "fake-model"
+
+        def generate_embeddings(self, texts):
+            return [[float(len(t))] for t in texts]
+
+    class Store:
+        def __init__(self, fail_on_call=None):
+            self.calls = 0
+            self.fail_on_call = fail_on_call
+
+        def insert_embeddings(self, texts, embeddings, collection_name=None, ids=None, payloads=None):
+            self.calls += 1
+            if self.calls == self.fail_on_call:
+                raise RuntimeError("qdrant went away")
+            return True
+
+    path = tmp_path / "corpus.txt"
+    path.write_text("red apple\ngreen apple\nblue sky\ngrey sky\n", encoding="utf-8")
+    sparse_path = str(tmp_path / "sparse.json")
+    config = IngestionConfig()
+    config.batch_size = 2
+    config.checkpoint_path = str(tmp_path / "ingest.ckpt")
+    config.sparse_save_interval = 1
+    with pytest.raises(RuntimeError):
+        ingest_file(str(path), Generator(), Store(fail_on_call=2), config=config,
+                    sparse_index=BM25Index(), sparse_index_path=sparse_path)
+
+    # The crashed process never reached its final save; the resumed run starts from what is on disk.
+    sparse = BM25Index.load(sparse_path)
+    report = ingest_file(str(path), Generator(), Store(), config=config, sparse_index=sparse,
+                         sparse_index_path=sparse_path)
+
+    owner = owner_key("corpus.txt")
+    assert report["resumed_from"] == 2
+    assert {hit["id"] for hit in sparse.search("apple")} == {point_id("red apple", owner), point_id("green apple", owner)}
+    assert len(BM25Index.load(sparse_path)) == 4
+
+def test_sparse_index_is_saved_with_the_checkpoint_on_an_interval(tmp_path):
+    class Generator:
+        model_name = "fake-model"
+
+        def generate_embeddings(self, texts):
+            return [[float(len(t))] for t in texts]
+
+    class Store:
+        def __init__(self, fail_on_call=None):
+            self.calls = 0
+            self.fail_on_call = fail_on_call
+
+        def insert_embeddings(self, texts, embeddings, collection_name=None, ids=None, payloads=None):
+            self.calls += 1
+            if self.calls == self.fail_on_call:
+                raise RuntimeError("qdrant went away")
+            return True
+
+    class CountingIndex(BM25Index):
+        saves = 0
+
+        def save(self, path):
+            CountingIndex.saves += 1
+            super().save(path)
+
+    path = tmp_path / "corpus.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(7)), encoding="utf-8")
+    sparse_path = str(tmp_path / "sparse.json")
+    config = IngestionConfig()
+    config.batch_size = 1
+    config.checkpoint_path = str(tmp_path / "ingest.ckpt")
+    config.sparse_save_interval = 3
+    with pytest.raises(RuntimeError):
+        ingest_file(str(path), Generator(), Store(fail_on_call=5), config=config,
+                    sparse_index=CountingIndex(), sparse_index_path=sparse_path)
+    assert CountingIndex.saves == 1
+
+    # Batch 4 was indexed but not saved, so the checkpoint stops at batch 3 as well.
+    sparse = BM25Index.load(sparse_path)
+    assert len(sparse) == 3
+    report = ingest_file(str(path), Generator(), Store(), config=config, sparse_index=sparse,
+                         sparse_index_path=sparse_path)
+    assert (report["resumed_from"], len(sparse)) == (3, 7)
@@ -0,0 +1,190 @@
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from app.embedding_store import EmbeddingStore
+from app.embeddings import EmbeddingGenerator
+from app.ingestion import IngestionConfig, ingest_file
+from app.startup import STARTUP_ATTEMPTS, StartupConfig, StartupTracker
+from app.vector_store import initialize_vector_store
+
+def make_tracker(max_attempts=0):
+    config = StartupConfig()
+    config.retry_base_s = 0.01
+    config.retry_max_s = 0.05
+    config.max_attempts = max_attempts
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    return StartupTracker(config, sleep=sleep), delays
+
+def flaky(failures):
+    calls = []
+
+    def init():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("connection refused")
+        return "client"
+
+    return init, calls
+
+def test_tracker_retries_with_capped_backoff_until_ready():
+    tracker, delays = make_tracker()
+    tracker.expect("store", "model")
+    init, calls = flaky(failures=4)
+
+    assert asyncio.run(tracker.run("store", init)) == "client"
+    assert len(calls) == 5
+    assert len(delays) == 4 and all(0 <= d <= 0.05 for d in delays)
+
+    status = tracker.status()
+    assert status["components"]["store"]["ready"] is True
+    assert status["components"]["store"]["attempts"] == 5
+    assert status["components"]["store"]["last_error"] is None
+    assert status["components"]["store"]["ready_after_s"] >= 0
+    # "model" was expected but never started, so the service is not ready yet.
+    assert tracker.ready is False
+    asyncio.run(tracker.run("model", lambda: None))
+    assert tracker.ready is True
+
+def test_tracker_gives_up_after_max_attempts():
+    tracker, _ = make_tracker(max_attempts=3)
+    init, calls = flaky(failures=10)
+    with pytest.raises(ConnectionError):
+        asyncio.run(tracker.run("store", init))
+    assert len(calls) == 3
+    assert tracker.status()["components"]["store"]["last_error"] == "ConnectionError: connection refused"
+    assert tracker.ready is False
+
+def test_tracker_does_not_retry_configuration_errors():
+    tracker, delays = make_tracker()
+    errors = STARTUP_ATTEMPTS.labels("misconfigured", "error").value
+    calls = []
+
+    def init():
+        calls.append(1)
+        raise ValueError("Collection vector size 768 does not match the embedding dimensionality 256")
+
+    with pytest.raises(ValueError):
+        asyncio.run(tracker.run("misconfigured", init))
+    assert (len(calls), delays) == (1, [])
+    state = tracker.status()["components"]["misconfigured"]
+    assert (state["ready"], state["attempts"]) == (False, 1)
+    assert state["last_error"].startswith("ValueError: Collection vector size 768")
+    assert STARTUP_ATTEMPTS.labels("misconfigured", "error").value == errors + 1
+
+@pytest.fixture
+def local_services(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_EMBEDDING_DIMENSION", "32")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setenv("QDRANT_VECTOR_SIZE", "32")
+    monkeypatch.setenv("QDRANT_COLLECTION_NAME", "startup")
+    monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+    monkeypatch.setenv("EMBEDDING_WARMUP", "true")
+    for name in ("embedding_generator", "vector_store", "embedding_batcher", "startup"):
+        monkeypatch.setattr(main, name, None)
+
+def test_readyz_turns_ready_after_background_connect(local_services, monkeypatch):
+    initialize = main.initialize_vector_store
+    init, calls = flaky(failures=2)
+
+    def failing_twice(**kwargs):
+        init()
+        return initialize(**kwargs)
+
+    monkeypatch.setattr(main, "initialize_vector_store", failing_twice)
+    tracker, delays = make_tracker()
+    monkeypatch.setattr(main, "startup", tracker)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            before = await c.get("/readyz")
+            health = await c.get("/healthz")
+            await main.connect_services(tracker)
+            after = await c.get("/readyz")
+            search = await c.post("/search", json={"text": "hello", "top_k": 1})
+            return before, health, after, search
+
+    before, health, after, search = asyncio.run(run())
+    assert before.status_code == 503
+    assert before.json()["ready"] is False
+    assert health.status_code == 200
+    assert after.status_code == 200
+    components = after.json()["components"]
+    assert set(components) == {"embedding", "vector_store", "warm_up"}
+    assert components["vector_store"]["attempts"] == 3
+    assert len(delays) == 2
+    assert search.status_code == 200
+    main.embedding_generator.close()
+
+def test_embedding_is_served_while_the_store_is_still_connecting(local_services, monkeypatch):
+    def unavailable(**kwargs):
+        raise ConnectionError("qdrant unavailable")
+
+    monkeypatch.setattr(main, "initialize_vector_store", unavailable)
+    tracker, _ = make_tracker(max_attempts=2)
+    monkeypatch.setattr(main, "startup", tracker)
+
+    async def run():
+        await main.connect_services(tracker)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return (await c.get("/readyz"), await c.post("/embedding", json={"text": "hi"}),
+                    await c.post("/search", json={"text": "hi"}))
+
+    ready, embedding, search = asyncio.run(run())
+    assert ready.status_code == 503
+    assert "qdrant unavailable" in ready.json()["components"]["vector_store"]["last_error"]
+    assert embedding.status_code == 200
+    assert search.status_code == 503
+    main.embedding_generator.close()
+
+def test_local_backend_serves_what_a_separate_ingestion_persisted(local_services, monkeypatch, tmp_path):
+    monkeypatch.setenv("LOCAL_STORE_DIR", str(tmp_path / "collections"))
+    monkeypatch.setenv("EMBEDDING_WARMUP", "false")
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("red apple\ngreen apple\nblue sky\n", encoding="utf-8")
+    config = IngestionConfig()
+    config.batch_size = 2
+    config.checkpoint_path = None
+
+    # The ingestion process: its in-memory index is gone once it returns.
+    generator = EmbeddingGenerator()
+    ingest_file(str(corpus), generator, initialize_vector_store(dimension=generator.dimension), config=config,
+                metadata={"tenant": "acme"})
+    corpus.write_text("red apple\ngreen apple\n", encoding="utf-8")
+    config.prune = True
+    ingest_file(str(corpus), generator, initialize_vector_store(dimension=generator.dimension), config=config,
+                metadata={"tenant": "acme"})
+    generator.close()
+    # Unchanged lines were not appended again; the pruned one left a tombstone.
+    stored = EmbeddingStore.open(str(tmp_path / "collections" / "startup"))
+    assert (len(stored), len(stored.live_rows())) == (3, 2)
+
+    # The API process loads the collection at startup.
+    tracker, _ = make_tracker()
+    monkeypatch.setattr(main, "startup", tracker)
+
+    async def run():
+        await main.connect_services(tracker)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return [await c.post("/search", json={"text": text, "top_k": 3, "filter": {"tenant": "acme"},
+                                                  "with_payload": ["tenant"]})
+                    for text in ("red apple", "blue sky")]
+
+    apple, sky = asyncio.run(run())
+    assert apple.status_code == 200
+    hits = apple.json()["results"]
+    assert hits[0]["text"] == "red apple" and hits[0]["payload"] == {"tenant": "acme"}
+    # The pruned line stays deleted after the restart.
+    assert {hit["text"] for hit in hits} == {"red apple", "green apple"}
+    assert "blue sky" not in {hit["text"] for hit in sky.json()["results"]}
+    main.embedding_generator.close()
@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.local_store import LocalStoreConfig, LocalVectorStore
+from app.similarity import CorpusMatrix
+from app.vector_index import VectorIndex
+from app.vector_store import create_vector_store, point_id
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(1)
+    return rng.normal(size=(300, 16)).astype(np.float32)
+
+def build(corpus, metric="cosine", dtype=np.float32, block_size=64):
+    index = VectorIndex(dimension=corpus.shape[1], metric=metric, dtype=dtype, block_size=block_size,
+                        initial_capacity=8)
+    index.add(list(range(len(corpus))), corpus, [{"text": f"t{i}"} for i in range(len(corpus))])
+    return index
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_search_matches_exact_brute_force(corpus, metric):
+    index = build(corpus, metric)
+    queries = corpus[:5] + 0.01
+    expected, _ = CorpusMatrix(corpus).top_k(queries, k=5, metric=metric)
+
+    results = index.search(queries, k=5)
+    assert [[pid for pid, _, _ in hits] for hits in results] == expected.tolist()
+    assert results[0][0][2] == {"text": f"t{expected[0][0]}"}
+
+def test_upsert_and_delete_keep_rows_dense(corpus):
+    index = build(corpus[:10])
+    index.add([3], corpus[20:21], [{"text": "replaced"}])
+    assert len(index) == 10
+    assert index.get_payload(3) == {"text": "replaced"}
+
+    assert index.delete([0, 5, 999]) == 2
+    assert len(index) == 8
+    assert 0 not in index and 9 in index
+    hit_ids = [pid for pid, _, _ in index.search(corpus[9], k=1)[0]]
+    assert hit_ids == [9]
+
+def test_float16_storage_halves_memory(corpus):
+    full = build(corpus)
+    half = build(corpus, dtype=np.float16)
+    assert half.nbytes * 2 == full.nbytes
+
+    full_ids = [pid for pid, _, _ in full.search(corpus[7], k=3)[0]]
+    half_ids = [pid for pid, _, _ in half.search(corpus[7], k=3)[0]]
+    assert full_ids[0] == half_ids[0] == 7
+
+def test_concurrent_searches_from_thread_pool(corpus):
+    index = build(corpus)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda i: index.search(corpus[i], k=1)[0][0][0], range(50)))
+    assert results == list(range(50))
+
+def test_dimension_mismatch_rejected(corpus):
+    index = build(corpus)
+    with pytest.raises(ValueError):
+        index.add([1000], np.zeros((1, 3)))
+    with pytest.raises(ValueError):
+        index.search(np.zeros(3), k=1)
+
+def make_local_store():
+    cfg = LocalStoreConfig()
+    cfg.collection_name = "local"
+    cfg.vector_size = 3
+    cfg.distance_metric = "COSINE"
+    cfg.search_threads = 2
+    return LocalVectorStore(cfg)
+
+def test_local_store_behaves_like_qdrant_store():
+    store = make_local_store()
+    store.create_collection()
+    store.insert_embeddings(
+        texts=["north", "east", "up"],
+        embeddings=[[0, 1, 0], [1, 0, 0], [0, 0, 1]],
+        payloads=[{"source": "a"}, {"source": "b"}, {"source": "a"}],
+    )
+
+    hits = store.search_similar_texts([0.1, 0.9, 0], top_k=2)
+    assert hits[0]["text"] == "north"
+    assert hits[0]["id"] == point_id("north")
+    assert set(hits[0].keys()) == {"id", "text", "score"}
+
+    batch = asyncio.run(store.asearch_similar_texts_batch([[1, 0, 0], [0, 0, 1]], top_k=1))
+    assert [h[0]["text"] for h in batch] == ["east", "up"]
+
+    assert sorted(store.iter_ids("source", "a")) == sorted([point_id("north"), point_id("up")])
+    assert store.retrieve_payloads([point_id("east"), "missing"], fields=["source"]) == {point_id("east"): {"source": "b"}}
+
+    generation = store.generation
+    store.delete_points([point_id("north")])
+    assert store.generation == generation + 1
+    assert store.search_similar_texts([0, 1, 0], top_k=1)[0]["text"] != "north"
+    asyncio.run(store.aclose())
+
+def test_factory_selects_backend(monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+    assert isinstance(create_vector_store(), LocalVectorStore)
+    with pytest.raises(ValueError):
+        create_vector_store("faiss")